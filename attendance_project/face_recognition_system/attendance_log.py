@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+# attendance_log.py
+# ===========================================
+# Append-only attendance log (line-oriented CSV: "Folder Name,Timestamp").
+# Each mark is one O(1) append, flushed per record; fsync is batched (after
+# FSYNC_EVERY records, at most FSYNC_INTERVAL seconds after an unsynced mark via
+# a one-shot timer, and on close) so bursts of marks don't each wait on the disk. attendance.xlsx is produced from this log on demand.
+# Records can be read from a byte offset (the pagination cursor), and the
+# log's (size, mtime) doubles as its version for HTTP caching: an append-only
+# file only ever grows.
+# MarkedToday keeps the current day's marked folders in memory so duplicate
+# frames are rejected without touching the log.
+# StudentIndex keeps, per folder, the sorted distinct dates attended (with
+# per-date counts) plus a trigram map over folder names, so per-student
+# lookups don't rescan the log.
+# ===========================================
+
+import os
+import re
+import csv
+import time
+import atexit
+import bisect
+import threading
+import pandas as pd
+
+LOG_COLUMNS = ['Folder Name', 'Timestamp']
+FSYNC_EVERY = 16
+FSYNC_INTERVAL = 1.0
+
+
+class AttendanceLog:
+    """Line-oriented CSV attendance log with batched fsync."""
+
+    def __init__(self, path, fsync_every=FSYNC_EVERY, fsync_interval=FSYNC_INTERVAL):
+        self.path = path
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._last_sync = time.time()
+        self._timer = None          # fsyncs marks left pending after a quiet period
+        self.created = not os.path.exists(path) or os.path.getsize(path) == 0
+        self._fh = open(path, "a", newline="", encoding="utf-8")
+        self._writer = csv.writer(self._fh)
+        if self.created:
+            self._writer.writerow(LOG_COLUMNS)
+            self._sync()
+        atexit.register(self.close)
+
+    def append(self, folder_name, timestamp):
+        """Append one attendance record. O(1) regardless of history size."""
+        self.append_many([(folder_name, timestamp)])
+
+    def append_many(self, rows):
+        """Append several (folder, timestamp) records with a single flush."""
+        with self._lock:
+            self._writer.writerows(rows)
+            self._fh.flush()
+            self._pending += len(rows)
+            if self._pending >= self.fsync_every or time.time() - self._last_sync >= self.fsync_interval:
+                self._sync()
+            elif self._timer is None:
+                self._timer = threading.Timer(self.fsync_interval, self._timed_sync)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def _timed_sync(self):
+        with self._lock:
+            self._timer = None
+            if self._pending and not self._fh.closed:
+                self._sync()
+
+    def _sync(self):
+        self._fh.flush()
+        os.fsync(self._fh.fileno())
+        self._pending = 0
+        self._last_sync = time.time()
+
+    def iter_records(self):
+        """Yield (folder, timestamp) for every record in the log, oldest first."""
+        with self._lock:
+            self._fh.flush()
+        with open(self.path, "r", newline="", encoding="utf-8") as f:
+            reader = csv.reader(f)
+            next(reader, None)
+            for row in reader:
+                if len(row) >= 2:
+                    yield row[0], row[1]
+
+    def iter_from(self, offset=0, end=None):
+        """
+        Yield (folder, timestamp, next_offset) for records starting at byte offset
+        (0 = first record) and, if given, stopping at byte offset end (e.g. the
+        size from version()). next_offset is the cursor for the record after it.
+        """
+        with self._lock:
+            self._fh.flush()
+        with open(self.path, "rb") as f:
+            if offset:
+                f.seek(offset)
+            else:
+                f.readline()                    # header
+            while end is None or f.tell() < end:
+                line = f.readline()
+                if not line.endswith(b"\n"):
+                    break                       # EOF (or a record still being written)
+                row = next(csv.reader([line.decode("utf-8")]), [])
+                if len(row) >= 2:
+                    yield row[0], row[1], f.tell()
+
+    def is_record_boundary(self, offset):
+        """True if offset is 0 or starts a line within the log (a valid cursor)."""
+        if offset == 0:
+            return True
+        with self._lock:
+            self._fh.flush()
+        if offset < 0 or offset > os.path.getsize(self.path):
+            return False
+        with open(self.path, "rb") as f:
+            f.seek(offset - 1)
+            return f.read(1) == b"\n"
+
+    def version(self):
+        """(size in bytes, mtime) of the log; changes with every append."""
+        with self._lock:
+            self._fh.flush()
+            st = os.fstat(self._fh.fileno())
+        return st.st_size, st.st_mtime
+
+    def read_df(self):
+        """Whole log as a DataFrame of strings (for exports and reports)."""
+        with self._lock:
+            self._fh.flush()
+        return pd.read_csv(self.path, dtype=str, keep_default_na=False)
+
+    def close(self):
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if not self._fh.closed:
+                self._sync()
+                self._fh.close()
+
+
+class MarkedToday:
+    """Set of folders already marked on the current day; rolls over at midnight."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._day = None
+        self._folders = set()
+
+    def _roll(self, day):
+        if day != self._day:
+            self._day = day
+            self._folders = set()
+
+    def load(self, records, day):
+        """Rebuild from (folder, timestamp) records, keeping those stamped with `day`."""
+        with self._lock:
+            self._day = day
+            self._folders = {folder for folder, ts in records if ts.startswith(day)}
+            return len(self._folders)
+
+    def try_add(self, folder, day):
+        """Atomically claim folder for `day`. False if it was already marked."""
+        with self._lock:
+            self._roll(day)
+            if folder in self._folders:
+                return False
+            self._folders.add(folder)
+            return True
+
+    def discard(self, folder, day):
+        with self._lock:
+            if day == self._day:
+                self._folders.discard(folder)
+
+    def __len__(self):
+        """Folders marked today (rolls over at midnight even before the next mark)."""
+        with self._lock:
+            self._roll(time.strftime('%Y-%m-%d'))
+            return len(self._folders)
+
+
+_ISO_DATE = re.compile(r"^\d{4}-\d{2}-\d{2}")
+
+
+def record_date(timestamp):
+    """'YYYY-MM-DD' for a log timestamp; other formats (e.g. seeded from a workbook) are parsed once."""
+    timestamp = str(timestamp).strip()
+    if _ISO_DATE.match(timestamp):
+        return timestamp[:10]
+    try:
+        return str(pd.to_datetime(timestamp).date())
+    except Exception:
+        return timestamp
+
+
+def _trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class StudentIndex:
+    """
+    Per-folder attendance index kept in step with the log.
+    Exact (case-insensitive) lookups are a dict hit; substring lookups intersect
+    trigram posting sets and only verify the surviving folder names. Date range
+    queries bisect the folder's sorted date list.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._dates = {}        # folder -> sorted distinct dates
+        self._counts = {}       # folder -> {date: records}
+        self._totals = {}       # folder -> records
+        self._by_lower = {}     # lowercased folder -> set of folders
+        self._grams = {}        # trigram of lowercased folder -> set of folders
+
+    def load(self, records):
+        """Rebuild from (folder, timestamp) records. Returns the number of folders."""
+        with self._lock:
+            self._dates, self._counts, self._totals, self._by_lower, self._grams = {}, {}, {}, {}, {}
+            for folder, ts in records:
+                self._add(folder, record_date(ts))
+            return len(self._totals)
+
+    def add_many(self, folders, timestamp):
+        """Record one mark at `timestamp` for each folder (called after the log append)."""
+        day = record_date(timestamp)
+        with self._lock:
+            for folder in folders:
+                self._add(folder, day)
+
+    def _add(self, folder, day):
+        counts = self._counts.get(folder)
+        if counts is None:
+            counts = self._counts[folder] = {}
+            self._dates[folder] = []
+            self._totals[folder] = 0
+            lower = folder.lower()
+            self._by_lower.setdefault(lower, set()).add(folder)
+            for gram in _trigrams(lower):
+                self._grams.setdefault(gram, set()).add(folder)
+        if day not in counts:
+            counts[day] = 0
+            bisect.insort(self._dates[folder], day)
+        counts[day] += 1
+        self._totals[folder] += 1
+
+    def find(self, name):
+        """Folders matching name: exact case-insensitive match, else every folder containing it."""
+        query = name.strip().lower()
+        if not query:
+            return []
+        with self._lock:
+            exact = self._by_lower.get(query)
+            if exact:
+                return sorted(exact)
+            if len(query) < 3:
+                # Too short for trigrams; the scan is over folder names, not records.
+                return sorted(f for f in self._totals if query in f.lower())
+            candidates = None
+            for gram in _trigrams(query):
+                posting = self._grams.get(gram)
+                if not posting:
+                    return []
+                candidates = set(posting) if candidates is None else candidates & posting
+            return sorted(f for f in candidates if query in f.lower())
+
+    def summary(self, folders, start=None, end=None):
+        """(total records, {date: records}) over folders, optionally limited to start <= date <= end."""
+        merged = {}
+        with self._lock:
+            for folder in folders:
+                dates = self._dates.get(folder, [])
+                lo = bisect.bisect_left(dates, start) if start else 0
+                hi = bisect.bisect_right(dates, end) if end else len(dates)
+                counts = self._counts[folder]
+                for day in dates[lo:hi]:
+                    merged[day] = merged.get(day, 0) + counts[day]
+        return sum(merged.values()), dict(sorted(merged.items()))
+
+    def folders(self, limit=None):
+        with self._lock:
+            names = sorted(self._totals)
+        return names[:limit] if limit else names
+
+    def __len__(self):
+        return len(self._totals)
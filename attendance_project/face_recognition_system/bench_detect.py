@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# bench_detect.py
+# ===========================================
+# Benchmark: detection settings for the /attendance encode path.
+# For each setting (model, upsample, max_side, jitters) reports mean latency
+# per image, how many images still yield a face, and the distance between the
+# resulting encoding and the full-resolution baseline encoding
+# (hog, upsample=1, max_side=0, jitters=1).
+#
+#   python bench_detect.py                       # images under ../student_data
+#   python bench_detect.py path/to/images --cnn  # also try the CNN detector
+# ===========================================
+
+import os
+import sys
+import glob
+import time
+import argparse
+import numpy as np
+import face_recognition
+
+from face_workers import detect_and_encode
+
+CUR_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_IMAGE_DIR = os.path.join(CUR_DIR, "..", "student_data")
+
+BASELINE = {"model": "hog", "upsample": 1, "max_side": 0, "jitters": 1}
+SETTINGS = [
+    {"model": "hog", "upsample": 1, "max_side": 0, "jitters": 1},
+    {"model": "hog", "upsample": 0, "max_side": 0, "jitters": 1},
+    {"model": "hog", "upsample": 1, "max_side": 480, "jitters": 1},
+    {"model": "hog", "upsample": 1, "max_side": 320, "jitters": 1},
+    {"model": "hog", "upsample": 0, "max_side": 320, "jitters": 1},
+    {"model": "hog", "upsample": 1, "max_side": 240, "jitters": 1},
+    {"model": "hog", "upsample": 1, "max_side": 320, "jitters": 5},
+]
+CNN_SETTINGS = [
+    {"model": "cnn", "upsample": 0, "max_side": 320, "jitters": 1},
+    {"model": "cnn", "upsample": 1, "max_side": 320, "jitters": 1},
+]
+
+
+def load_images(path, limit):
+    files = sorted(glob.glob(os.path.join(path, "**", "*.jp*g"), recursive=True) +
+                   glob.glob(os.path.join(path, "**", "*.png"), recursive=True))[:limit]
+    return [(f, face_recognition.load_image_file(f)) for f in files]
+
+
+def run(images, opts):
+    times, encs = [], []
+    for _, image in images:
+        t0 = time.perf_counter()
+        faces = detect_and_encode(image, opts=opts)
+        times.append(time.perf_counter() - t0)
+        encs.append(faces[0][1] if faces else None)
+    return times, encs
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Face detection settings benchmark")
+    parser.add_argument('path', nargs='?', default=DEFAULT_IMAGE_DIR)
+    parser.add_argument('--limit', type=int, default=50)
+    parser.add_argument('--cnn', action='store_true', help="also benchmark the CNN detector")
+    args = parser.parse_args()
+
+    images = load_images(args.path, args.limit)
+    if not images:
+        print(f"No images found under {args.path}")
+        sys.exit(1)
+    print(f"{len(images)} images, e.g. {images[0][1].shape[1]}x{images[0][1].shape[0]}")
+
+    _, base_encs = run(images, BASELINE)
+    settings = SETTINGS + (CNN_SETTINGS if args.cnn else [])
+    print(f"{'model':<6}{'ups':>4}{'max_side':>9}{'jit':>4}{'ms/img':>9}{'found':>8}{'mean d':>9}{'max d':>8}")
+    for opts in settings:
+        times, encs = run(images, opts)
+        found = sum(e is not None for e in encs)
+        dists = [float(np.linalg.norm(e - b)) for e, b in zip(encs, base_encs) if e is not None and b is not None]
+        mean_d = f"{np.mean(dists):.4f}" if dists else "-"
+        max_d = f"{np.max(dists):.4f}" if dists else "-"
+        print(f"{opts['model']:<6}{opts['upsample']:>4}{opts['max_side']:>9}{opts['jitters']:>4}"
+              f"{1000.0 * np.mean(times):>9.1f}{found:>5}/{len(images):<3}{mean_d:>8}{max_d:>8}")
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+# bench_matcher.py
+# ===========================================
+# Benchmark: exact vs. IVF (approximate) encoding index.
+# Uses synthetic 128-d encodings shaped like dlib's (identity centres ~0.9 apart,
+# same-person photos ~0.35 apart) and reports recall@1 of the IVF index against
+# the exact search, using the same 0.5 threshold as /attendance.
+#
+#   python bench_matcher.py                 # 1k / 10k / 100k encodings
+#   python bench_matcher.py --sizes 5000 --n-probe 4 16
+# ===========================================
+
+import argparse
+import time
+import numpy as np
+
+from encoding_index import EncodingIndex, IVFEncodingIndex
+
+THRESHOLD = 0.5           # same value used by attendance()
+PHOTOS_PER_STUDENT = 4
+CENTRE_STD = 0.056        # ~0.9 distance between two students
+PHOTO_STD = 0.022         # ~0.25 from the centre per photo
+
+
+def synthetic_roster(n_encodings, rng):
+    students = max(1, n_encodings // PHOTOS_PER_STUDENT)
+    centres = rng.normal(0.0, CENTRE_STD, size=(students, 128)).astype(np.float32)
+    roster = {}
+    for i in range(students):
+        photos = centres[i] + rng.normal(0.0, PHOTO_STD, size=(PHOTOS_PER_STUDENT, 128))
+        roster[f"student_{i}"] = list(photos.astype(np.float32))
+    return roster, centres
+
+
+def synthetic_queries(centres, n_queries, rng, unknown_ratio=0.1):
+    known = int(n_queries * (1 - unknown_ratio))
+    idx = rng.integers(0, len(centres), size=known)
+    q_known = centres[idx] + rng.normal(0.0, PHOTO_STD, size=(known, 128))
+    q_unknown = rng.normal(0.0, CENTRE_STD, size=(n_queries - known, 128))
+    return np.vstack([q_known, q_unknown]).astype(np.float32)
+
+
+def decide(index, q):
+    folder, dist = index.query(q)
+    return folder if dist < THRESHOLD else None
+
+
+def run(size, n_probes, n_queries, seed):
+    rng = np.random.default_rng(seed)
+    roster, centres = synthetic_roster(size, rng)
+    queries = synthetic_queries(centres, n_queries, rng)
+
+    exact = EncodingIndex.from_dict(roster)
+    t0 = time.perf_counter()
+    truth = [decide(exact, q) for q in queries]
+    exact_ms = (time.perf_counter() - t0) * 1000.0 / len(queries)
+    print(f"\n=== {size} encodings ({len(roster)} students, {len(queries)} queries) ===")
+    print(f"exact        {exact_ms:8.3f} ms/query   recall@1 1.000")
+
+    t0 = time.perf_counter()
+    ivf = IVFEncodingIndex.from_dict(roster, min_train=0)
+    build_s = time.perf_counter() - t0
+    print(f"ivf build    {build_s:8.2f} s  ({ivf.stats()['n_lists']} lists)")
+    for n_probe in n_probes:
+        ivf.n_probe = n_probe
+        t0 = time.perf_counter()
+        got = [decide(ivf, q) for q in queries]
+        ivf_ms = (time.perf_counter() - t0) * 1000.0 / len(queries)
+        recall = sum(a == b for a, b in zip(got, truth)) / len(truth)
+        print(f"ivf probe={n_probe:<3} {ivf_ms:8.3f} ms/query   recall@1 {recall:.3f}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Exact vs. IVF matcher benchmark")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--n-probe', type=int, nargs='+', default=[1, 4, 8, 16])
+    parser.add_argument('--queries', type=int, default=500)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    for size in args.sizes:
+        run(size, args.n_probe, args.queries, args.seed)
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+# consolidate.py
+# ===========================================
+# Per-student encoding consolidation for the matcher's search set.
+# The encoding store keeps every enrollment photo's raw encoding; the index
+# only needs a few representatives per folder:
+#   1. near-identical encodings (burst frames, re-saved photos) are dropped
+#      greedily: one is kept per group closer than dedupe_distance;
+#   2. folders with more than k + 1 distinct encodings are reduced to their
+#      centroid plus k medoids (actual photos spread over the folder's poses).
+# Consolidator keeps the raw rows per folder, so an enrollment recomputes
+# only that folder's representatives.
+#
+#   python consolidate.py [store base] [--dedupe 0.1] [--k 3]   # reduction / distance report
+# ===========================================
+
+import os
+import sys
+import argparse
+import threading
+import numpy as np
+
+ENCODING_DIM = 128
+DEDUPE_DISTANCE = 0.1       # dlib: same photo re-encoded ~0.0-0.05, different photos of one person ~0.3-0.45
+MEDOIDS = 3
+MATCH_THRESHOLD = 0.5       # same value used by /attendance
+
+
+def pairwise_distances(a, b):
+    """(len(a) x len(b)) Euclidean distances."""
+    d2 = np.einsum('ij,ij->i', a, a)[:, None] - 2.0 * (a @ b.T) + np.einsum('ij,ij->i', b, b)[None, :]
+    return np.sqrt(np.maximum(d2, 0.0))
+
+
+def dedupe(rows, min_distance=DEDUPE_DISTANCE):
+    """Indices of rows kept after dropping any row within min_distance of an earlier kept row."""
+    kept = []
+    for i in range(len(rows)):
+        if not kept or pairwise_distances(rows[i:i + 1], rows[kept]).min() >= min_distance:
+            kept.append(i)
+    return np.asarray(kept, dtype=np.int64)
+
+
+def k_medoids(rows, k, iterations=10):
+    """Indices of k medoids (seeded by the most central row, then farthest-point)."""
+    n = len(rows)
+    if n <= k:
+        return np.arange(n)
+    d = pairwise_distances(rows, rows)
+    medoids = [int(np.argmin(d.sum(axis=1)))]
+    while len(medoids) < k:
+        medoids.append(int(np.argmax(d[:, medoids].min(axis=1))))
+    for _ in range(iterations):
+        assign = np.argmin(d[:, medoids], axis=1)
+        updated = []
+        for j in range(k):
+            members = np.flatnonzero(assign == j)
+            updated.append(int(members[np.argmin(d[np.ix_(members, members)].sum(axis=1))]))
+        if updated == medoids:
+            break
+        medoids = updated
+    return np.asarray(medoids, dtype=np.int64)
+
+
+def representatives(rows, min_distance=DEDUPE_DISTANCE, k=MEDOIDS):
+    """Consolidated (M x dim) search rows for one folder's raw encodings."""
+    rows = np.asarray(rows, dtype=np.float32).reshape(-1, ENCODING_DIM)
+    if len(rows) == 0:
+        return rows
+    unique = rows[dedupe(rows, min_distance)]
+    if len(unique) <= k + 1:
+        return unique           # already small: keep every distinct photo
+    centroid = unique.mean(axis=0, keepdims=True)
+    return np.vstack([centroid, unique[k_medoids(unique, k)]]).astype(np.float32)
+
+
+class Consolidator:
+    """Raw encodings per folder and their representatives; thread-safe."""
+
+    def __init__(self, min_distance=DEDUPE_DISTANCE, k=MEDOIDS):
+        self.min_distance = min_distance
+        self.k = k
+        self._lock = threading.Lock()
+        self._raw = {}          # folder -> (n x dim) raw encodings
+        self._reps = {}         # folder -> (m x dim) representatives
+
+    def load(self, matrix, folders):
+        """Group (matrix, folders) from the store by folder and consolidate each one."""
+        raw = {}
+        if len(folders):
+            names, labels = np.unique(np.asarray(folders, dtype=object).astype(str), return_inverse=True)
+            data = np.asarray(matrix, dtype=np.float32)
+            for label, name in enumerate(names):
+                raw[str(name)] = data[labels == label]
+        reps = {folder: representatives(rows, self.min_distance, self.k) for folder, rows in raw.items()}
+        with self._lock:
+            self._raw, self._reps = raw, reps
+
+    def arrays(self):
+        """(matrix, folders) of every representative, for building the index."""
+        with self._lock:
+            folders = [folder for folder, reps in self._reps.items() for _ in range(len(reps))]
+            if not folders:
+                return np.empty((0, ENCODING_DIM), dtype=np.float32), []
+            return np.vstack(list(self._reps.values())), folders
+
+    def add(self, folder, encodings):
+        """Add raw encodings for one folder; returns that folder's new representatives."""
+        rows = np.asarray(encodings, dtype=np.float32).reshape(-1, ENCODING_DIM)
+        with self._lock:
+            current = self._raw.get(folder)
+            raw = rows if current is None else np.vstack([current, rows])
+            reps = representatives(raw, self.min_distance, self.k)
+            self._raw[folder] = raw
+            self._reps[folder] = reps
+        return reps
+
+    def remove(self, folder):
+        with self._lock:
+            self._raw.pop(folder, None)
+            self._reps.pop(folder, None)
+
+    def stats(self):
+        with self._lock:
+            raw = sum(len(r) for r in self._raw.values())
+            reps = sum(len(r) for r in self._reps.values())
+        return {
+            "raw_encodings": raw,
+            "representatives": reps,
+            "reduction": round(1.0 - reps / raw, 3) if raw else 0.0,
+            "dedupe_distance": self.min_distance,
+            "medoids": self.k,
+        }
+
+
+# ---------------- Report ----------------
+def _nearest_own_and_other(queries, query_labels, matrix, labels, exclude_self=False, chunk=256):
+    """For each query: distance to the nearest row of its own label and of any other label."""
+    own = np.full(len(queries), np.inf, dtype=np.float32)
+    other = np.full(len(queries), np.inf, dtype=np.float32)
+    for start in range(0, len(queries), chunk):
+        q = queries[start:start + chunk]
+        d = pairwise_distances(q, matrix)
+        same = query_labels[start:start + chunk, None] == labels[None, :]
+        d_own = np.where(same, d, np.inf)
+        if exclude_self:
+            d_own[np.arange(len(q)), np.arange(start, start + len(q))] = np.inf
+        own[start:start + len(q)] = d_own.min(axis=1)
+        other[start:start + len(q)] = np.where(same, np.inf, d).min(axis=1)
+    return own, other
+
+
+def report(matrix, folders, min_distance=DEDUPE_DISTANCE, k=MEDOIDS, threshold=MATCH_THRESHOLD):
+    """
+    Search-set reduction and distance change. Every raw encoding is used as a
+    query, leave one out: its own folder's raw rows and representatives are
+    taken without it, so a kept photo never matches itself.
+    """
+    raw = np.asarray(matrix, dtype=np.float32)
+    names, raw_labels = np.unique(np.asarray(folders, dtype=object).astype(str), return_inverse=True)
+    consolidator = Consolidator(min_distance, k)
+    consolidator.load(raw, folders)
+    reps, rep_folders = consolidator.arrays()
+    label_ids = {str(name): i for i, name in enumerate(names)}
+    rep_labels = np.asarray([label_ids[f] for f in rep_folders], dtype=np.int64)
+
+    raw_own, raw_other = _nearest_own_and_other(raw, raw_labels, raw, raw_labels, exclude_self=True)
+    _, rep_other = _nearest_own_and_other(raw, raw_labels, reps, rep_labels)
+    rep_own = np.full(len(raw), np.inf, dtype=np.float32)
+    for label in range(len(names)):
+        idx = np.flatnonzero(raw_labels == label)
+        if len(idx) < 2:
+            continue
+        for j, i in enumerate(idx):
+            held_out = representatives(raw[np.delete(idx, j)], min_distance, k)
+            rep_own[i] = pairwise_distances(raw[i:i + 1], held_out).min()
+    has_peer = np.isfinite(raw_own)
+
+    def summary(own, other):
+        correct = own < other
+        return {
+            "own_mean": round(float(own[has_peer].mean()), 4) if has_peer.any() else None,
+            "own_p95": round(float(np.percentile(own[has_peer], 95)), 4) if has_peer.any() else None,
+            "impostor_mean": round(float(other[np.isfinite(other)].mean()), 4) if np.isfinite(other).any() else None,
+            "rank1_correct": round(float(correct[has_peer].mean()), 4) if has_peer.any() else None,
+            "accepted_own": round(float(((own < threshold) & correct)[has_peer].mean()), 4) if has_peer.any() else None,
+            "accepted_impostor": int(((other < threshold) & ~correct).sum()),
+        }
+
+    return {
+        "folders": len(names),
+        "raw_encodings": len(raw),
+        "representatives": len(reps),
+        "reduction": round(1.0 - len(reps) / len(raw), 3) if len(raw) else 0.0,
+        "raw": summary(raw_own, raw_other),
+        "consolidated": summary(rep_own, rep_other),
+    }
+
+
+if __name__ == '__main__':
+    from encoding_store import EncodingStore
+
+    parser = argparse.ArgumentParser(description="Encoding consolidation report")
+    parser.add_argument('store', nargs='?', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "face_encodings"))
+    parser.add_argument('--dedupe', type=float, default=DEDUPE_DISTANCE)
+    parser.add_argument('--k', type=int, default=MEDOIDS)
+    args = parser.parse_args()
+
+    matrix, folders = EncodingStore(args.store).arrays()
+    if not folders:
+        print(f"No encodings in {args.store}")
+        sys.exit(1)
+    r = report(matrix, folders, args.dedupe, args.k)
+    print(f"📉 Search set: {r['raw_encodings']} raw -> {r['representatives']} representatives "
+          f"for {r['folders']} folders ({100 * r['reduction']:.1f}% smaller)")
+    print(f"{'':<14}{'own mean':>10}{'own p95':>10}{'impostor':>10}{'rank-1':>9}{'accepted':>10}{'false acc':>11}")
+    for name in ("raw", "consolidated"):
+        s = r[name]
+        print(f"{name:<14}{s['own_mean']!s:>10}{s['own_p95']!s:>10}{s['impostor_mean']!s:>10}"
+              f"{s['rank1_correct']!s:>9}{s['accepted_own']!s:>10}{s['accepted_impostor']:>11}")
+    print("own = distance to the nearest encoding of the same student (leaving the photo itself out), "
+          "impostor = nearest other student, accepted = own match under the 0.5 threshold")
@@ -0,0 +1,406 @@
+#!/usr/bin/env python3
+# encoding_index.py
+# ===========================================
+# In-memory face encoding index used by the /attendance matcher.
+# Keeps every known encoding in one contiguous float32 (N x 128) matrix
+# with a parallel int label array, so a lookup is a single vectorized
+# distance computation instead of rebuilding Python lists per request.
+# IVFEncodingIndex adds an optional approximate (k-means partitioned) mode
+# for very large enrollments.
+# Removed and replaced rows are tombstoned (label -1, infinite norm, so they
+# never win a lookup) and the matrix is compacted once they pass a fraction
+# of it, instead of copying the whole matrix on every enrollment.
+# ===========================================
+
+import threading
+import numpy as np
+
+ENCODING_DIM = 128
+DEAD_LABEL = -1
+COMPACT_DEAD_FRACTION = 0.25
+
+
+class EncodingIndex:
+    """Contiguous float32 encoding matrix + int labels with add/remove/query."""
+
+    def __init__(self, dim=ENCODING_DIM, capacity=1024, compact_fraction=COMPACT_DEAD_FRACTION):
+        self.dim = dim
+        self.compact_fraction = compact_fraction
+        self._matrix = np.empty((max(1, capacity), dim), dtype=np.float32)
+        self._sq_norms = np.empty(max(1, capacity), dtype=np.float32)
+        self._labels = np.empty(max(1, capacity), dtype=np.int32)
+        self._size = 0
+        self._dead = 0              # tombstoned rows still in [0, _size)
+        self._label_names = []      # label id -> folder name
+        self._label_ids = {}        # folder name -> label id
+        self._lock = threading.RLock()
+
+    @classmethod
+    def from_dict(cls, encodings_by_folder, dim=ENCODING_DIM, **kwargs):
+        """Build an index from a {folder: [encoding, ...]} dict."""
+        folders, rows = [], []
+        for folder, encs in encodings_by_folder.items():
+            for enc in encs:
+                folders.append(folder)
+                rows.append(enc)
+        matrix = np.asarray(rows, dtype=np.float32).reshape(-1, dim)
+        return cls.from_arrays(matrix, folders, dim=dim, **kwargs)
+
+    @classmethod
+    def from_arrays(cls, matrix, folders, dim=ENCODING_DIM, **kwargs):
+        """Bulk-build from an (N x dim) matrix (e.g. the store's memmap) and N folder names."""
+        index = cls(dim=dim, capacity=max(1024, len(folders)), **kwargs)
+        index._bulk_load(matrix, folders)
+        return index
+
+    def _bulk_load(self, matrix, folders):
+        n = len(folders)
+        if n == 0:
+            return
+        names, labels = np.unique(np.asarray(folders, dtype=object).astype(str), return_inverse=True)
+        with self._lock:
+            self._grow(n)
+            self._matrix[:n] = matrix[:n]
+            self._sq_norms[:n] = np.einsum('ij,ij->i', self._matrix[:n], self._matrix[:n])
+            self._labels[:n] = labels
+            self._label_names = [str(name) for name in names]
+            self._label_ids = {name: i for i, name in enumerate(self._label_names)}
+            self._size = n
+
+    # ---------------- Mutation ----------------
+    def _grow(self, needed):
+        capacity = self._matrix.shape[0]
+        if needed <= capacity:
+            return
+        new_cap = capacity
+        while new_cap < needed:
+            new_cap *= 2
+        matrix = np.empty((new_cap, self.dim), dtype=np.float32)
+        sq_norms = np.empty(new_cap, dtype=np.float32)
+        labels = np.empty(new_cap, dtype=np.int32)
+        matrix[:self._size] = self._matrix[:self._size]
+        sq_norms[:self._size] = self._sq_norms[:self._size]
+        labels[:self._size] = self._labels[:self._size]
+        self._matrix, self._sq_norms, self._labels = matrix, sq_norms, labels
+
+    def add(self, folder, encodings):
+        """Append one or more encodings for a folder. Returns number of rows added."""
+        rows = np.asarray(encodings, dtype=np.float32).reshape(-1, self.dim)
+        if rows.shape[0] == 0:
+            return 0
+        with self._lock:
+            label = self._label_ids.get(folder)
+            if label is None:
+                label = len(self._label_names)
+                self._label_names.append(folder)
+                self._label_ids[folder] = label
+            start, end = self._size, self._size + rows.shape[0]
+            self._grow(end)
+            self._matrix[start:end] = rows
+            self._sq_norms[start:end] = np.einsum('ij,ij->i', rows, rows)
+            self._labels[start:end] = label
+            self._size = end
+        return rows.shape[0]
+
+    def remove(self, folder):
+        """Drop every encoding of a folder (tombstoned; compacted lazily)."""
+        with self._lock:
+            label = self._label_ids.pop(folder, None)
+            if label is None:
+                return 0
+            self._label_names[label] = None
+            rows = np.flatnonzero(self._labels[:self._size] == label)
+            self._tombstone(rows)
+            self._maybe_compact()
+            return int(rows.size)
+
+    def replace(self, folder, encodings):
+        """
+        Swap a folder's encodings for new ones; queries never see the folder missing.
+        The folder's rows are overwritten in place when the count hasn't grown
+        (surplus rows are tombstoned); otherwise the old rows are tombstoned and
+        the new ones appended.
+        """
+        new = np.asarray(encodings, dtype=np.float32).reshape(-1, self.dim)
+        with self._lock:
+            label = self._label_ids.get(folder)
+            if label is None:
+                return self.add(folder, new)
+            rows = np.flatnonzero(self._labels[:self._size] == label)
+            if new.shape[0] == 0 or new.shape[0] > rows.size:
+                self._tombstone(rows)
+                added = self.add(folder, new) if new.shape[0] else 0
+                if not added:
+                    self._label_ids.pop(folder, None)
+                    self._label_names[label] = None
+                self._maybe_compact()
+                return added
+            rows, surplus = rows[:new.shape[0]], rows[new.shape[0]:]
+            fits = self._fits_in_place(rows, new)
+            self._matrix[rows[fits]] = new[fits]
+            self._sq_norms[rows[fits]] = np.einsum('ij,ij->i', new[fits], new[fits])
+            self._tombstone(np.concatenate([surplus, rows[~fits]]))
+            if not fits.all():
+                self.add(folder, new[~fits])
+            self._maybe_compact()
+            return new.shape[0]
+
+    def _fits_in_place(self, rows, new):
+        """Mask of rows that may be overwritten by the matching new encodings."""
+        return np.ones(rows.size, dtype=bool)
+
+    def _tombstone(self, rows):
+        if rows.size == 0:
+            return
+        self._labels[rows] = DEAD_LABEL
+        self._sq_norms[rows] = np.inf
+        self._matrix[rows] = 0.0
+        self._dead += int(rows.size)
+
+    def _maybe_compact(self):
+        if self._dead and self._dead >= self.compact_fraction * self._size:
+            self.compact()
+
+    def compact(self):
+        """Drop tombstoned rows from the matrix. Returns the number dropped."""
+        with self._lock:
+            dead = self._dead
+            if dead:
+                self._compact(self._labels[:self._size] != DEAD_LABEL)
+            return dead
+
+    def _compact(self, keep):
+        kept = int(np.count_nonzero(keep))
+        self._matrix[:kept] = self._matrix[:self._size][keep]
+        self._sq_norms[:kept] = self._sq_norms[:self._size][keep]
+        self._labels[:kept] = self._labels[:self._size][keep]
+        self._size = kept
+        self._dead = 0
+
+    def rebuild(self):
+        """Compact tombstoned rows; the exact index has nothing else to retrain."""
+        self.compact()
+        return self.stats()
+
+    # ---------------- Lookup ----------------
+    def distances(self, encoding):
+        """Euclidean distance from one encoding to every row (same as face_recognition.face_distance)."""
+        q = np.asarray(encoding, dtype=np.float32).reshape(self.dim)
+        with self._lock:
+            n = self._size
+            d2 = self._sq_norms[:n] - 2.0 * (self._matrix[:n] @ q) + float(q @ q)
+        np.maximum(d2, 0.0, out=d2)
+        return np.sqrt(d2)
+
+    def query(self, encoding):
+        """Return (folder, distance) of the nearest encoding, or (None, inf) when empty."""
+        with self._lock:
+            if self._size == self._dead:
+                return None, float('inf')
+            d = self.distances(encoding)
+            best = int(np.argmin(d))
+            return self._label_names[self._labels[best]], float(d[best])
+
+    def query_many(self, encodings):
+        """Nearest (folder, distance) for each row of a (Q x dim) batch in one matrix product."""
+        q = np.asarray(encodings, dtype=np.float32).reshape(-1, self.dim)
+        with self._lock:
+            n = self._size
+            if n == self._dead or q.shape[0] == 0:
+                return [(None, float('inf'))] * q.shape[0]
+            d2 = self._sq_norms[None, :n] - 2.0 * (q @ self._matrix[:n].T) + np.einsum('ij,ij->i', q, q)[:, None]
+            best = np.argmin(d2, axis=1)
+            best_d = np.sqrt(np.maximum(d2[np.arange(q.shape[0]), best], 0.0))
+            return [(self._label_names[self._labels[b]], float(d)) for b, d in zip(best, best_d)]
+
+    def folder_name(self, label):
+        return self._label_names[label]
+
+    def labels(self):
+        """Int label array, DEAD_LABEL for tombstoned rows (a view; do not mutate)."""
+        return self._labels[:self._size]
+
+    def matrix(self):
+        """Encoding matrix, zero rows where tombstoned (a view; do not mutate)."""
+        return self._matrix[:self._size]
+
+    def __len__(self):
+        return self._size - self._dead
+
+    def stats(self):
+        with self._lock:
+            return {
+                "mode": "exact",
+                "encodings": int(self._size - self._dead),
+                "dead_rows": int(self._dead),
+                "folders": len(self._label_ids),
+                "dim": self.dim,
+                "capacity": int(self._matrix.shape[0]),
+                "matrix_bytes": int(self._matrix.nbytes),
+            }
+
+
+# ---------------- Approximate (IVF) mode ----------------
+def kmeans(data, k, iterations=10, seed=0):
+    """Plain Lloyd's k-means in NumPy. Returns float32 centroids (k x dim)."""
+    rng = np.random.default_rng(seed)
+    data = np.asarray(data, dtype=np.float32)
+    k = max(1, min(k, data.shape[0]))
+    centroids = data[rng.choice(data.shape[0], k, replace=False)].copy()
+    data_sq = np.einsum('ij,ij->i', data, data)
+    for _ in range(iterations):
+        assign = _nearest(data, data_sq, centroids)
+        counts = np.bincount(assign, minlength=k)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, data)
+        empty = counts == 0
+        centroids[~empty] = sums[~empty] / counts[~empty, None]
+        if empty.any():
+            centroids[empty] = data[rng.choice(data.shape[0], int(empty.sum()), replace=False)]
+    return centroids
+
+
+def _nearest(data, data_sq, centroids):
+    c_sq = np.einsum('ij,ij->i', centroids, centroids)
+    d2 = data_sq[:, None] - 2.0 * (data @ centroids.T) + c_sq[None, :]
+    return np.argmin(d2, axis=1).astype(np.int32)
+
+
+class IVFEncodingIndex(EncodingIndex):
+    """
+    Inverted-file approximate index. Rows are clustered with k-means and stored
+    sorted by cluster, so a query only scans the n_probe closest clusters.
+    Rows added after the last rebuild sit in an unclustered tail that is always
+    scanned exactly; once the tail grows past rebuild_after rows the lists are
+    retrained automatically.
+    """
+
+    def __init__(self, dim=ENCODING_DIM, capacity=1024, n_lists=None, n_probe=8,
+                 min_train=2048, rebuild_after=4096, train_sample=20000,
+                 compact_fraction=COMPACT_DEAD_FRACTION):
+        super().__init__(dim=dim, capacity=capacity, compact_fraction=compact_fraction)
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.min_train = min_train
+        self.rebuild_after = rebuild_after
+        self.train_sample = train_sample
+        self._centroids = None
+        self._offsets = None        # list c occupies rows [offsets[c], offsets[c+1])
+        self._assign = np.empty(self._labels.shape[0], dtype=np.int32)
+        self._indexed = 0           # rows [0, _indexed) are clustered
+
+    @classmethod
+    def from_arrays(cls, matrix, folders, dim=ENCODING_DIM, **kwargs):
+        index = super().from_arrays(matrix, folders, dim=dim, **kwargs)
+        index.rebuild()
+        return index
+
+    def _grow(self, needed):
+        super()._grow(needed)
+        if self._assign.shape[0] < self._labels.shape[0]:
+            assign = np.empty(self._labels.shape[0], dtype=np.int32)
+            assign[:self._size] = self._assign[:self._size]
+            self._assign = assign
+
+    def _compact(self, keep):
+        kept_assign = self._assign[:self._size][keep]
+        indexed_kept = int(np.count_nonzero(keep[:self._indexed]))
+        super()._compact(keep)
+        self._assign[:self._size] = kept_assign
+        self._indexed = indexed_kept
+        if self._centroids is not None:
+            self._offsets = np.searchsorted(self._assign[:self._indexed],
+                                            np.arange(len(self._centroids) + 1)).astype(np.int64)
+
+    def _fits_in_place(self, rows, new):
+        # A clustered row keeps its list, so only overwrite it with an encoding
+        # nearest to that same list; the rest go to the exactly-scanned tail.
+        fits = rows >= self._indexed
+        if self._centroids is not None and not fits.all():
+            nearest = _nearest(new, np.einsum('ij,ij->i', new, new), self._centroids)
+            fits |= nearest == self._assign[rows]
+        return fits
+
+    def add(self, folder, encodings):
+        added = super().add(folder, encodings)
+        if added and self._size - self._indexed >= self.rebuild_after:
+            self.rebuild()
+        return added
+
+    def rebuild(self):
+        """(Re)train k-means lists over every live row and re-sort the matrix by list."""
+        with self._lock:
+            self.compact()
+            n = self._size
+            if n < self.min_train:
+                self._centroids, self._offsets, self._indexed = None, None, 0
+                return self.stats()
+            k = self.n_lists or max(1, int(np.sqrt(n)))
+            data = self._matrix[:n]
+            sample = data
+            if n > self.train_sample:
+                pick = np.random.default_rng(0).choice(n, self.train_sample, replace=False)
+                sample = data[pick]
+            centroids = kmeans(sample, k)
+            assign = _nearest(data, self._sq_norms[:n], centroids)
+            order = np.argsort(assign, kind='stable')
+            self._matrix[:n] = data[order]
+            self._sq_norms[:n] = self._sq_norms[:n][order]
+            self._labels[:n] = self._labels[:n][order]
+            self._assign[:n] = assign[order]
+            self._centroids = centroids
+            self._offsets = np.searchsorted(self._assign[:n], np.arange(len(centroids) + 1)).astype(np.int64)
+            self._indexed = n
+            return self.stats()
+
+    def _candidate_rows(self, q):
+        """Row indices of the n_probe nearest lists plus the unclustered tail."""
+        c_d2 = np.einsum('ij,ij->i', self._centroids, self._centroids) - 2.0 * (self._centroids @ q)
+        probe = min(self.n_probe, len(self._centroids))
+        lists = np.argpartition(c_d2, probe - 1)[:probe]
+        parts = [np.arange(self._offsets[c], self._offsets[c + 1]) for c in lists]
+        parts.append(np.arange(self._indexed, self._size))
+        return np.concatenate(parts)
+
+    def query(self, encoding):
+        with self._lock:
+            if self._size == self._dead:
+                return None, float('inf')
+            if self._centroids is None:
+                return super().query(encoding)
+            q = np.asarray(encoding, dtype=np.float32).reshape(self.dim)
+            rows = self._candidate_rows(q)
+            if rows.size == 0:
+                return super().query(encoding)
+            d2 = self._sq_norms[rows] - 2.0 * (self._matrix[rows] @ q) + float(q @ q)
+            best = int(np.argmin(d2))
+            if not np.isfinite(d2[best]):
+                return super().query(encoding)     # probed lists hold only tombstoned rows
+            return self._label_names[self._labels[rows[best]]], float(np.sqrt(max(d2[best], 0.0)))
+
+    def query_many(self, encodings):
+        if self._centroids is None:
+            return super().query_many(encodings)
+        q = np.asarray(encodings, dtype=np.float32).reshape(-1, self.dim)
+        return [self.query(row) for row in q]
+
+    def stats(self):
+        with self._lock:
+            info = super().stats()
+            info.update({
+                "mode": "ivf",
+                "n_lists": 0 if self._centroids is None else int(len(self._centroids)),
+                "n_probe": self.n_probe,
+                "indexed": int(self._indexed),
+                "unclustered": int(self._size - self._indexed),
+            })
+            return info
+
+
+def make_index(mode, matrix, folders, **kwargs):
+    """Build the matcher index for the configured mode ("exact" or "ivf")."""
+    if mode == "ivf":
+        return IVFEncodingIndex.from_arrays(matrix, folders, **kwargs)
+    if mode != "exact":
+        print(f"⚠️ Unknown matcher mode '{mode}', falling back to exact.")
+    return EncodingIndex.from_arrays(matrix, folders)
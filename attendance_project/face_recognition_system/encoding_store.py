@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+# encoding_store.py
+# ===========================================
+# Append-only binary store for face encodings (replaces face_encodings.pkl).
+#
+#   <base>.f32      fixed-width float32 records (dim values each), opened with np.memmap
+#   <base>.labels   one folder name per record (UTF-8, newline separated)
+#   <base>.deleted  tombstones "<folder>\t<n>": records of <folder> before row n are dead
+#   <base>.hashes   "<sha1>\t<folder>" per source image already encoded (bulk enrollment skips these)
+#
+# Appends are O(1) (one write to each file), startup maps the records without
+# unpickling, and compact() rewrites the files without dead rows.
+#
+#   python encoding_store.py info    [base]
+#   python encoding_store.py compact [base]
+#   python encoding_store.py migrate [base] [face_encodings.pkl]
+# ===========================================
+
+import os
+import sys
+import pickle
+import hashlib
+import tempfile
+import threading
+import traceback
+from collections import Counter
+import numpy as np
+
+ENCODING_DIM = 128
+
+
+def content_hash(path, chunk_size=1 << 20):
+    """SHA-1 of a file's bytes (identifies a source image regardless of its name)."""
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk_size), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def normalize_encodings(value):
+    """Coerce one pickle value (None / array / list / tuple) into a list of encodings."""
+    if value is None:
+        return []
+    if isinstance(value, np.ndarray):
+        return [value] if value.ndim == 1 else list(value)
+    if isinstance(value, (list, tuple)):
+        return list(value)
+    return [value]
+
+
+class EncodingStore:
+    """Memory-mapped float32 record file + folder label sidecar."""
+
+    def __init__(self, base_path, dim=ENCODING_DIM):
+        self.base_path = base_path
+        self.dim = dim
+        self.data_path = base_path + ".f32"
+        self.labels_path = base_path + ".labels"
+        self.deleted_path = base_path + ".deleted"
+        self.hashes_path = base_path + ".hashes"
+        self._record_bytes = dim * 4
+        self._lock = threading.Lock()
+        self._folders = []          # label per record
+        self._tombstones = []       # (folder, upto_row)
+        self.folder_counts = Counter()
+        self.load()
+
+    # ---------------- Loading ----------------
+    def load(self):
+        """Read the label sidecar and tombstones; repair a torn tail if needed."""
+        with self._lock:
+            folders = []
+            if os.path.exists(self.labels_path):
+                with open(self.labels_path, "r", encoding="utf-8") as f:
+                    folders = f.read().split("\n")
+                if folders and folders[-1] == "":
+                    folders.pop()
+            data_size = os.path.getsize(self.data_path) if os.path.exists(self.data_path) else 0
+            rows = data_size // self._record_bytes
+            n = min(rows, len(folders))
+            if data_size != n * self._record_bytes or len(folders) != n:
+                print(f"⚠️ Encoding store tail mismatch (records={rows}, labels={len(folders)}); truncating to {n}.")
+                folders = folders[:n]
+                if os.path.exists(self.data_path):
+                    os.truncate(self.data_path, n * self._record_bytes)
+                self._atomic_write_text(self.labels_path, "".join(f + "\n" for f in folders))
+
+            tombstones = []
+            if os.path.exists(self.deleted_path):
+                with open(self.deleted_path, "r", encoding="utf-8") as f:
+                    for line in f:
+                        folder, _, upto = line.rstrip("\n").rpartition("\t")
+                        if folder and upto.isdigit():
+                            tombstones.append((folder, int(upto)))
+
+            self._folders = folders
+            self._tombstones = tombstones
+            self.folder_counts = Counter(f for f, alive in zip(folders, self._live_mask()) if alive)
+
+    def _live_mask(self):
+        mask = np.ones(len(self._folders), dtype=bool)
+        if self._tombstones and self._folders:
+            labels = np.asarray(self._folders)
+            rows = np.arange(len(self._folders))
+            for folder, upto in self._tombstones:
+                mask &= ~((labels == folder) & (rows < upto))
+        return mask
+
+    def arrays(self):
+        """
+        Return (matrix, folders) of live records. The matrix is a read-only memmap
+        of the data file when nothing has been deleted (zero-copy), otherwise a
+        compacted in-memory copy.
+        """
+        with self._lock:
+            n = len(self._folders)
+            if n == 0:
+                return np.empty((0, self.dim), dtype=np.float32), []
+            matrix = np.memmap(self.data_path, dtype=np.float32, mode='r', shape=(n, self.dim))
+            if not self._tombstones:
+                return matrix, list(self._folders)
+            mask = self._live_mask()
+            return np.asarray(matrix[mask]), [f for f, alive in zip(self._folders, mask) if alive]
+
+    # ---------------- Mutation ----------------
+    def append(self, folder, encodings):
+        """Append encodings for one folder (O(1): one write per file). Returns rows written."""
+        rows = np.asarray(encodings, dtype=np.float32).reshape(-1, self.dim)
+        return self.append_many([folder] * rows.shape[0], rows)
+
+    def append_many(self, folders, matrix):
+        """Bulk append: one write for every record in matrix, labelled by folders."""
+        rows = np.ascontiguousarray(matrix, dtype=np.float32).reshape(-1, self.dim)
+        if rows.shape[0] == 0:
+            return 0
+        if len(folders) != rows.shape[0]:
+            raise ValueError("folders and matrix rows differ in length")
+        if any("\n" in f or "\t" in f for f in folders):
+            raise ValueError("folder names may not contain tabs or newlines")
+        with self._lock:
+            # Data first: a crash between the two writes leaves extra records,
+            # which load() trims back to the label count.
+            with open(self.data_path, "ab") as f:
+                f.write(rows.tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+            with open(self.labels_path, "a", encoding="utf-8") as f:
+                f.write("".join(folder + "\n" for folder in folders))
+                f.flush()
+                os.fsync(f.fileno())
+            self._folders.extend(folders)
+            self.folder_counts.update(folders)
+        return rows.shape[0]
+
+    def record_hashes(self, pairs):
+        """Remember (sha1, folder) of source images whose encodings are in the store."""
+        if not pairs:
+            return
+        with self._lock:
+            with open(self.hashes_path, "a", encoding="utf-8") as f:
+                f.write("".join(f"{h}\t{folder}\n" for h, folder in pairs))
+                f.flush()
+                os.fsync(f.fileno())
+
+    def encoded_hashes(self):
+        """{sha1: folder} for source images of folders that still have live records."""
+        known = {}
+        if os.path.exists(self.hashes_path):
+            with open(self.hashes_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    h, _, folder = line.rstrip("\n").partition("\t")
+                    if folder and self.folder_counts.get(folder):
+                        known[h] = folder
+        return known
+
+    def remove(self, folder):
+        """Tombstone every current record of a folder (dropped on the next compact)."""
+        with self._lock:
+            if not self.folder_counts.get(folder):
+                return 0
+            with open(self.deleted_path, "a", encoding="utf-8") as f:
+                f.write(f"{folder}\t{len(self._folders)}\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self._tombstones.append((folder, len(self._folders)))
+            return self.folder_counts.pop(folder)
+
+    def compact(self):
+        """Rewrite data + labels without dead records and clear tombstones."""
+        matrix, folders = self.arrays()
+        with self._lock:
+            dead = len(self._folders) - len(folders)
+            fd, tmp_path = tempfile.mkstemp(suffix=".f32", dir=os.path.dirname(self.data_path) or ".")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(np.ascontiguousarray(matrix, dtype=np.float32).tobytes())
+                    f.flush()
+                    os.fsync(f.fileno())
+                del matrix
+                os.replace(tmp_path, self.data_path)
+            finally:
+                if os.path.exists(tmp_path):
+                    try:
+                        os.remove(tmp_path)
+                    except Exception:
+                        pass
+            self._atomic_write_text(self.labels_path, "".join(f + "\n" for f in folders))
+            if os.path.exists(self.deleted_path):
+                os.remove(self.deleted_path)
+            self._folders = folders
+            self._tombstones = []
+            self.folder_counts = Counter(folders)
+        print(f"✅ Encoding store compacted: {len(folders)} records kept, {dead} dropped.")
+        return dead
+
+    def _atomic_write_text(self, path, text):
+        fd, tmp_path = tempfile.mkstemp(suffix=".tmp", dir=os.path.dirname(path) or ".")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(text)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                try:
+                    os.remove(tmp_path)
+                except Exception:
+                    pass
+
+    # ---------------- Migration ----------------
+    def migrate_from_pickle(self, pickle_path):
+        """One-shot import of the legacy {folder: encodings} pickle into an empty store."""
+        if len(self) or not os.path.exists(pickle_path):
+            return 0
+        try:
+            with open(pickle_path, "rb") as f:
+                legacy = pickle.load(f) or {}
+        except Exception as e:
+            print("⚠️ Failed to read legacy encodings pickle:", e)
+            print(traceback.format_exc())
+            return 0
+        folders, rows = [], []
+        for folder, value in legacy.items():
+            for enc in normalize_encodings(value):
+                folders.append(str(folder))
+                rows.append(np.asarray(enc, dtype=np.float32).reshape(self.dim))
+        if not rows:
+            return 0
+        written = self.append_many(folders, np.vstack(rows))
+        print(f"✅ Migrated {written} encodings for {len(legacy)} folders from {pickle_path}.")
+        return written
+
+    # ---------------- Info ----------------
+    def __len__(self):
+        return sum(self.folder_counts.values())
+
+    def stats(self):
+        return {
+            "records": len(self._folders),
+            "live": len(self),
+            "folders": len(self.folder_counts),
+            "tombstones": len(self._tombstones),
+            "data_file": self.data_path,
+        }
+
+
+if __name__ == '__main__':
+    cur_dir = os.path.dirname(os.path.abspath(__file__))
+    command = sys.argv[1] if len(sys.argv) > 1 else "info"
+    base = sys.argv[2] if len(sys.argv) > 2 else os.path.join(cur_dir, "face_encodings")
+    store = EncodingStore(base)
+    if command == "compact":
+        store.compact()
+    elif command == "migrate":
+        pkl = sys.argv[3] if len(sys.argv) > 3 else base + ".pkl"
+        store.migrate_from_pickle(pkl)
+    elif command != "info":
+        print(f"Unknown command '{command}'. Use info, compact or migrate.")
+        sys.exit(2)
+    print(store.stats())
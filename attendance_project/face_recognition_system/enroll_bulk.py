@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+# enroll_bulk.py
+# ===========================================
+# Bulk enrollment / re-encoding over student_data/<name>_<id>/ folders.
+# Images are encoded in parallel across all cores (same detect + encode path
+# as /save_image), images whose content hash is already in the store are
+# skipped, and all new encodings are written to the encoding store in one
+# bulk append. Folders are also registered on the roster.
+#
+#   python enroll_bulk.py                       # encode new images under ../student_data
+#   python enroll_bulk.py --rebuild             # drop and re-encode every folder found
+#   python enroll_bulk.py path/to/student_data --workers 4 --dry-run
+#   python enroll_bulk.py --rebuild --folder Name_ID   # re-encode one folder
+#
+# Folders that have live records but no recorded image hashes (migrated from
+# face_encodings.pkl) are treated as encoded up to their record count: the
+# oldest images (by mtime), one per live record, get their hashes backfilled
+# and any newer images are encoded. Use --rebuild (optionally with --folder)
+# to re-encode them from the images.
+#
+# A running face app picks the new encodings up on POST /api/face/index/rebuild
+# (or on restart).
+# ===========================================
+
+import os
+import sys
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+import face_workers
+from encoding_store import EncodingStore, content_hash
+from roster_store import RosterStore
+
+CUR_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_STUDENT_DATA = os.path.join(CUR_DIR, "..", "student_data")
+DEFAULT_STORE = os.path.join(CUR_DIR, "face_encodings")
+DEFAULT_ROSTER = os.path.join(CUR_DIR, "roster.db")
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+
+
+def scan(student_data, folders=None):
+    """[(folder, image path)] for every image under student_data/<folder>/, sorted."""
+    jobs = []
+    for folder in sorted(os.listdir(student_data)):
+        folder_path = os.path.join(student_data, folder)
+        if not os.path.isdir(folder_path) or (folders and folder not in folders):
+            continue
+        for name in sorted(os.listdir(folder_path)):
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                jobs.append((folder, os.path.join(folder_path, name)))
+    return jobs
+
+
+def _encode_job(job):
+    """Worker: (folder, path, sha1, opts) -> (folder, path, sha1, encoding or None, error)."""
+    folder, path, digest, opts = job
+    try:
+        faces, _, _ = face_workers.encode_image_file(path, opts=opts)
+    except Exception as e:
+        return folder, path, digest, None, str(e) or "Could not process image"
+    return folder, path, digest, (faces[0][1] if faces else None), None
+
+
+class Progress:
+    def __init__(self, total, every=0.5):
+        self.total = total
+        self.done = 0
+        self.every = every
+        self.t0 = time.time()
+        self._last = 0.0
+
+    def step(self, n=1):
+        self.done += n
+        now = time.time()
+        if now - self._last >= self.every or self.done == self.total:
+            self._last = now
+            rate = self.done / max(now - self.t0, 1e-9)
+            eta = (self.total - self.done) / rate if rate else 0.0
+            sys.stdout.write(f"\r⏳ {self.done}/{self.total} images "
+                             f"({100.0 * self.done / self.total:5.1f}%) {rate:6.1f} img/s, ETA {eta:5.0f}s")
+            sys.stdout.flush()
+            if self.done == self.total:
+                sys.stdout.write("\n")
+
+
+def enroll(student_data, store, roster=None, workers=None, opts=None, rebuild=False, folders=None, dry_run=False):
+    """Encode new images and bulk-append them to store. Returns a summary dict."""
+    t0 = time.time()
+    opts = dict(face_workers.DEFAULT_DETECT_OPTS, **(opts or {}))
+    images = scan(student_data, folders)
+    known = {} if rebuild else store.encoded_hashes()
+    # Live folders without any recorded hash predate the hash file (legacy migration).
+    hashed = set(known.values())
+    legacy = set() if rebuild else {f for f, _ in images if store.folder_counts.get(f) and f not in hashed}
+    # Their oldest images, one per live record, are assumed to be the encoded ones.
+    assumed = set()
+    for folder in legacy:
+        paths = sorted((p for f, p in images if f == folder), key=lambda p: (os.path.getmtime(p), p))
+        assumed.update(paths[:store.folder_counts[folder]])
+
+    pending, backfill, skipped, seen = [], [], 0, set()
+    for folder, path in images:
+        digest = content_hash(path)
+        if path in assumed:
+            backfill.append((digest, folder))
+            seen.add((folder, digest))
+            skipped += 1
+            continue
+        if digest in known or (folder, digest) in seen:
+            skipped += 1
+            continue
+        seen.add((folder, digest))
+        pending.append((folder, path, digest, opts))
+    print(f"📁 {len(images)} images in {len({f for f, _ in images})} folders; "
+          f"{skipped} already encoded, {len(pending)} to encode.")
+    if legacy:
+        print(f"📎 {len(legacy)} folders have encodings but no image hashes (legacy); "
+              f"{len(backfill)} oldest images treated as encoded, use --rebuild to re-encode them.")
+        if not dry_run:
+            store.record_hashes(backfill)
+
+    summary = {"images": len(images), "skipped": skipped, "encoded": 0, "no_face": 0, "failed": 0,
+               "folders": 0, "legacy_folders": len(legacy), "roster_added": 0, "seconds": 0.0}
+    if dry_run or not pending:
+        summary["seconds"] = round(time.time() - t0, 1)
+        return summary
+
+    workers = max(1, workers or os.cpu_count() or 1)
+    results = []
+    progress = Progress(len(pending))
+    with ProcessPoolExecutor(max_workers=workers, initializer=face_workers.warm_up) as pool:
+        for result in pool.map(_encode_job, pending, chunksize=max(1, min(16, len(pending) // (workers * 4)))):
+            results.append(result)
+            progress.step()
+
+    new_folders, rows, hashes = [], [], []
+    for folder, path, digest, encoding, error in results:
+        if error:
+            summary["failed"] += 1
+            print(f"⚠️ {path}: {error}")
+        elif encoding is None:
+            summary["no_face"] += 1
+            print(f"⚠️ No face found in {path}")
+        else:
+            new_folders.append(folder)
+            rows.append(np.asarray(encoding, dtype=np.float32))
+            hashes.append((digest, folder))
+
+    if rebuild:
+        # Old records of re-encoded folders are tombstoned (dropped by compact).
+        for folder in sorted(set(new_folders)):
+            store.remove(folder)
+    if rows:
+        summary["encoded"] = store.append_many(new_folders, np.vstack(rows))
+        store.record_hashes(hashes)
+    summary["folders"] = len(set(new_folders))
+
+    if roster is not None:
+        students = []
+        for folder in sorted(set(new_folders)):
+            name, sep, student_id = folder.rpartition("_")
+            if sep and name and student_id:
+                students.append((student_id, name))
+        summary["roster_added"] = roster.add_many(students)
+    summary["seconds"] = round(time.time() - t0, 1)
+    return summary
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Bulk-encode student_data images into the encoding store")
+    parser.add_argument('student_data', nargs='?', default=DEFAULT_STUDENT_DATA)
+    parser.add_argument('--store', default=DEFAULT_STORE, help="encoding store base path (no extension)")
+    parser.add_argument('--roster', default=DEFAULT_ROSTER, help="roster database ('' to skip)")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--folder', action='append', help="only this folder (repeatable)")
+    parser.add_argument('--rebuild', action='store_true', help="re-encode every image, replacing existing records")
+    parser.add_argument('--compact', action='store_true', help="compact the store afterwards (with --rebuild)")
+    parser.add_argument('--dry-run', action='store_true', help="only report what would be encoded")
+    parser.add_argument('--model', default=os.environ.get("FACE_DETECT_MODEL", "hog"))
+    parser.add_argument('--upsample', type=int, default=int(os.environ.get("FACE_DETECT_UPSAMPLE", "1")))
+    parser.add_argument('--max-side', type=int, default=int(os.environ.get("FACE_DETECT_MAX_SIDE", "320")))
+    parser.add_argument('--jitters', type=int, default=int(os.environ.get("FACE_NUM_JITTERS", "1")))
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.student_data):
+        print(f"❌ No student_data directory at {args.student_data}")
+        sys.exit(1)
+    store = EncodingStore(args.store)
+    roster = RosterStore(args.roster) if args.roster else None
+    opts = {"model": args.model, "upsample": args.upsample, "max_side": args.max_side, "jitters": args.jitters}
+    summary = enroll(args.student_data, store, roster, workers=args.workers, opts=opts,
+                     rebuild=args.rebuild, folders=set(args.folder or []), dry_run=args.dry_run)
+    if args.compact and not args.dry_run:
+        store.compact()
+    print(f"✅ Encoded {summary['encoded']} images for {summary['folders']} folders in {summary['seconds']}s "
+          f"(skipped {summary['skipped']}, no face {summary['no_face']}, failed {summary['failed']}, "
+          f"roster +{summary['roster_added']}).")
+    print(f"   Store: {store.stats()}")
@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+# face_workers.py
+# ===========================================
+# Process pool for dlib decode + detect + encode jobs.
+# Kept free of app side effects so worker processes (spawned on Windows)
+# can import it cheaply; every worker loads and warms its own dlib models.
+#
+# Detection runs on a downscaled copy of the frame (max_side), then the
+# locations are mapped back and the 128-d encoding is computed on the
+# original-resolution crop.
+#
+# face_recognition (dlib + its models) is imported on first use, so the web
+# app can import this module without paying for it at startup.
+# ===========================================
+
+import os
+import time
+import threading
+from io import BytesIO
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import numpy as np
+from PIL import Image
+
+face_recognition = None     # imported by _load_face_recognition()
+
+# Detector settings (overridable per job):
+#   model     "hog" (CPU, fast) or "cnn" (dlib CNN; accurate, slow without CUDA)
+#   upsample  number_of_times_to_upsample passed to face_locations
+#   max_side  longest side of the image used for detection (0 = full resolution)
+#   jitters   num_jitters passed to face_encodings
+DEFAULT_DETECT_OPTS = {"model": "hog", "upsample": 1, "max_side": 320, "jitters": 1}
+
+
+# ---------------- Worker-side jobs ----------------
+def _load_face_recognition():
+    global face_recognition
+    if face_recognition is None:
+        import face_recognition as fr
+        face_recognition = fr
+    return face_recognition
+
+
+def warm_up():
+    """Pool initializer: run dlib once so the first real request isn't slow."""
+    _load_face_recognition()
+    blank = np.zeros((64, 64, 3), dtype=np.uint8)
+    face_recognition.face_locations(blank)
+    face_recognition.face_encodings(blank, known_face_locations=[(8, 56, 56, 8)])
+
+
+def ping():
+    return None, os.getpid(), 0.0
+
+
+def detect_and_encode(image, all_faces=False, opts=None):
+    """Locate faces on a downscaled copy of an RGB array, encode them at full resolution."""
+    _load_face_recognition()
+    o = dict(DEFAULT_DETECT_OPTS, **(opts or {}))
+    h, w = image.shape[:2]
+    scale = 1.0
+    detect_img = image
+    if o["max_side"] and max(h, w) > o["max_side"]:
+        scale = o["max_side"] / float(max(h, w))
+        size = (max(1, int(round(w * scale))), max(1, int(round(h * scale))))
+        detect_img = np.asarray(Image.fromarray(image).resize(size, Image.BILINEAR))
+    locations = face_recognition.face_locations(detect_img, number_of_times_to_upsample=o["upsample"], model=o["model"])
+    if not all_faces:
+        locations = locations[:1]
+    if scale != 1.0:
+        locations = [(max(0, int(t / scale)), min(w, int(r / scale)), min(h, int(b / scale)), max(0, int(l / scale)))
+                     for (t, r, b, l) in locations]
+    if not locations:
+        return []
+    encodings = face_recognition.face_encodings(image, known_face_locations=locations, num_jitters=o["jitters"])
+    return [(tuple(int(v) for v in loc), enc) for loc, enc in zip(locations, encodings)]
+
+
+def _encode(source, all_faces, opts):
+    t0 = time.perf_counter()
+    _load_face_recognition()
+    try:
+        image = face_recognition.load_image_file(source)
+    except Exception:
+        raise ValueError("Could not decode image")
+    faces = detect_and_encode(image, all_faces, opts)
+    return faces, os.getpid(), time.perf_counter() - t0
+
+
+def encode_image_bytes(data, all_faces=False, opts=None):
+    """Decode an encoded image (JPEG/PNG bytes) and return [(location, encoding), ...]."""
+    return _encode(BytesIO(data), all_faces, opts)
+
+
+def encode_image_file(path, all_faces=False, opts=None):
+    """Same as encode_image_bytes for an image already on disk."""
+    return _encode(path, all_faces, opts)
+
+
+def precheck_image_bytes(data, upsample=1):
+    """Cheap face-presence check on a small thumbnail: number of faces found (no encoding)."""
+    t0 = time.perf_counter()
+    _load_face_recognition()
+    try:
+        image = face_recognition.load_image_file(BytesIO(data))
+    except Exception:
+        raise ValueError("Could not decode image")
+    faces = len(face_recognition.face_locations(image, number_of_times_to_upsample=upsample, model="hog"))
+    return faces, os.getpid(), time.perf_counter() - t0
+
+
+# ---------------- Parent-side pool ----------------
+class PoolSaturated(Exception):
+    """Raised when every encode slot is in use; callers answer HTTP 503."""
+
+
+class PoolRestarting(PoolSaturated):
+    """The worker pool broke or was shut down under this job; also answered with 503."""
+
+
+class EncodePool:
+    """
+    Bounded front end for a ProcessPoolExecutor. At most queue_depth jobs may be
+    running or queued; further submissions fail fast with PoolSaturated.
+    workers=0 runs jobs inline in the calling thread.
+    """
+
+    def __init__(self, workers, queue_depth, timeout=30.0):
+        self.workers = max(0, workers)
+        self.queue_depth = max(1, queue_depth)
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(self.queue_depth)
+        self._executor = None
+        self._start_lock = threading.Lock()
+        self._metrics_lock = threading.Lock()
+        self._per_worker = {}       # pid -> {"jobs", "busy_seconds"}
+        self._in_flight = 0
+        self._completed = 0
+        self._rejected = 0
+        self._failed = 0
+        self._started_at = time.time()
+
+    def start(self):
+        """
+        Create the executor and warm every worker (no-op when already started).
+        Returns the current executor (None when inline) for the caller to submit to.
+        """
+        with self._start_lock:
+            if self.workers == 0 or self._executor is not None:
+                return self._executor
+            t0 = time.time()
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, initializer=warm_up)
+            for f in [self._executor.submit(ping) for _ in range(self.workers)]:
+                f.result()
+            print(f"✅ Face encode pool ready: {self.workers} workers warmed in {time.time() - t0:.1f}s.")
+            return self._executor
+
+    def shutdown(self, executor=None):
+        """Shut the executor down (only if it is still `executor`, when given). True if it was."""
+        with self._start_lock:
+            if self._executor is None or (executor is not None and self._executor is not executor):
+                return False
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+            return True
+
+    def _acquire(self, n):
+        taken = 0
+        for _ in range(n):
+            if not self._slots.acquire(blocking=False):
+                break
+            taken += 1
+        if taken < n:
+            for _ in range(taken):
+                self._slots.release()
+            with self._metrics_lock:
+                self._rejected += 1
+            raise PoolSaturated(f"{self.queue_depth} encode jobs already in flight")
+        with self._metrics_lock:
+            self._in_flight += n
+
+    def _release(self, n):
+        with self._metrics_lock:
+            self._in_flight -= n
+        for _ in range(n):
+            self._slots.release()
+
+    def _record(self, pid, elapsed):
+        with self._metrics_lock:
+            w = self._per_worker.setdefault(pid, {"jobs": 0, "busy_seconds": 0.0})
+            w["jobs"] += 1
+            w["busy_seconds"] += elapsed
+            self._completed += 1
+
+    def _broken(self, executor, error):
+        """Drop a broken executor (recreated by the next start()); the job gets PoolRestarting."""
+        if isinstance(error, BrokenProcessPool) and self.shutdown(executor):
+            print("⚠️ Face encode pool broke (worker died); it will be recreated.")
+        with self._metrics_lock:
+            self._failed += 1
+        return PoolRestarting(f"Face encode pool is restarting: {error}")
+
+    def _outcome(self, call, executor=None):
+        """Run call() -> (payload, pid, elapsed); return payload or the exception raised."""
+        try:
+            payload, pid, elapsed = call()
+        except BrokenProcessPool as e:
+            return self._broken(executor, e)
+        except Exception as e:
+            with self._metrics_lock:
+                self._failed += 1
+            return e
+        self._record(pid, elapsed)
+        return payload
+
+    def run(self, fn, *args, **kwargs):
+        """Run one job and return its payload. Raises PoolSaturated when full."""
+        result = self.map(fn, [args], **kwargs)[0]
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def map(self, fn, arg_tuples, **kwargs):
+        """
+        Run several jobs in parallel. Takes up to queue_depth slots (all or nothing)
+        and feeds larger batches through in chunks of that size, so a batch bigger
+        than the queue still runs on an idle pool. A job that times out keeps its
+        slot until its worker actually finishes it.
+        Returns one entry per job: its payload, or the exception it raised.
+        """
+        n = len(arg_tuples)
+        if n == 0:
+            return []
+        held = min(n, self.queue_depth)
+        self.start()
+        self._acquire(held)
+        try:
+            results = []
+            while len(results) < n:
+                if held == 0:
+                    # Every slot this batch had is tied up by a timed-out job.
+                    results.extend(PoolSaturated(f"{self.queue_depth} encode jobs already in flight")
+                                   for _ in range(n - len(results)))
+                    break
+                chunk = arg_tuples[len(results):len(results) + held]
+                executor = self.start()     # snapshot; recreated if a worker died mid-batch
+                if executor is None:
+                    results.extend(self._outcome(lambda args=args: fn(*args, **kwargs)) for args in chunk)
+                    continue
+                futures = []
+                for args in chunk:
+                    try:
+                        futures.append(executor.submit(fn, *args, **kwargs))
+                    except (BrokenProcessPool, RuntimeError) as e:    # broken / shut down by another request
+                        futures.append(e)
+                for f in futures:
+                    if isinstance(f, Exception):
+                        results.append(self._broken(executor, f))
+                        continue
+                    results.append(self._outcome(lambda f=f: f.result(timeout=self.timeout), executor))
+                    if not f.done():
+                        held -= 1
+                        f.add_done_callback(lambda _: self._release(1))
+            return results
+        finally:
+            self._release(held)
+
+    def stats(self):
+        with self._metrics_lock:
+            uptime = max(time.time() - self._started_at, 1e-9)
+            return {
+                "workers": self.workers,
+                "mode": "process_pool" if self.workers else "inline",
+                "queue_depth": self.queue_depth,
+                "in_flight": self._in_flight,
+                "completed": self._completed,
+                "rejected": self._rejected,
+                "failed": self._failed,
+                "per_worker": {
+                    str(pid): {
+                        "jobs": w["jobs"],
+                        "busy_seconds": round(w["busy_seconds"], 3),
+                        "avg_ms": round(1000.0 * w["busy_seconds"] / w["jobs"], 1) if w["jobs"] else 0.0,
+                        "jobs_per_min": round(60.0 * w["jobs"] / uptime, 2),
+                    } for pid, w in self._per_worker.items()
+                },
+            }
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+# frame_cache.py
+# ===========================================
+# Short-TTL cache of face encodings, per client (kiosk / browser tab).
+# Kiosks post near-identical frames of the same person several times a second.
+# For each client the cache keeps the faces found in its last processed frame:
+# location, a fingerprint of the face crop and the 128-d encoding. A new frame
+# from the same client reuses an encoding only if the crop at the same
+# location still fingerprints the same. The fingerprint is a 64-bit dHash
+# plus the crop's mean brightness and contrast, so flat or dark frames never match.
+# Only the detect + encode step is cached: the caller still matches the
+# encoding against the current index and applies the threshold.
+# ===========================================
+
+import time
+import threading
+from io import BytesIO
+from collections import OrderedDict
+from PIL import Image
+
+HASH_SIZE = 8
+
+
+def _open_gray(data, scale=4):
+    """(grayscale image decoded at up to 1/scale, factor to map original coords), or (None, 0)."""
+    try:
+        img = Image.open(BytesIO(data))
+        width = img.size[0]
+        img.draft('L', (max(1, img.size[0] // scale), max(1, img.size[1] // scale)))   # JPEG: reduced decode
+        gray = img.convert('L')
+    except Exception:
+        return None, 0.0
+    return gray, gray.size[0] / float(width)
+
+
+def face_fingerprint(gray, factor, location):
+    """(dHash bits, mean, spread) of the face crop at location=(top, right, bottom, left), or None."""
+    top, right, bottom, left = location
+    box = (int(left * factor), int(top * factor), int(right * factor), int(bottom * factor))
+    if box[2] - box[0] < 2 or box[3] - box[1] < 2:
+        return None
+    small = gray.crop(box).resize((HASH_SIZE + 1, HASH_SIZE), Image.BILINEAR)
+    px = list(small.getdata())
+    bits = 0
+    for row in range(HASH_SIZE):
+        base = row * (HASH_SIZE + 1)
+        for col in range(HASH_SIZE):
+            bits = (bits << 1) | (px[base + col] > px[base + col + 1])
+    return bits, sum(px) / float(len(px)), max(px) - min(px)
+
+
+class RecognitionCache:
+    """
+    Bounded (client -> faces of its last frame) cache. Entries expire ttl seconds
+    after they were stored (a hit does not extend them); the least recently
+    stored client goes first when full.
+    """
+
+    def __init__(self, size=128, ttl=2.0, max_bits=4, max_mean_delta=12.0, min_spread=24):
+        self.size = size
+        self.ttl = ttl
+        self.max_bits = max_bits
+        self.max_mean_delta = max_mean_delta
+        self.min_spread = min_spread
+        self._entries = OrderedDict()   # client -> (stored_at, [(location, fingerprint, encoding)])
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _same(self, a, b):
+        return (bin(a[0] ^ b[0]).count("1") <= self.max_bits
+                and abs(a[1] - b[1]) <= self.max_mean_delta
+                and min(a[2], b[2]) >= self.min_spread)
+
+    def get(self, client, data):
+        """(location, encoding) of a cached face that still matches this frame, else None."""
+        if self.size <= 0:
+            return None
+        now = time.time()
+        with self._lock:
+            while self._entries:
+                oldest, (stored_at, _) = next(iter(self._entries.items()))
+                if now - stored_at <= self.ttl:
+                    break
+                del self._entries[oldest]
+            entry = self._entries.get(client)
+        if entry is not None:
+            gray, factor = _open_gray(data)
+            if gray is not None:
+                for location, fingerprint, encoding in entry[1]:
+                    current = face_fingerprint(gray, factor, location)
+                    if current is not None and self._same(current, fingerprint):
+                        with self._lock:
+                            self.hits += 1
+                        return location, encoding
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, client, data, faces):
+        """Remember [(location, encoding), ...] detected in this client's frame."""
+        if self.size <= 0 or not faces:
+            return
+        gray, factor = _open_gray(data)
+        if gray is None:
+            return
+        kept = []
+        for location, encoding in faces:
+            fingerprint = face_fingerprint(gray, factor, location)
+            if fingerprint is not None and fingerprint[2] >= self.min_spread:
+                kept.append((location, fingerprint, encoding))
+        with self._lock:
+            self._entries.pop(client, None)
+            if not kept:
+                return
+            self._entries[client] = (time.time(), kept)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "clients": len(self._entries),
+                "max_clients": self.size,
+                "ttl_seconds": self.ttl,
+                "max_hamming_bits": self.max_bits,
+                "max_mean_delta": self.max_mean_delta,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            }
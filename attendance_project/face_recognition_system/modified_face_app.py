@@ -4,20 +4,34 @@
 # Modified Face Recognition App - Auto Attendance
 # Improved: robust attendance file handling (create if missing, Excel/CSV fallback),
 # atomic writes, helpful diagnostics.
+# The port is bound immediately; attendance files, encodings, the matcher index
+# and the encode pool are loaded by a background warm-up (see warm_up_app).
 # ===========================================
 
-from flask import Flask, render_template, request, jsonify, send_from_directory
+import time
+STARTED_AT = time.time()
+
+from flask import Flask, Response, render_template, request, jsonify, send_from_directory
 import base64
 import os
+import json
 import pandas as pd
-import face_recognition
-import pickle
 import numpy as np
-from datetime import datetime
-from io import BytesIO
+from datetime import datetime, timezone
+from itertools import islice
 import traceback
 import tempfile
 import sys
+import threading
+
+from encoding_index import make_index
+from consolidate import Consolidator
+from encoding_store import EncodingStore, content_hash
+from roster_store import RosterStore
+from attendance_log import AttendanceLog, MarkedToday, StudentIndex, record_date
+import face_workers
+from face_workers import EncodePool, PoolSaturated
+from frame_cache import RecognitionCache
 
 # -------------------------------
 # Directories & Path Resolution
@@ -32,6 +46,8 @@ os.makedirs(STUDENT_DATA_DIR, exist_ok=True)
 # but will create it if missing. If Excel write/read fails (no openpyxl), we'll fallback to CSV.
 ATTENDANCE_XLSX = os.path.join(CUR_DIR, "attendance.xlsx")
 ATTENDANCE_CSV = os.path.join(CUR_DIR, "attendance.csv")
+# Source of truth for marks: append-only CSV log. attendance.xlsx/.csv above are exports.
+ATTENDANCE_LOG = os.path.join(CUR_DIR, "attendance_log.csv")
 
 LOCAL_STUDENT_INFO = os.path.join(CUR_DIR, "student_info.csv")
 ROOT_STUDENT_INFO = os.path.join(ROOT_DIR, "student_info.csv")
@@ -41,9 +57,83 @@ LOCAL_STUDENTS_XLSX = os.path.join(CUR_DIR, "students.xlsx")
 ROOT_STUDENTS_XLSX = os.path.join(ROOT_DIR, "students.xlsx")
 STUDENT_EXCEL_FILE = LOCAL_STUDENTS_XLSX if os.path.exists(LOCAL_STUDENTS_XLSX) or not os.path.exists(ROOT_STUDENTS_XLSX) else ROOT_STUDENTS_XLSX
 
+# Roster of record (SQLite); student_info.csv / students.xlsx above are only exports of it.
+ROSTER_DB = os.path.join(CUR_DIR, "roster.db")
+
 LOCAL_ENCODINGS = os.path.join(CUR_DIR, "face_encodings.pkl")
 ROOT_ENCODINGS = os.path.join(ROOT_DIR, "face_encodings.pkl")
 ENCODINGS_FILE = LOCAL_ENCODINGS if os.path.exists(LOCAL_ENCODINGS) or not os.path.exists(ROOT_ENCODINGS) else ROOT_ENCODINGS
+ENCODINGS_STORE = os.path.splitext(ENCODINGS_FILE)[0]
+
+# -------------------------------
+# Matcher settings
+# -------------------------------
+# "exact" = brute-force scan of every encoding; "ivf" = approximate k-means partitioned
+# search for very large rosters (see bench_matcher.py for recall vs. speed).
+MATCHER_MODE = os.environ.get("FACE_MATCHER_MODE", "exact").strip().lower()
+IVF_N_PROBE = int(os.environ.get("FACE_IVF_N_PROBE", "8"))
+
+# Search set consolidation: per folder, near-duplicate encodings are dropped and
+# larger folders are reduced to centroid + FACE_MEDOIDS medoids (see consolidate.py).
+# The encoding store still keeps every raw encoding.
+FACE_CONSOLIDATE = os.environ.get("FACE_CONSOLIDATE", "1") == "1"
+FACE_DEDUPE_DISTANCE = float(os.environ.get("FACE_DEDUPE_DISTANCE", "0.1"))
+FACE_MEDOIDS = int(os.environ.get("FACE_MEDOIDS", "3"))
+# Best match must be closer than this to count as recognized.
+MATCH_THRESHOLD = 0.5
+# Upper bound on images accepted by /api/face/attendance/batch in one request.
+BATCH_MAX_IMAGES = 16
+
+# /api/face/attendance pagination: ?limit= is capped here; without it every record is streamed
+ATTENDANCE_PAGE_MAX = 5000
+ATTENDANCE_STREAM_CHUNK = 200      # records per chunk written to the response
+
+# Client-side frame gating for attendance.html: the page diffs tiny grayscale thumbnails and
+# only asks /api/face/precheck (face present?) once the scene has been still for a few ticks;
+# the full frame goes to /attendance only after a positive precheck. The precheck can miss
+# small (distant) faces, so after force_send_after negative prechecks with motion in between
+# the page sends the full frame anyway.
+GATE_CONFIG = {
+    "tick_ms": 400,             # how often the page samples the camera
+    "thumb_width": 64,          # motion-diff thumbnail width (grayscale)
+    "motion_threshold": 6.0,    # mean abs pixel diff (0-255) above which the scene is "moving"
+    "stable_ticks": 3,          # consecutive still ticks required before a precheck
+    "precheck_width": 320,      # precheck thumbnail width; HOG (upsample 1) finds faces down to ~40 px
+    "force_send_after": 3,      # negative prechecks (with motion seen) before a full frame is sent anyway
+    "min_send_interval_ms": 3000,   # never send more often than the original 3 s capture loop
+}
+
+# Per client (kiosk_id sent by the page, else the remote address), the faces of the last
+# frame are kept for FACE_CACHE_TTL seconds. A repeat frame whose face crop still matches
+# (dHash within FACE_CACHE_MAX_BITS, similar brightness) reuses the encoding; it is still
+# matched against the index. FACE_CACHE_SIZE (max clients) = 0 disables it.
+# The TTL must outlive the page's send floor, or an entry expires before the kiosk's next
+# frame arrives: by default it covers two send intervals plus a margin for slow requests.
+FACE_CACHE_SIZE = int(os.environ.get("FACE_CACHE_SIZE", "128"))
+FACE_CACHE_TTL = float(os.environ.get("FACE_CACHE_TTL", str(2.5 * GATE_CONFIG["min_send_interval_ms"] / 1000.0)))
+FACE_CACHE_MAX_BITS = int(os.environ.get("FACE_CACHE_MAX_BITS", "4"))
+if FACE_CACHE_SIZE > 0 and FACE_CACHE_TTL * 1000 <= GATE_CONFIG["min_send_interval_ms"]:
+    print(f"⚠️ FACE_CACHE_TTL={FACE_CACHE_TTL}s is not longer than the page's "
+          f"{GATE_CONFIG['min_send_interval_ms']} ms send interval; the recognition cache will never hit.")
+
+# -------------------------------
+# Encode worker settings
+# -------------------------------
+# dlib decode/detect/encode runs in FACE_WORKERS processes (0 = inline in the request thread).
+# At most FACE_ENCODE_QUEUE jobs may be in flight; beyond that requests get 503 + Retry-After.
+# A batch larger than the queue runs in chunks of FACE_ENCODE_QUEUE images.
+FACE_WORKERS = int(os.environ.get("FACE_WORKERS", str(max(1, (os.cpu_count() or 2) - 1))))
+FACE_ENCODE_QUEUE = int(os.environ.get("FACE_ENCODE_QUEUE", str(max(2, FACE_WORKERS * 2))))
+ENCODE_TIMEOUT = 30
+ENCODE_RETRY_AFTER = 1
+# Detection fast path: find faces on a copy scaled to FACE_DETECT_MAX_SIDE (0 = full size),
+# encode on the original crop. See bench_detect.py for latency/distance per setting.
+DETECT_OPTS = {
+    "model": os.environ.get("FACE_DETECT_MODEL", "hog"),
+    "upsample": int(os.environ.get("FACE_DETECT_UPSAMPLE", "1")),
+    "max_side": int(os.environ.get("FACE_DETECT_MAX_SIDE", "320")),
+    "jitters": int(os.environ.get("FACE_NUM_JITTERS", "1")),
+}
 
 # Print diagnostic paths
 print("🔍 CUR_DIR (script):", CUR_DIR)
@@ -51,9 +141,16 @@ print("🔍 ROOT_DIR (project):", ROOT_DIR)
 print("📁 STUDENT_DATA_DIR:", STUDENT_DATA_DIR)
 print("📊 ATTENDANCE_XLSX:", ATTENDANCE_XLSX)
 print("📊 ATTENDANCE_CSV (fallback):", ATTENDANCE_CSV)
+print("📝 ATTENDANCE_LOG:", ATTENDANCE_LOG)
 print("📁 STUDENT_INFO_FILE:", STUDENT_INFO_FILE)
 print("📁 STUDENT_EXCEL_FILE:", STUDENT_EXCEL_FILE)
-print("🧠 ENCODINGS_FILE:", ENCODINGS_FILE)
+print("🗂️ ROSTER_DB:", ROSTER_DB)
+print("🧠 ENCODINGS_FILE (legacy pickle):", ENCODINGS_FILE)
+print("🧠 ENCODINGS_STORE:", ENCODINGS_STORE + ".f32")
+print("🔎 MATCHER_MODE:", MATCHER_MODE)
+print("🔎 FACE_CONSOLIDATE:", FACE_CONSOLIDATE, "| dedupe:", FACE_DEDUPE_DISTANCE, "| medoids:", FACE_MEDOIDS)
+print("⚙️ FACE_WORKERS:", FACE_WORKERS, "| FACE_ENCODE_QUEUE:", FACE_ENCODE_QUEUE)
+print("⚙️ DETECT_OPTS:", DETECT_OPTS)
 
 # Global flag telling whether attendance is stored as CSV (True) or XLSX (False)
 ATTENDANCE_IS_CSV = False
@@ -108,13 +205,6 @@ def ensure_attendance_file():
             print("done")
             raise
 
-# Call to ensure file exists at startup
-try:
-    ensure_attendance_file()
-except Exception as e:
-    print("Fatal: attendance file could not be created. Exiting.", e)
-    sys.exit(1)
-
 # -------------------------------
 # Flask app (point to local templates)
 # -------------------------------
@@ -123,66 +213,90 @@ app = Flask(__name__, template_folder=os.path.join(CUR_DIR, "templates"), static
 # -------------------------------
 # Load or Initialize Encodings
 # -------------------------------
-known_face_encodings = {}
-if os.path.exists(ENCODINGS_FILE):
+# Encodings live in an append-only memmap store next to the legacy pickle:
+# <ENCODINGS_STORE>.f32 (float32 records) + <ENCODINGS_STORE>.labels (folder per record).
+# The pickle is only read once, to migrate it into an empty store.
+encoding_store = None       # opened by warm_up_app()
+face_index = None
+
+def load_encoding_store():
+    store = EncodingStore(ENCODINGS_STORE)
+    if len(store) == 0 and os.path.exists(ENCODINGS_FILE):
+        store.migrate_from_pickle(ENCODINGS_FILE)
+    print(f"✅ Loaded {len(store)} encodings for {len(store.folder_counts)} folders.")
+    return store
+
+# Contiguous matrix index queried by /attendance (kept in sync by update_face_encodings)
+consolidator = Consolidator(FACE_DEDUPE_DISTANCE, FACE_MEDOIDS)
+# Held from the store append to the index update, so overlapping enrollments of one folder
+# (or a rebuild) can never leave an older representative set in the index.
+enroll_lock = threading.Lock()
+
+def build_face_index():
+    matrix, folders = encoding_store.arrays()
+    if FACE_CONSOLIDATE:
+        consolidator.load(matrix, folders)
+        stats = consolidator.stats()
+        print(f"✅ Consolidated {stats['raw_encodings']} encodings into {stats['representatives']} representatives.")
+        matrix, folders = consolidator.arrays()
+    if MATCHER_MODE == "ivf":
+        return make_index("ivf", matrix, folders, n_probe=IVF_N_PROBE)
+    return make_index(MATCHER_MODE, matrix, folders)
+
+# Worker processes are started (and warmed) by warm_up_app, or lazily on first job.
+encode_pool = EncodePool(FACE_WORKERS, FACE_ENCODE_QUEUE, timeout=ENCODE_TIMEOUT)
+
+recognition_cache = RecognitionCache(FACE_CACHE_SIZE, FACE_CACHE_TTL, FACE_CACHE_MAX_BITS)
+
+# Frame gating counters (client-gated frames are reported by the page with each request)
+gate_lock = threading.Lock()
+gate_stats = {"client_gated": 0, "precheck_total": 0, "precheck_no_face": 0, "processed": 0}
+
+def count_gate(**deltas):
+    with gate_lock:
+        for k, v in deltas.items():
+            gate_stats[k] += int(v)
+
+def parse_gated_frames(data):
+    """Client-reported gated frame count; anything malformed counts as 0."""
     try:
-        with open(ENCODINGS_FILE, "rb") as f:
-            known_face_encodings = pickle.load(f) or {}
-        for k, v in list(known_face_encodings.items()):
-            if v is None:
-                known_face_encodings[k] = []
-            elif isinstance(v, np.ndarray):
-                known_face_encodings[k] = [v]
-            elif isinstance(v, (list, tuple)):
-                known_face_encodings[k] = list(v)
-            else:
-                known_face_encodings[k] = [v]
-        print(f"✅ Loaded encodings for {len(known_face_encodings)} folders.")
-    except Exception as e:
-        print("⚠️ Failed to load encodings file:", e)
-        print(traceback.format_exc())
-        known_face_encodings = {}
-else:
-    print("ℹ️ No encodings file found (will create after enrollment).")
+        return max(0, int(data.get('gated_frames') or 0))
+    except (TypeError, ValueError):
+        return 0
 
-# -------------------------------
-# Initialize Student Info Files (CSV + Excel)
-# -------------------------------
-def initialize_student_info():
-    try:
-        if not os.path.exists(STUDENT_INFO_FILE):
-            df = pd.DataFrame(columns=['Student ID', 'Name'])
-            df.to_csv(STUDENT_INFO_FILE, index=False)
-            print(f"Created {STUDENT_INFO_FILE}")
-    except Exception as e:
-        print("Error creating student_info.csv:", e)
+def cache_client_id(data):
+    """Recognition cache namespace: the page's kiosk_id, else the caller's address."""
+    kiosk = data.get('kiosk_id') if isinstance(data, dict) else None
+    return f"kiosk:{kiosk}" if kiosk else f"addr:{request.remote_addr}"
 
-    # Create students.xlsx if missing (best-effort with Excel; fallback to CSV)
-    try:
-        if not os.path.exists(STUDENT_EXCEL_FILE):
-            df = pd.DataFrame(columns=['Student ID', 'Name'])
-            try:
-                fd, tmp_path = tempfile.mkstemp(suffix=".xlsx", dir=CUR_DIR)
-                os.close(fd)
-                df.to_excel(tmp_path, index=False, engine='openpyxl')
-                os.replace(tmp_path, STUDENT_EXCEL_FILE)
-                print(f"Created {STUDENT_EXCEL_FILE}")
-            finally:
-                if os.path.exists(tmp_path):
-                    try:
-                        os.remove(tmp_path)
-                    except Exception:
-                        pass
-    except Exception as e:
-        print("Warning: could not create students.xlsx (will continue). Error:", e)
+def busy_response():
+    return jsonify({"success": False, "message": "Face recognition is busy, retry shortly"}), 503, {"Retry-After": str(ENCODE_RETRY_AFTER)}
 
-initialize_student_info()
+# -------------------------------
+# Student roster (SQLite + in-memory cache)
+# -------------------------------
+roster = None       # opened by warm_up_app()
+
+def open_roster():
+    """Open the roster; on first run import the legacy student_info.csv / students.xlsx."""
+    store = RosterStore(ROSTER_DB)
+    if store.created:
+        imported = store.import_legacy(STUDENT_INFO_FILE, STUDENT_EXCEL_FILE)
+        if imported:
+            print(f"✅ Imported {imported} students into the roster from student_info.csv / students.xlsx.")
+    print(f"✅ Roster: {len(store)} students.")
+    return store
+
+def student_for_folder(folder):
+    """{"student_id", "name"} for a matched student_data folder, or None if it isn't on the roster."""
+    record = roster.for_folder(folder) if folder else None
+    return {"student_id": record["Student ID"], "name": record["Name"]} if record else None
 
 # -------------------------------
 # Helper read/write attendance
 # -------------------------------
-def read_attendance_df():
-    """Read attendance into a DataFrame, handling XLSX or CSV fallback."""
+def read_attendance_export_df():
+    """Read the exported attendance file into a DataFrame, handling XLSX or CSV fallback."""
     global ATTENDANCE_IS_CSV, ATTENDANCE_XLSX, ATTENDANCE_CSV
     try:
         if ATTENDANCE_IS_CSV:
@@ -245,6 +359,95 @@ def atomic_write_attendance_df(df):
             print("done")
             raise
 
+# -------------------------------
+# Attendance log (append-only)
+# -------------------------------
+attendance_log = None       # opened by warm_up_app()
+marked_today = None
+student_index = StudentIndex()      # folder -> dates, for /api/student_attendance
+
+def open_attendance_log():
+    """Open the log (seeding it from the workbook on first run), load today's marks and the student index."""
+    log = AttendanceLog(ATTENDANCE_LOG)
+    if log.created:
+        # One-shot seed from the existing workbook so history isn't lost.
+        legacy = read_attendance_export_df()
+        if legacy is not None and not legacy.empty and set(['Folder Name', 'Timestamp']).issubset(legacy.columns):
+            log.append_many(legacy[['Folder Name', 'Timestamp']].astype(str).values.tolist())
+            print(f"✅ Seeded attendance log with {len(legacy)} records from existing attendance file.")
+    # Folders already marked today, so repeated frames are rejected without disk I/O.
+    records = list(log.iter_records())
+    marked = MarkedToday()
+    marked.load(records, datetime.now().strftime('%Y-%m-%d'))
+    print(f"✅ {len(marked)} students already marked today.")
+    student_index.load(records)
+    print(f"✅ Attendance index: {len(records)} records for {len(student_index)} folders.")
+    return log, marked
+
+def read_attendance_df():
+    """Read all attendance records from the append-only log."""
+    return attendance_log.read_df()
+
+def export_attendance():
+    """Regenerate attendance.xlsx (or the CSV fallback) from the log. Returns the written path."""
+    atomic_write_attendance_df(read_attendance_df())
+    return ATTENDANCE_CSV if ATTENDANCE_IS_CSV else ATTENDANCE_XLSX
+
+# -------------------------------
+# Background warm-up
+# -------------------------------
+app_ready = threading.Event()
+startup_timings = [("imports", round(time.time() - STARTED_AT, 3))]
+_warm_up_lock = threading.Lock()
+_warm_up_started = False
+
+# Reachable while warming up: pages, static files and the status probe.
+READY_EXEMPT_ENDPOINTS = {"static", "home", "student_image", "face_system_status"}
+# GET-only while warming up: the page loads, its POSTs get 503 and retry.
+READY_EXEMPT_PAGES = {"attendance"}
+
+def timed_step(name, fn, *args):
+    t0 = time.time()
+    result = fn(*args)
+    startup_timings.append((name, round(time.time() - t0, 3)))
+    return result
+
+def warm_up_app():
+    """Load files, encodings, the index and the encode pool, then mark the app ready."""
+    global encoding_store, face_index, attendance_log, marked_today, roster
+    try:
+        timed_step("attendance file", ensure_attendance_file)
+        roster = timed_step("roster", open_roster)
+        encoding_store = timed_step("encoding store", load_encoding_store)
+        face_index = timed_step("encoding index", build_face_index)
+        print(f"✅ Encoding index built: {len(face_index)} encodings.")
+        attendance_log, marked_today = timed_step("attendance log", open_attendance_log)
+        timed_step("encode pool", encode_pool.start)
+        app_ready.set()
+        print("⏱️ Startup: " + " | ".join(f"{name} {sec:.2f}s" for name, sec in startup_timings)
+              + f" | ready after {time.time() - STARTED_AT:.2f}s")
+    except Exception as e:
+        print("Fatal: face recognition could not start. Exiting.", e)
+        print(traceback.format_exc())
+        os._exit(1)
+
+def start_warm_up():
+    global _warm_up_started
+    with _warm_up_lock:
+        if _warm_up_started:
+            return
+        _warm_up_started = True
+    threading.Thread(target=warm_up_app, daemon=True, name="warm-up").start()
+
+@app.before_request
+def require_ready():
+    start_warm_up()     # no-op once started; covers servers that import the app
+    if app_ready.is_set() or request.endpoint in READY_EXEMPT_ENDPOINTS:
+        return None
+    if request.method == 'GET' and request.endpoint in READY_EXEMPT_PAGES:
+        return None
+    return jsonify({"success": False, "message": "Face recognition is starting up, retry shortly"}), 503, {"Retry-After": "1"}
+
 # -------------------------------
 # Routes
 # -------------------------------
@@ -270,37 +473,10 @@ def create_new():
 
 def save_student_info(student_id, name):
     try:
-        # CSV student_info
-        if os.path.exists(STUDENT_INFO_FILE):
-            df_csv = pd.read_csv(STUDENT_INFO_FILE, dtype=str)
-        else:
-            df_csv = pd.DataFrame(columns=['Student ID', 'Name'])
-        if str(student_id) in df_csv['Student ID'].astype(str).values:
-            print(f"Student ID {student_id} already exists in {STUDENT_INFO_FILE}. Skipping CSV insert.")
+        if roster.add(student_id, name):
+            print(f"Saved to roster: {student_id}, {name}")
         else:
-            df_csv = pd.concat([df_csv, pd.DataFrame([[student_id, name]], columns=['Student ID', 'Name'])], ignore_index=True)
-            df_csv.to_csv(STUDENT_INFO_FILE, index=False)
-            print(f"Saved to CSV: {student_id}, {name}")
-
-        # Excel students.xlsx (best-effort)
-        try:
-            if os.path.exists(STUDENT_EXCEL_FILE):
-                df_excel = pd.read_excel(STUDENT_EXCEL_FILE, dtype=str, engine='openpyxl')
-            else:
-                df_excel = pd.DataFrame(columns=['Student ID', 'Name'])
-            if str(student_id) in df_excel['Student ID'].astype(str).values:
-                print(f"Student ID {student_id} already exists in {STUDENT_EXCEL_FILE}. Skipping Excel insert.")
-            else:
-                df_excel = pd.concat([df_excel, pd.DataFrame([[student_id, name]], columns=['Student ID', 'Name'])], ignore_index=True)
-                # atomic write
-                fd, tmp_path = tempfile.mkstemp(suffix=".xlsx", dir=CUR_DIR)
-                os.close(fd)
-                df_excel.to_excel(tmp_path, index=False, engine='openpyxl')
-                os.replace(tmp_path, STUDENT_EXCEL_FILE)
-                print(f"Saved to Excel: {student_id}, {name}")
-        except Exception as e:
-            print("Warning: could not update students.xlsx (continuing). Error:", e)
-
+            print(f"Student ID {student_id} already exists in the roster. Skipping insert.")
     except Exception as e:
         print("Error saving student info:", e)
         print(traceback.format_exc())
@@ -318,6 +494,8 @@ def save_image():
         if not student_id or not name:
             return jsonify({"success": False, "message": "Empty student_id or name"}), 400
 
+        if student_id not in roster:
+            save_student_info(student_id, name)
         student_folder_name = f"{name}_{student_id}"
         student_folder = os.path.join(STUDENT_DATA_DIR, student_folder_name)
         os.makedirs(student_folder, exist_ok=True)
@@ -326,7 +504,11 @@ def save_image():
         image_path = os.path.join(student_folder, image_filename)
         image_file.save(image_path)
 
-        update_face_encodings(student_folder_name, image_path)
+        try:
+            update_face_encodings(student_folder_name, image_path)
+        except PoolSaturated:
+            os.remove(image_path)
+            return busy_response()
 
         return jsonify({"success": True, "message": "Image saved successfully.", "path": image_path}), 200
     except Exception as e:
@@ -335,24 +517,26 @@ def save_image():
         return jsonify({"success": False, "message": str(e)}), 500
 
 def update_face_encodings(folder_name, image_path):
-    global known_face_encodings
     try:
-        image = face_recognition.load_image_file(image_path)
-        encs = face_recognition.face_encodings(image)
-        if not encs:
+        faces = encode_pool.run(face_workers.encode_image_file, image_path, opts=DETECT_OPTS)
+        if not faces:
             print(f"⚠️ No face found in {image_path}; not updating encodings.")
             return False
-        enc = encs[0]
-        prev = known_face_encodings.get(folder_name, [])
-        if isinstance(prev, list):
-            prev.append(enc)
-        else:
-            prev = [prev, enc]
-        known_face_encodings[folder_name] = prev
-        with open(ENCODINGS_FILE, "wb") as f:
-            pickle.dump(known_face_encodings, f)
-        print(f"✅ Encoding updated for {folder_name} (total encodings for folder: {len(known_face_encodings[folder_name])})")
+        enc = faces[0][1]
+        digest = content_hash(image_path)
+        with enroll_lock:
+            encoding_store.append(folder_name, [enc])
+            encoding_store.record_hashes([(digest, folder_name)])
+            if FACE_CONSOLIDATE:
+                # Only this folder's representatives are recomputed.
+                face_index.replace(folder_name, consolidator.add(folder_name, [enc]))
+            else:
+                face_index.add(folder_name, [enc])
+        recognition_cache.clear()
+        print(f"✅ Encoding updated for {folder_name} (total encodings for folder: {encoding_store.folder_counts[folder_name]})")
         return True
+    except PoolSaturated:
+        raise
     except Exception as e:
         print("Error updating encodings:", e)
         print(traceback.format_exc())
@@ -369,6 +553,7 @@ def attendance():
             image_data = data.get('image')
             if not image_data:
                 return jsonify({"success": False, "message": "No image provided"}), 400
+            count_gate(processed=1, client_gated=parse_gated_frames(data))
 
             if ',' in image_data:
                 header, encoded = image_data.split(',', 1)
@@ -380,186 +565,381 @@ def attendance():
             except Exception as e:
                 return jsonify({"success": False, "message": "Invalid base64 image"}), 400
 
-            image = face_recognition.load_image_file(BytesIO(decoded))
-            uploaded_face_encodings = face_recognition.face_encodings(image)
-            if not uploaded_face_encodings:
-                return jsonify({"success": False, "message": "No face found in uploaded image"}), 400
-
-            uploaded_enc = uploaded_face_encodings[0]
-
-            known_enc_list = []
-            known_ids = []
-            for folder, encs in known_face_encodings.items():
-                if isinstance(encs, (list, tuple)):
-                    for e in encs:
-                        known_enc_list.append(e)
-                        known_ids.append(folder)
-                else:
-                    known_enc_list.append(encs)
-                    known_ids.append(folder)
-
-            if len(known_enc_list) == 0:
+            if len(face_index) == 0:
                 return jsonify({"success": False, "message": "No registered students"}), 400
 
-            distances = face_recognition.face_distance(known_enc_list, uploaded_enc)
-            best_idx = int(np.argmin(distances))
-            best_distance = float(distances[best_idx])
-
-            THRESHOLD = 0.5
-
-            if best_distance < THRESHOLD:
-                matched_folder = known_ids[best_idx]
+            # Only detection + encoding is cached; the decision is always made against the index.
+            client = cache_client_id(data)
+            cached = recognition_cache.get(client, decoded)
+            if cached is not None:
+                encoding = cached[1]
+            else:
+                try:
+                    faces = encode_pool.run(face_workers.encode_image_bytes, decoded, opts=DETECT_OPTS)
+                except PoolSaturated:
+                    return busy_response()
+                except ValueError as e:
+                    return jsonify({"success": False, "message": str(e)}), 400
+                recognition_cache.put(client, decoded, faces)
+                encoding = faces[0][1] if faces else None
+            # (matched_folder, best_distance), or None when no face was found
+            outcome = face_index.query(encoding) if encoding is not None else None
+
+            if outcome is None:
+                return jsonify({"success": False, "message": "No face found in uploaded image", "cached": cached is not None}), 400
+
+            matched_folder, best_distance = outcome
+            if best_distance < MATCH_THRESHOLD:
                 mark_attendance(matched_folder)
                 return jsonify({
                     "success": True,
                     "message": f"Attendance marked for {matched_folder}",
                     "folder": matched_folder,
-                    "distance": best_distance
+                    "student": student_for_folder(matched_folder),
+                    "distance": best_distance,
+                    "cached": cached is not None
                 }), 200
             else:
-                return jsonify({"success": False, "message": "Face not recognized", "best_distance": best_distance}), 404
+                return jsonify({"success": False, "message": "Face not recognized", "best_distance": best_distance,
+                                "cached": cached is not None}), 404
 
         except Exception as e:
             print("Error in attendance POST:", e)
             print(traceback.format_exc())
             return jsonify({"success": False, "message": str(e)}), 500
 
-    return render_template('attendance.html')
+    return render_template('attendance.html', gate=GATE_CONFIG)
+
+@app.route('/api/face/precheck', methods=['POST'])
+def face_precheck():
+    """
+    Cheap gate before a full recognition request: JSON {image: <small JPEG data URL>,
+    gated_frames: <frames skipped client-side since last call>} -> {face_likely, faces}.
+    """
+    try:
+        data = request.get_json(force=True)
+        image_data = data.get('image')
+        if not image_data:
+            return jsonify({"success": False, "message": "No image provided"}), 400
+        count_gate(precheck_total=1, client_gated=parse_gated_frames(data))
+        encoded = image_data.split(',', 1)[1] if ',' in image_data else image_data
+        try:
+            decoded = base64.b64decode(encoded)
+        except Exception:
+            return jsonify({"success": False, "message": "Invalid base64 image"}), 400
+        try:
+            faces = encode_pool.run(face_workers.precheck_image_bytes, decoded)
+        except PoolSaturated:
+            return busy_response()
+        except ValueError as e:
+            return jsonify({"success": False, "message": str(e)}), 400
+        if not faces:
+            count_gate(precheck_no_face=1)
+        return jsonify({"success": True, "face_likely": faces > 0, "faces": faces}), 200
+    except Exception as e:
+        print("Error in /api/face/precheck:", e)
+        print(traceback.format_exc())
+        return jsonify({"success": False, "message": str(e)}), 500
+
+@app.route('/api/face/attendance/batch', methods=['POST'])
+def attendance_batch():
+    """
+    Recognize every face in a burst of frames (multipart field 'images', raw JPEG/PNG),
+    match all of them against the index in one matrix operation and mark everyone
+    recognized with a single log write.
+    """
+    try:
+        files = request.files.getlist('images')
+        if not files:
+            return jsonify({"success": False, "message": "No images provided (multipart field 'images')"}), 400
+        if len(files) > BATCH_MAX_IMAGES:
+            return jsonify({"success": False, "message": f"At most {BATCH_MAX_IMAGES} images per batch"}), 413
+        if len(face_index) == 0:
+            return jsonify({"success": False, "message": "No registered students"}), 400
+
+        # One encode job per image, run in parallel across the worker pool.
+        try:
+            per_image = encode_pool.map(face_workers.encode_image_bytes, [(f.read(),) for f in files],
+                                        all_faces=True, opts=DETECT_OPTS)
+        except PoolSaturated:
+            return busy_response()
+
+        faces = []          # (image_idx, location)
+        encodings = []
+        errors = []
+        for i, result in enumerate(per_image):
+            if isinstance(result, Exception):
+                errors.append({"image": i, "message": str(result) or "Could not process image"})
+                continue
+            for loc, enc in result:
+                faces.append((i, loc))
+                encodings.append(enc)
+
+        matches = face_index.query_many(encodings) if encodings else []
+        recognized = [folder for folder, dist in matches if dist < MATCH_THRESHOLD]
+        newly_marked = mark_attendance_many(recognized)
+
+        results = []
+        for (i, loc), (folder, dist) in zip(faces, matches):
+            ok = dist < MATCH_THRESHOLD
+            results.append({
+                "image": i,
+                "location": [int(v) for v in loc],
+                "recognized": ok,
+                "folder": folder if ok else None,
+                "student": student_for_folder(folder) if ok else None,
+                "distance": dist,
+                "marked": bool(ok and newly_marked.get(folder)),
+            })
+        return jsonify({
+            "success": True,
+            "images": len(files),
+            "faces": len(results),
+            "recognized": sorted(set(recognized)),
+            "marked": sorted(k for k, v in newly_marked.items() if v),
+            "results": results,
+            "errors": errors
+        }), 200
+    except Exception as e:
+        print("Error in /api/face/attendance/batch:", e)
+        print(traceback.format_exc())
+        return jsonify({"success": False, "message": str(e)}), 500
 
 # -------------------------------
-# Attendance Logging (Excel/CSV with safe atomic writes)
+# Attendance Logging (append-only log; Excel export on demand)
 # -------------------------------
 def mark_attendance(folder_name):
-    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    return mark_attendance_many([folder_name]).get(folder_name, False)
+
+def mark_attendance_many(folder_names):
+    """
+    Mark each folder not yet marked today with one log write for the whole batch.
+    Returns {folder: True if newly marked, False if already marked or failed}.
+    """
+    now = datetime.now()
+    timestamp = now.strftime('%Y-%m-%d %H:%M:%S')
+    today = now.strftime('%Y-%m-%d')
+    result = {}
+    claimed = []
+    for folder_name in folder_names:
+        if folder_name in result:
+            continue
+        if marked_today.try_add(folder_name, today):
+            result[folder_name] = True
+            claimed.append(folder_name)
+        else:
+            result[folder_name] = False
+            print(f"⚠️ Attendance already marked today for: {folder_name}")
+    if not claimed:
+        return result
     try:
-        df = read_attendance_df()
-
-        today = datetime.now().strftime('%Y-%m-%d')
-        if 'Timestamp' in df.columns:
-            already = (df['FolderName'] == folder_name) & (df['Timestamp'].astype(str).str.startswith(today))
-            if already.any():
-                print(f"⚠️ Attendance already marked today for: {folder_name}")
-                return False
-
-        new_row = pd.DataFrame([[folder_name, timestamp]], columns=['Folder Name', 'Timestamp'])
-        df = pd.concat([df, new_row], ignore_index=True)
-        atomic_write_attendance_df(df)
-        print(f"✅ Attendance marked: {folder_name} at {timestamp}")
-        return True
+        attendance_log.append_many([(folder_name, timestamp) for folder_name in claimed])
+        student_index.add_many(claimed, timestamp)
+        for folder_name in claimed:
+            print(f"✅ Attendance marked: {folder_name} at {timestamp}")
     except Exception as e:
+        for folder_name in claimed:
+            marked_today.discard(folder_name, today)
+            result[folder_name] = False
         print("Error writing attendance:", e)
         print(traceback.format_exc())
-        return False
+    return result
 
 # -------------------------------
 # API Endpoints (info)
 # -------------------------------
 @app.route('/api/face/status')
 def face_system_status():
+    if not app_ready.is_set():
+        return jsonify({"system": "face_recognition", "status": "starting", "ready": False, "port": 5001,
+                        "startup": dict(startup_timings)}), 503
     return jsonify({
         "system": "face_recognition",
         "status": "active",
+        "ready": True,
         "port": 5001,
-        "encodings_count": sum(len(v) if isinstance(v, (list, tuple)) else 1 for v in known_face_encodings.values()),
-        "students_registered": len(known_face_encodings),
-        "attendance_using_csv": ATTENDANCE_IS_CSV
+        "startup": dict(startup_timings),
+        "encodings_count": len(encoding_store),
+        "students_registered": len(encoding_store.folder_counts),
+        "roster_students": len(roster),
+        "attendance_using_csv": ATTENDANCE_IS_CSV,
+        "marked_today": len(marked_today),
+        "encoding_index": face_index.stats(),
+        "consolidation": consolidator.stats() if FACE_CONSOLIDATE else None,
+        "encode_workers": encode_pool.stats(),
+        "detect_opts": DETECT_OPTS,
+        "frame_gating": dict(gate_stats),
+        "recognition_cache": recognition_cache.stats()
     })
 
+@app.route('/api/face/index/rebuild', methods=['POST'])
+def api_rebuild_index():
+    """Rebuild the matcher index from the encoding store (retrains IVF lists)."""
+    global face_index
+    try:
+        with enroll_lock:
+            encoding_store.load()       # pick up records written by enroll_bulk.py
+            face_index = build_face_index()
+        recognition_cache.clear()
+        return jsonify({"success": True, "encoding_index": face_index.stats()})
+    except Exception as e:
+        print("Error in /api/face/index/rebuild:", e)
+        print(traceback.format_exc())
+        return jsonify({"success": False, "error": str(e)}), 500
+
 @app.route('/api/face/students')
 def api_get_students():
     try:
-        if os.path.exists(STUDENT_INFO_FILE):
-            df = pd.read_csv(STUDENT_INFO_FILE, dtype=str)
-            students = df.to_dict('records')
-        else:
-            students = []
+        students = roster.students()
         return jsonify({"success": True, "students": students, "count": len(students)})
     except Exception as e:
         print("Error in /api/face/students:", e)
         print(traceback.format_exc())
         return jsonify({"success": False, "error": str(e)}), 500
 
+@app.route('/api/face/students/export')
+def api_export_students():
+    """Write students.xlsx (or student_info.csv with ?format=csv) from the roster and download it."""
+    try:
+        if request.args.get('format') == 'csv':
+            path = roster.export_csv(STUDENT_INFO_FILE)
+        else:
+            path = roster.export_xlsx(STUDENT_EXCEL_FILE)
+        return send_from_directory(os.path.dirname(path), os.path.basename(path), as_attachment=True)
+    except Exception as e:
+        print("Error in /api/face/students/export:", e)
+        print(traceback.format_exc())
+        return jsonify({"success": False, "error": str(e)}), 500
+
 @app.route('/api/face/attendance')
 def api_get_attendance():
+    """
+    Attendance records from the log, streamed.
+      ?from=YYYY-MM-DD&to=YYYY-MM-DD   date range (inclusive)
+      ?student=<name>                  folders matched like /api/student_attendance
+      ?limit=N&cursor=C                page of at most N records starting at cursor C
+                                       (next page's cursor in next_cursor / X-Next-Cursor)
+      ?format=ndjson                   one JSON record per line (or Accept: application/x-ndjson)
+    The ETag is the log size the response was read up to, so If-None-Match with an
+    unchanged log gets 304. Last-Modified is informational only: it has 1 s resolution
+    and would hide a mark made in the same second.
+    """
     try:
-        df = read_attendance_df()
-        records = df.to_dict('records')
-        return jsonify({"success": True, "attendance": records, "count": len(records)})
+        args = request.args
+        ndjson = args.get('format') == 'ndjson' or 'application/x-ndjson' in request.headers.get('Accept', '')
+        try:
+            limit = min(int(args.get('limit', 0)), ATTENDANCE_PAGE_MAX)
+            cursor = int(args.get('cursor') or 0)
+        except ValueError:
+            return jsonify({"success": False, "error": "limit and cursor must be integers"}), 400
+        if limit < 0 or not attendance_log.is_record_boundary(cursor):
+            return jsonify({"success": False, "error": "Invalid limit or cursor"}), 400
+
+        size, mtime = attendance_log.version()
+        etag = f"{size:x}-{'ndjson' if ndjson else 'json'}"
+        last_modified = datetime.fromtimestamp(int(mtime), timezone.utc)
+        if request.if_none_match.contains(etag):
+            not_modified = Response(status=304)
+            not_modified.set_etag(etag)
+            not_modified.last_modified = last_modified
+            return not_modified
+
+        start, end = args.get('from') or None, args.get('to') or None
+        folders = set(student_index.find(args['student'])) if args.get('student') else None
+        rows = select_attendance(cursor, start, end, folders, size)   # same snapshot as the ETag
+        next_cursor = None
+        if limit:
+            # A bounded page is read up front so its cursor can go in the headers.
+            page = list(islice(rows, limit))
+            if len(page) == limit:
+                next_cursor = page[-1][1]
+            rows = iter(page)
+        records = (record for record, _ in rows)
+
+        body = stream_ndjson(records) if ndjson else stream_attendance_json(records, next_cursor)
+        resp = Response(body, mimetype='application/x-ndjson' if ndjson else 'application/json')
+        resp.set_etag(etag)
+        resp.last_modified = last_modified
+        resp.headers['Cache-Control'] = 'no-cache'
+        if next_cursor is not None:
+            resp.headers['X-Next-Cursor'] = str(next_cursor)
+        return resp
     except Exception as e:
         print("Error in /api/face/attendance:", e)
         print(traceback.format_exc())
         return jsonify({"success": False, "error": str(e)}), 500
 
+def select_attendance(cursor, start, end, folders, size=None):
+    """Yield ({"Folder Name", "Timestamp"}, next cursor) for log records matching the filters, up to byte size."""
+    for folder, ts, next_offset in attendance_log.iter_from(cursor, size):
+        if folders is not None and folder not in folders:
+            continue
+        if start or end:
+            day = record_date(ts)
+            if (start and day < start) or (end and day > end):
+                continue
+        yield {"Folder Name": folder, "Timestamp": ts}, next_offset
+
+def stream_attendance_json(records, next_cursor):
+    """{"success", "attendance": [...], "count", "next_cursor"} written in chunks."""
+    yield '{"success": true, "attendance": ['
+    count = 0
+    while True:
+        chunk = list(islice(records, ATTENDANCE_STREAM_CHUNK))
+        if not chunk:
+            break
+        yield (',' if count else '') + ','.join(json.dumps(r) for r in chunk)
+        count += len(chunk)
+    yield f'], "count": {count}, "next_cursor": {json.dumps(next_cursor)}}}'
+
+def stream_ndjson(records):
+    while True:
+        chunk = list(islice(records, ATTENDANCE_STREAM_CHUNK))
+        if not chunk:
+            break
+        yield ''.join(json.dumps(r) + '\n' for r in chunk)
+
+@app.route('/api/face/attendance/export')
+def api_export_attendance():
+    """Generate attendance.xlsx from the log and download it."""
+    try:
+        path = export_attendance()
+        return send_from_directory(os.path.dirname(path), os.path.basename(path), as_attachment=True)
+    except Exception as e:
+        print("Error in /api/face/attendance/export:", e)
+        print(traceback.format_exc())
+        return jsonify({"success": False, "error": str(e)}), 500
+
 @app.route('/api/student_attendance/<student_name>')
 def student_attendance(student_name):
+    """
+    Attendance per date for a folder, answered from the in-memory student index.
+    Exact (case-insensitive) folder match first, else every folder containing the
+    name. Optional ?from=YYYY-MM-DD&to=YYYY-MM-DD limit the date range.
+    """
     try:
-        # Use same attendance file logic as above
-        df = read_attendance_df()
-        if df.empty:
+        if len(student_index) == 0:
             return jsonify({"error": "Attendance file is empty or missing."}), 404
 
-        print("Columns found in attendance file:", df.columns.tolist())
-
-        normalized = {c: c.strip().lower() for c in df.columns}
-        folder_col = None
-        time_col = None
-        folder_keywords = ['folder', 'folder name', 'folder_name', 'student', 'name', 'id']
-        time_keywords = ['timestamp', 'time', 'date', 'datetime']
-
-        for orig_col, norm in normalized.items():
-            if any(kw in norm for kw in folder_keywords):
-                folder_col = orig_col
-                break
-        for orig_col, norm in normalized.items():
-            if any(kw in norm for kw in time_keywords):
-                time_col = orig_col
-                break
-
-        if not folder_col:
-            for orig_col in df.columns:
-                if any(part in orig_col.lower() for part in ['folder', 'student', 'name', 'id']):
-                    folder_col = orig_col
-                    break
-        if not time_col:
-            for orig_col in df.columns:
-                if any(part in orig_col.lower() for part in ['time', 'date', 'stamp']):
-                    time_col = orig_col
-                    break
-
-        if not folder_col or not time_col:
-            return jsonify({
-                "error": "Could not detect required columns automatically.",
-                "found_columns": df.columns.tolist(),
-                "note": "Expected a column containing 'folder'/'student'/'name' and a column with 'timestamp'/'time'/'date'."
-            }), 400
-
-        df[folder_col] = df[folder_col].astype(str)
-        matched = df[df[folder_col].str.lower() == student_name.lower()]
-        if matched.empty:
-            matched = df[df[folder_col].str.lower().str.contains(student_name.lower())]
-
-        if matched.empty:
-            sample_values = df[folder_col].astype(str).unique().tolist()[:10]
+        folders = student_index.find(student_name)
+        if not folders:
             return jsonify({
                 "error": f"No attendance found for '{student_name}'",
-                "checked_column": folder_col,
-                "sample_values_in_column": sample_values,
+                "checked_column": "Folder Name",
+                "sample_values_in_column": student_index.folders(limit=10),
                 "hint": "Try searching with the exact 'Folder Name' value shown in sample_values."
             }), 404
 
-        try:
-            dates = pd.to_datetime(matched[time_col]).dt.date.astype(str)
-        except Exception:
-            dates = matched[time_col].astype(str)
-
-        date_counts = dates.value_counts().sort_index().to_dict()
-        total = int(len(matched))
+        start = request.args.get('from') or None
+        end = request.args.get('to') or None
+        total, date_counts = student_index.summary(folders, start, end)
 
         return jsonify({
             "name": student_name,
             "total": total,
             "date_counts": date_counts,
-            "used_columns": {"folder_col": folder_col, "time_col": time_col}
+            "matched_folders": folders,
+            "used_columns": {"folder_col": "Folder Name", "time_col": "Timestamp"}
         })
     except Exception as e:
         print("Unhandled error in student_attendance:", e)
@@ -577,8 +957,13 @@ if __name__ == '__main__':
     print("=" * 60)
     print("👤 FACE RECOGNITION SYSTEM (Auto Attendance)")
     print("=" * 60)
-    print(f"✅ Known Encodings (folders): {len(known_face_encodings)}")
     print("🌐 Running on: http://localhost:5001")
     print("=" * 60)
 
+    # With debug=True the reloader re-runs this block in a child process; only that
+    # child (WERKZEUG_RUN_MAIN=true) serves requests, so only it warms up. Keeping
+    # the loading out of module level also keeps spawned pool workers cheap.
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        start_warm_up()
+
     app.run(host='0.0.0.0', port=5001, debug=True, threaded=True)
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+# roster_store.py
+# ===========================================
+# Student roster in SQLite (WAL journal) with an in-memory cache.
+#
+#   students(student_id TEXT PRIMARY KEY, name TEXT, folder TEXT, created_at TEXT)
+#
+# Student ID is unique, so adding a student is one indexed INSERT instead of
+# reading and rewriting student_info.csv and students.xlsx. Every row is also
+# cached in memory (by ID and by student_data folder), so lookups never touch
+# the database. The CSV and XLSX files are only produced by export_csv /
+# export_xlsx, and the legacy files are imported once into an empty roster.
+#
+#   python roster_store.py info   [roster.db]
+#   python roster_store.py export [roster.db] [out.csv|out.xlsx]
+# ===========================================
+
+import os
+import sys
+import sqlite3
+import tempfile
+import threading
+from datetime import datetime
+import pandas as pd
+
+ROSTER_COLUMNS = ['Student ID', 'Name']
+
+
+def folder_name(name, student_id):
+    """student_data folder for a student (same naming as /save_image)."""
+    return f"{name}_{student_id}"
+
+
+class RosterStore:
+    """SQLite-backed roster; reads are served from the cache."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS students ("
+            " student_id TEXT PRIMARY KEY,"
+            " name TEXT NOT NULL,"
+            " folder TEXT NOT NULL,"
+            " created_at TEXT NOT NULL)")
+        self._by_id = {}        # student_id -> {"Student ID", "Name"}
+        self._by_folder = {}    # folder -> {"Student ID", "Name"}
+        for student_id, name, folder in self._conn.execute("SELECT student_id, name, folder FROM students ORDER BY rowid"):
+            self._cache(student_id, name, folder)
+        self.created = len(self._by_id) == 0
+
+    def _cache(self, student_id, name, folder):
+        record = {"Student ID": student_id, "Name": name}
+        self._by_id[student_id] = record
+        self._by_folder[folder] = record
+
+    # ---------------- Writes ----------------
+    def add(self, student_id, name):
+        """Insert a student. False (nothing written) if the Student ID already exists."""
+        return self.add_many([(student_id, name)]) == 1
+
+    def add_many(self, rows):
+        """Insert (student_id, name) rows in one transaction, skipping known IDs. Returns rows added."""
+        stamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        with self._lock:
+            new = {}
+            for student_id, name in rows:
+                student_id, name = str(student_id).strip(), str(name).strip()
+                if student_id and name and student_id not in self._by_id and student_id not in new:
+                    new[student_id] = (student_id, name, folder_name(name, student_id), stamp)
+            if not new:
+                return 0
+            with self._conn:
+                self._conn.execute("BEGIN")
+                self._conn.executemany("INSERT OR IGNORE INTO students VALUES (?, ?, ?, ?)", list(new.values()))
+            for student_id, name, folder, _ in new.values():
+                self._cache(student_id, name, folder)
+            return len(new)
+
+    def import_legacy(self, *paths):
+        """Import student_info.csv / students.xlsx rows (first one wins per ID). Returns rows added."""
+        rows = []
+        for path in paths:
+            if not path or not os.path.exists(path):
+                continue
+            try:
+                if path.lower().endswith(".xlsx"):
+                    df = pd.read_excel(path, dtype=str, engine='openpyxl')
+                else:
+                    df = pd.read_csv(path, dtype=str)
+            except Exception as e:
+                print(f"⚠️ Could not read {path} for the roster import:", e)
+                continue
+            if set(ROSTER_COLUMNS).issubset(df.columns):
+                rows.extend(df[ROSTER_COLUMNS].dropna().values.tolist())
+        return self.add_many(rows)
+
+    # ---------------- Reads (cache only) ----------------
+    def get(self, student_id):
+        return self._by_id.get(str(student_id).strip())
+
+    def for_folder(self, folder):
+        """Roster record for a student_data folder, or None."""
+        return self._by_folder.get(folder)
+
+    def students(self):
+        """Every student as {"Student ID", "Name"}, in enrollment order."""
+        with self._lock:
+            return [dict(record) for record in self._by_id.values()]
+
+    def __contains__(self, student_id):
+        return str(student_id).strip() in self._by_id
+
+    def __len__(self):
+        return len(self._by_id)
+
+    # ---------------- Exports ----------------
+    def to_df(self):
+        return pd.DataFrame(self.students(), columns=ROSTER_COLUMNS)
+
+    def export_csv(self, path):
+        self._atomic_export(path, ".csv", lambda df, tmp: df.to_csv(tmp, index=False))
+        return path
+
+    def export_xlsx(self, path):
+        self._atomic_export(path, ".xlsx", lambda df, tmp: df.to_excel(tmp, index=False, engine='openpyxl'))
+        return path
+
+    def _atomic_export(self, path, suffix, write):
+        fd, tmp_path = tempfile.mkstemp(suffix=suffix, dir=os.path.dirname(os.path.abspath(path)))
+        os.close(fd)
+        try:
+            write(self.to_df(), tmp_path)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                try:
+                    os.remove(tmp_path)
+                except Exception:
+                    pass
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+if __name__ == '__main__':
+    cmd = sys.argv[1] if len(sys.argv) > 1 else "info"
+    db = sys.argv[2] if len(sys.argv) > 2 else os.path.join(os.path.dirname(os.path.abspath(__file__)), "roster.db")
+    store = RosterStore(db)
+    if cmd == "info":
+        print(f"{db}: {len(store)} students")
+    elif cmd == "export":
+        out = sys.argv[3] if len(sys.argv) > 3 else os.path.splitext(db)[0] + ".csv"
+        (store.export_xlsx if out.lower().endswith(".xlsx") else store.export_csv)(out)
+        print(f"✅ Exported {len(store)} students to {out}")
+    else:
+        print("usage: roster_store.py info|export [roster.db] [out.csv|out.xlsx]")
+        sys.exit(2)
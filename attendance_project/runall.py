@@ -3,50 +3,152 @@ import time
 import webbrowser
 import os
 import sys
+import json
 import signal
+import argparse
+import urllib.request
 
 # --- 🔹 SETTINGS ---
-VENV_PYTHON = r"A:\Facial Attendance\attendance_env\Scripts\python.exe"
-UNIFORM_APP = r"A:\Facial Attendance\attendance_project\uniform_detection_system\modified_uniform_app.py"
-FACE_APP = r"A:\Facial Attendance\attendance_project\face_recognition_system\modified_face_app.py"
-
-# --- 🔹 Function to start an app inside venv ---
-def run_in_venv(script_path, port):
-    print(f"▶️ Starting {os.path.basename(script_path)} ...")
-    return subprocess.Popen(
-        [VENV_PYTHON, script_path],
-        creationflags=subprocess.CREATE_NEW_CONSOLE if os.name == 'nt' else 0
-    )
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+UNIFORM_APP = os.path.join(ROOT_DIR, "uniform_detection_system", "modified_uniform_app.py")
+FACE_APP = os.path.join(ROOT_DIR, "face_recognition_system", "modified_face_app.py")
 
-if __name__ == "__main__":
-    print("🚀 Starting Combined Attendance System using virtual environment...\n")
+HEALTH_POLL_SECONDS = 0.5
+HEALTH_TIMEOUT_SECONDS = 1.0
+RESTART_BACKOFF_START = 1.0      # first restart delay, doubled after each crash ...
+RESTART_BACKOFF_MAX = 30.0       # ... up to this
+STABLE_RESET_SECONDS = 60.0      # a service ready this long gets its backoff reset
 
-    # 1️⃣ Start Uniform Detection App
-    uniform_proc = run_in_venv(UNIFORM_APP, 5000)
-    time.sleep(5)  # Wait for model/camera to load
 
-    # 2️⃣ Start Face Recognition App
-    face_proc = run_in_venv(FACE_APP, 5001)
-    time.sleep(5)
+def find_python():
+    """Interpreter for the apps: $ATTENDANCE_PYTHON, else the project venv if present, else this one."""
+    if os.environ.get("ATTENDANCE_PYTHON"):
+        return os.environ["ATTENDANCE_PYTHON"]
+    venv = os.path.join(os.path.dirname(ROOT_DIR), "attendance_env")
+    for candidate in (os.path.join(venv, "Scripts", "python.exe"), os.path.join(venv, "bin", "python")):
+        if os.path.exists(candidate):
+            return candidate
+    return sys.executable
 
-    # 3️⃣ Open Uniform Detection page in browser
-    print("🌐 Opening Uniform Detection Interface...")
-    webbrowser.open("http://localhost:5000", new=1)
 
-    print("\n✅ Both modules launched successfully!")
-    print("🟢 Uniform Detection → http://localhost:5000")
-    print("🟢 Face Recognition → http://localhost:5001")
-    print("\nPress CTRL + C to stop everything.\n")
+# --- 🔹 One supervised app ---
+class Service:
+    def __init__(self, name, script, port, health_path):
+        self.name = name
+        self.script = script
+        self.port = port
+        self.health_url = f"http://localhost:{port}{health_path}"
+        self.proc = None
+        self.state = "stopped"          # starting -> ready; crashed -> (backoff) -> starting
+        self.started_at = 0.0
+        self.ready_at = 0.0
+        self.restarts = 0
+        self.backoff = RESTART_BACKOFF_START
+        self.restart_at = 0.0
+        self.startup_times = []
 
-    try:
-        while True:
-            time.sleep(1)
-    except KeyboardInterrupt:
+    def start(self, python):
+        print(f"▶️ Starting {os.path.basename(self.script)} ...")
+        self.proc = subprocess.Popen(
+            [python, self.script],
+            cwd=os.path.dirname(self.script),
+            creationflags=subprocess.CREATE_NEW_CONSOLE if os.name == 'nt' else 0
+        )
+        self.state = "starting"
+        self.started_at = time.time()
+
+    def is_ready(self):
+        """Health endpoint answers 200 and does not report ready: false."""
+        try:
+            with urllib.request.urlopen(self.health_url, timeout=HEALTH_TIMEOUT_SECONDS) as resp:
+                if resp.status != 200:
+                    return False
+                try:
+                    return bool(json.loads(resp.read().decode('utf-8')).get("ready", True))
+                except ValueError:
+                    return True
+        except Exception:
+            return False
+
+    def stop(self):
+        if self.proc is None or self.proc.poll() is not None:
+            return
+        try:
+            self.proc.terminate()
+            self.proc.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            self.proc.kill()
+        except Exception:
+            pass
+
+
+# --- 🔹 Supervisor loop ---
+def supervise(services, python, open_browser=True):
+    browser_opened = False
+    reported = False
+    for svc in services:            # launch both at once; readiness is tracked per service
+        svc.start(python)
+
+    while True:
+        now = time.time()
+        for svc in services:
+            if svc.state in ("starting", "ready") and svc.proc.poll() is not None:
+                svc.state = "crashed"
+                svc.restart_at = now + svc.backoff
+                print(f"💥 {svc.name} exited with code {svc.proc.returncode}; restarting in {svc.backoff:.0f}s")
+                svc.backoff = min(RESTART_BACKOFF_MAX, svc.backoff * 2)
+            elif svc.state == "crashed" and now >= svc.restart_at:
+                svc.restarts += 1
+                svc.start(python)
+            elif svc.state == "starting" and svc.is_ready():
+                svc.state = "ready"
+                svc.ready_at = time.time()
+                svc.startup_times.append(svc.ready_at - svc.started_at)
+                print(f"✅ {svc.name} ready in {svc.startup_times[-1]:.1f}s → http://localhost:{svc.port}")
+            elif svc.state == "ready" and svc.backoff > RESTART_BACKOFF_START and now - svc.ready_at > STABLE_RESET_SECONDS:
+                svc.backoff = RESTART_BACKOFF_START
+
+        if open_browser and not browser_opened and services[0].state == "ready":
+            print("🌐 Opening Uniform Detection Interface...")
+            webbrowser.open(f"http://localhost:{services[0].port}", new=1)
+            browser_opened = True
+
+        if not reported and all(s.state == "ready" for s in services):
+            reported = True
+            print("\n⏱️ Startup report")
+            for s in services:
+                print(f"   {s.name:<18} {s.startup_times[-1]:6.1f}s")
+            print("\n✅ Both modules ready! Press CTRL + C to stop everything.\n")
+
+        time.sleep(HEALTH_POLL_SECONDS)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Start and supervise the attendance services")
+    parser.add_argument("--no-browser", action="store_true", help="don't open the uniform page when ready")
+    args = parser.parse_args()
+
+    python = find_python()
+    print(f"🚀 Starting Combined Attendance System with {python}\n")
+    services = [
+        Service("Uniform Detection", UNIFORM_APP, 5000, "/health"),
+        Service("Face Recognition", FACE_APP, 5001, "/api/face/status"),
+    ]
+
+    def stop_all(*_):
         print("\n🛑 Stopping all systems...")
-        for p in [uniform_proc, face_proc]:
-            try:
-                p.terminate()
-            except Exception:
-                pass
+        for svc in services:
+            svc.stop()
+        for svc in services:
+            if svc.restarts:
+                print(f"   {svc.name}: restarted {svc.restarts}x, startup times "
+                      + ", ".join(f"{t:.1f}s" for t in svc.startup_times))
         print("✅ All systems stopped cleanly.")
         sys.exit(0)
+
+    if hasattr(signal, "SIGTERM"):
+        signal.signal(signal.SIGTERM, stop_all)
+    try:
+        supervise(services, python, open_browser=not args.no_browser)
+    except KeyboardInterrupt:
+        stop_all()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# bench_color.py
+# ===========================================
+# Micro-benchmark: original per-half blue check vs UniformColorClassifier.
+# Runs both on the same person ROIs (synthetic uniforms / non-uniforms, or the
+# frames of a video) and reports microseconds per call, bytes allocated per
+# call, and how often the two agree on (shirt, pants) with the "blue" profile.
+#
+#   python bench_color.py                 # synthetic ROIs
+#   python bench_color.py clip.mp4        # whole frames of a clip
+# ===========================================
+
+import sys
+import time
+import argparse
+import tracemalloc
+import cv2
+import numpy as np
+
+from detectors import (fast_color_ratio_b_dominant, SHIRT_BLUE_RATIO_THRESH,
+                       PANTS_BLUE_RATIO_THRESH, MIN_BRIGHTNESS)
+from uniform_color import UniformColorClassifier
+
+
+def legacy_vertical(region):
+    """detect_uniform_vertical as it was before the classifier (two resizes, HSV conversion)."""
+    height = region.shape[0]
+    upper_ratio, upper_val = fast_color_ratio_b_dominant(region[0:height//2, :])
+    lower_ratio, lower_val = fast_color_ratio_b_dominant(region[height//2:, :])
+    return ((upper_val > MIN_BRIGHTNESS) and (upper_ratio > SHIRT_BLUE_RATIO_THRESH),
+            (lower_val > MIN_BRIGHTNESS) and (lower_ratio > PANTS_BLUE_RATIO_THRESH))
+
+
+def synthetic_rois(n, seed=0):
+    """Person-sized ROIs: smooth background, each half maybe covered by a blue-ish garment patch."""
+    rng = np.random.default_rng(seed)
+    rois = []
+    for _ in range(n):
+        h, w = int(rng.integers(200, 420)), int(rng.integers(90, 220))
+        roi = cv2.GaussianBlur(rng.integers(0, 256, (h, w, 3), dtype=np.uint8), (0, 0), 6)
+        roi = cv2.normalize(roi, None, 0, 255, cv2.NORM_MINMAX)
+        for top, bottom in ((0, h // 2), (h // 2, h)):
+            if rng.random() < 0.6:
+                ph = int((bottom - top) * rng.uniform(0.2, 1.0))
+                pw = int(w * rng.uniform(0.2, 1.0))
+                y, x = top + int(rng.integers(0, bottom - top - ph + 1)), int(rng.integers(0, w - pw + 1))
+                colour = np.array([rng.integers(90, 255), rng.integers(0, 120), rng.integers(0, 120)], dtype=np.int16)
+                patch = colour + rng.integers(-15, 16, (ph, pw, 3))
+                roi[y:y + ph, x:x + pw] = np.clip(patch, 0, 255).astype(np.uint8)
+        rois.append(roi)
+    return rois
+
+
+def video_rois(path, n):
+    cap = cv2.VideoCapture(path)
+    rois = []
+    while len(rois) < n:
+        ok, frame = cap.read()
+        if not ok:
+            break
+        rois.append(frame)
+    cap.release()
+    return rois
+
+
+def timed(fn, rois, repeat):
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        out = [fn(r) for r in rois]
+    return (time.perf_counter() - t0) / (repeat * len(rois)), out
+
+
+def allocated(fn, rois):
+    tracemalloc.start()
+    for r in rois:
+        fn(r)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Uniform colour classifier micro-benchmark")
+    parser.add_argument('video', nargs='?', help="optional video; default uses synthetic ROIs")
+    parser.add_argument('--n', type=int, default=500)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    rois = video_rois(args.video, args.n) if args.video else synthetic_rois(args.n)
+    if not rois:
+        print(f"No frames read from {args.video}")
+        sys.exit(1)
+    clf = UniformColorClassifier("blue")
+    clf.classify(rois[0])
+
+    legacy_s, legacy_out = timed(legacy_vertical, rois, args.repeat)
+    new_s, new_out = timed(clf.classify, rois, args.repeat)
+    agree = sum(a == b for a, b in zip(legacy_out, new_out)) / len(rois)
+
+    print(f"{len(rois)} ROIs x {args.repeat}")
+    print(f"{'':<12}{'us/call':>10}{'peak alloc':>12}")
+    print(f"{'legacy':<12}{1e6 * legacy_s:>10.1f}{allocated(legacy_vertical, rois[:50]):>12}")
+    print(f"{'classifier':<12}{1e6 * new_s:>10.1f}{allocated(clf.classify, rois[:50]):>12}")
+    print(f"speed-up {legacy_s / new_s:.2f}x, (shirt, pants) agreement {agree:.3f}")
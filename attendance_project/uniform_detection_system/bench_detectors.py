@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# bench_detectors.py
+# ===========================================
+# Benchmark: HOG vs YOLO uniform engines on the same frames.
+# Reads frames from a video file (or a camera index), runs every engine on each
+# frame and reports per-frame latency (mean / p95), detector runs, how often
+# shirt / pants / both were reported, and how often the engines agree.
+# With --labels (CSV: frame,shirt,pants using 0/1) it also reports accuracy.
+#
+#   python bench_detectors.py clip.mp4 --model best.pt
+#   python bench_detectors.py 0 --frames 300 --model best.pt --labels clip_labels.csv
+# ===========================================
+
+import sys
+import csv
+import time
+import argparse
+import cv2
+import numpy as np
+
+from detectors import HogEngine, YoloEngine
+
+IMG_SZ = (224, 160)
+DETECT_EVERY = 6
+MODEL_CONF = 0.35
+
+
+def read_frames(source, limit):
+    cap = cv2.VideoCapture(int(source) if source.isdigit() else source)
+    frames = []
+    while len(frames) < limit:
+        ok, frame = cap.read()
+        if not ok:
+            break
+        frames.append(cv2.resize(frame, (640, 480)))
+    cap.release()
+    return frames
+
+
+def read_labels(path):
+    labels = {}
+    with open(path, newline='') as f:
+        for row in csv.DictReader(f):
+            labels[int(row['frame'])] = (row['shirt'].strip() == '1', row['pants'].strip() == '1')
+    return labels
+
+
+def run(engine, frames):
+    times, outputs = [], []
+    for i, frame in enumerate(frames, start=1):
+        t0 = time.perf_counter()
+        det = engine.process(frame, i)
+        times.append(time.perf_counter() - t0)
+        outputs.append((bool(det.shirt), bool(det.pants)))
+    return np.array(times), outputs
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Uniform engine benchmark (HOG vs YOLO)")
+    parser.add_argument('source', help="video file or camera index")
+    parser.add_argument('--frames', type=int, default=300)
+    parser.add_argument('--model', help="YOLO weights (.pt); omit to benchmark HOG only")
+    parser.add_argument('--device', default='cpu')
+    parser.add_argument('--detect-every', type=int, default=DETECT_EVERY)
+    parser.add_argument('--hog-redetect-every', type=int, default=DETECT_EVERY * 5,
+                        help="HOG full-scan interval while the tracker holds the person")
+    parser.add_argument('--labels', help="CSV with frame,shirt,pants ground truth (1-based frame index)")
+    args = parser.parse_args()
+
+    frames = read_frames(args.source, args.frames)
+    if not frames:
+        print(f"No frames read from {args.source}")
+        sys.exit(1)
+    labels = read_labels(args.labels) if args.labels else {}
+
+    engines = [HogEngine(detect_every=args.detect_every, redetect_every=args.hog_redetect_every)]
+    if args.model:
+        from ultralytics import YOLO
+        yolo = YoloEngine(YOLO(args.model), conf=MODEL_CONF, imgsz=IMG_SZ,
+                          detect_every=args.detect_every, device=args.device)
+        yolo._predict(frames[0], yolo.imgsz, yolo.conf)    # warm-up (model fuse), not timed
+        engines.append(yolo)
+
+    print(f"{len(frames)} frames, detect every {args.detect_every}")
+    print(f"{'engine':<7}{'mean ms':>9}{'p95 ms':>8}{'det runs':>10}{'shirt':>7}{'pants':>7}{'both':>7}{'acc':>7}")
+    results = {}
+    for engine in engines:
+        times, outputs = run(engine, frames)
+        results[engine.name] = outputs
+        n = len(outputs)
+        shirt = sum(s for s, _ in outputs) / n
+        pants = sum(p for _, p in outputs) / n
+        both = sum(s and p for s, p in outputs) / n
+        scored = [(outputs[i - 1], labels[i]) for i in labels if 1 <= i <= n]
+        acc = f"{sum(o == l for o, l in scored) / len(scored):.2f}" if scored else "-"
+        print(f"{engine.name:<7}{1000.0 * times.mean():>9.2f}{1000.0 * np.percentile(times, 95):>8.2f}"
+              f"{engine.detector_runs:>10}{shirt:>7.2f}{pants:>7.2f}{both:>7.2f}{acc:>7}")
+        track = engine.track.stats()
+        print(f"{'':<7}track losses {track['track_losses']}, drift mean {track['mean_drift_px']} px"
+              f" / max {track['max_drift_px']} px, mean IoU {track['mean_drift_iou']}")
+
+    if len(results) == 2:
+        hog_out, yolo_out = results['hog'], results['yolo']
+        agree = sum(a == b for a, b in zip(hog_out, yolo_out)) / len(hog_out)
+        print(f"HOG/YOLO agreement (shirt and pants both equal): {agree:.2f}")
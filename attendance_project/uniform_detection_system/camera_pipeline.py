@@ -0,0 +1,428 @@
+#!/usr/bin/env python3
+# camera_pipeline.py
+# ===========================================
+# Per-camera uniform pipelines (capture -> inference -> status) and the
+# shared scheduler that keeps their combined inference inside a CPU budget.
+#   CameraPipeline     - one camera: capture thread, inference thread, frame
+#                        ring, MJPEG broadcaster and its own detection status
+#   InferenceScheduler - per-camera token buckets refilled from one budget
+#                        (cores' worth of inference time per second)
+#   CameraManager      - owns the pipelines, looked up by camera id
+# With a FaceHandoffClient (combined mode) a confirmed uniform no longer
+# releases the camera: the person crops from the confirming frames go straight
+# to the face service and the camera keeps running for the next student.
+# ===========================================
+
+import time
+import threading
+from collections import deque
+import cv2
+import numpy as np
+
+from frame_ring import FrameRing
+from mjpeg import MjpegBroadcaster
+from face_handoff import face_roi
+
+MOTION_THRESHOLD_PIXELS = 5.0
+STABLE_TIME_REQUIRED = 0.5
+CONSECUTIVE_UNIFORM_NEEDED = 4
+HANDOFF_COOLDOWN = 3.0      # combined mode: seconds the result stays up before the next student
+
+
+def parse_camera_config(spec):
+    """
+    "entrance=0,gate2=1,yard=rtsp://..." -> [(id, source), ...]. A bare source
+    uses itself as id; numeric sources become device indexes.
+    """
+    cameras = []
+    for part in (spec or "").split(","):
+        part = part.strip()
+        if not part:
+            continue
+        cam_id, _, source = part.partition("=") if "=" in part.split("://")[0] else (part, "", part)
+        cam_id, source = cam_id.strip(), source.strip()
+        cameras.append((cam_id, int(source) if source.isdigit() else source))
+    return cameras
+
+
+def open_capture(source, width=640, height=480, fps=20):
+    cap = cv2.VideoCapture(source)
+    if not cap.isOpened() and isinstance(source, int):
+        cap = cv2.VideoCapture(source, cv2.CAP_MSMF)
+    cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+    cap.set(cv2.CAP_PROP_FPS, fps)
+    try:
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+    except Exception:
+        pass
+    return cap
+
+
+# ---------------- Scheduler ----------------
+class InferenceScheduler:
+    """
+    Splits cpu_budget (seconds of inference per wall-clock second, 1.0 = one core)
+    evenly between active cameras. A camera that has used more than its share
+    waits before taking its next frame; because the frame ring always hands out
+    the newest frame, waiting just means that camera skips frames.
+    """
+
+    def __init__(self, cpu_budget=1.0, burst=0.25):
+        self.cpu_budget = cpu_budget
+        self.burst = burst                  # max credit (seconds) a camera can bank while idle
+        self._cond = threading.Condition()
+        self._credit = {}
+        self._busy = {}
+        self._waits = {}
+        self._last = time.perf_counter()
+        self._started = time.time()
+
+    def register(self, cam_id):
+        with self._cond:
+            self._refill()
+            self._credit.setdefault(cam_id, 0.0)
+            self._busy.setdefault(cam_id, 0.0)
+            self._waits.setdefault(cam_id, 0)
+
+    def unregister(self, cam_id):
+        """Camera stopped (or handed off): its share goes to the others."""
+        with self._cond:
+            self._refill()
+            self._credit.pop(cam_id, None)
+            self._cond.notify_all()
+
+    def _refill(self):
+        now = time.perf_counter()
+        dt, self._last = now - self._last, now
+        if not self._credit:
+            return
+        share = self.cpu_budget / len(self._credit)
+        for cam_id, credit in self._credit.items():
+            self._credit[cam_id] = min(self.burst, credit + share * dt)
+
+    def wait_turn(self, cam_id, stop_event):
+        """Block until cam_id may run inference again. False if stopping."""
+        with self._cond:
+            while not stop_event.is_set():
+                self._refill()
+                credit = self._credit.get(cam_id)
+                if credit is None or credit >= 0:
+                    return True
+                self._waits[cam_id] += 1
+                share = self.cpu_budget / len(self._credit)
+                self._cond.wait(timeout=min(0.1, -credit / share))
+        return False
+
+    def done(self, cam_id, seconds):
+        with self._cond:
+            if cam_id in self._credit:
+                self._credit[cam_id] -= seconds
+            self._busy[cam_id] = self._busy.get(cam_id, 0.0) + seconds
+
+    def stats(self):
+        with self._cond:
+            elapsed = max(1e-6, time.time() - self._started)
+            return {
+                "cpu_budget": self.cpu_budget,
+                "active_cameras": len(self._credit),
+                "cpu_used": round(sum(self._busy.values()) / elapsed, 3),
+                "per_camera": {cam: {"cpu_used": round(busy / elapsed, 3),
+                                     "waits": self._waits.get(cam, 0)}
+                               for cam, busy in self._busy.items()},
+            }
+
+
+# ---------------- Pipeline ----------------
+class CameraPipeline:
+    """One camera's capture thread, inference thread and detection status."""
+
+    def __init__(self, cam_id, source, engine, scheduler, img_sz=(224, 160),
+                 encode_quality=60, output_fps=15, face_client=None):
+        self.cam_id = cam_id
+        self.face_client = face_client
+        self.source = source
+        self.engine = engine
+        self.scheduler = scheduler
+        self.img_sz = img_sz
+        self.cap = None
+        # Capture -> inference handoff: preallocated slots reused in place, newest frame wins.
+        self.frame_ring = FrameRing(slots=3)
+        # Inference -> viewers: each processed frame is JPEG-encoded once for all /video_feed clients.
+        self.broadcaster = MjpegBroadcaster(quality=encode_quality, fps=output_fps)
+        self.stop_event = threading.Event()
+        self.status_lock = threading.Lock()
+        # Notified only when the status actually changes (feeds /detection_events)
+        self.status_cond = threading.Condition(self.status_lock)
+        self.status_version = 0
+        self.status_listeners = 0
+        self.detection_status = {'shirt_detected': False, 'pants_detected': False, 'uniform_detected': False}
+        self.handoff_flag = {'released': False}
+        # Combined mode: outcome of the latest face handoff (None until the first one)
+        self.last_attendance = None
+        self._attendance_seq = 0
+
+    def open(self):
+        self.cap = open_capture(self.source)
+        if not self.cap.isOpened():
+            print(f"❌ Cannot open camera {self.cam_id} ({self.source})")
+            return False
+        return True
+
+    def start(self):
+        self.scheduler.register(self.cam_id)
+        threading.Thread(target=self._capture_loop, daemon=True, name=f"capture-{self.cam_id}").start()
+        threading.Thread(target=self._inference_loop, daemon=True, name=f"inference-{self.cam_id}").start()
+
+    def stop(self):
+        self.stop_event.set()
+        with self.status_cond:
+            self.status_cond.notify_all()
+        self.broadcaster.stop()
+        self.scheduler.unregister(self.cam_id)
+        try:
+            self.cap.release()
+        except Exception:
+            pass
+
+    def _snapshot(self):
+        # Convert all values to native Python bool
+        status = {k: bool(v) for k, v in self.detection_status.items()}
+        if self.face_client is not None:
+            status['attendance'] = self.last_attendance
+        return status
+
+    def get_status(self):
+        with self.status_lock:
+            return self._snapshot()
+
+    def reset_status(self):
+        self._set_status(False, False, False)
+
+    def _set_status(self, shirt, pants, uniform):
+        new = {'shirt_detected': bool(shirt), 'pants_detected': bool(pants), 'uniform_detected': bool(uniform)}
+        with self.status_cond:
+            if new != self.detection_status:
+                self.detection_status.update(new)
+                self.status_version += 1
+                self.status_cond.notify_all()
+
+    def wait_status(self, last_version, timeout=None):
+        """
+        Block until the status differs from last_version. Returns (version, status),
+        or None on timeout / shutdown. Pass -1 to get the current status at once.
+        """
+        with self.status_cond:
+            if not self.status_cond.wait_for(
+                    lambda: self.status_version != last_version or self.stop_event.is_set(), timeout=timeout):
+                return None
+            if self.stop_event.is_set():
+                return None
+            return self.status_version, self._snapshot()
+
+    def _on_attendance(self, result):
+        """FaceHandoffClient callback: publish the face decision to status listeners."""
+        with self.status_cond:
+            self._attendance_seq += 1
+            result["seq"] = self._attendance_seq
+            result["time"] = time.strftime('%Y-%m-%d %H:%M:%S')
+            self.last_attendance = result
+            self.status_version += 1
+            self.status_cond.notify_all()
+        print(f"🧑‍🎓 Camera {self.cam_id}: {result['message']} ({result['seconds']}s)")
+
+    def stats(self):
+        return {"source": str(self.source), "handed_off": self.handoff_flag['released'],
+                "mode": "combined" if self.face_client is not None else "redirect",
+                "status_changes": self.status_version, "status_listeners": self.status_listeners,
+                "frame_ring": self.frame_ring.stats(), "video_feed": self.broadcaster.stats(),
+                "engine": self.engine.stats()}
+
+    # ---------------- Capture Thread ----------------
+    def _capture_loop(self):
+        cap, frame_ring = self.cap, self.frame_ring
+        while not self.stop_event.is_set():
+            if self.handoff_flag['released']:
+                break
+            grabbed = cap.grab()
+            if not grabbed:
+                time.sleep(0.01)
+                continue
+            idx, slot = frame_ring.begin_write()
+            # Decodes into the slot's existing buffer when the shape matches (no allocation).
+            ret, frame = cap.retrieve(slot)
+            if not ret or frame is None:
+                time.sleep(0.01)
+                continue
+            frame_ring.commit(idx, frame)
+            time.sleep(0.005)
+
+    # ---------------- Inference & Stability Thread ----------------
+    def _inference_loop(self):
+        IMG_SZ = self.img_sz
+        frame_count = 0
+        motion_ema = 0.0
+        motion_alpha = 0.25
+        stable_start_time = None
+
+        consecutive_uniform_counter = 0
+        handoff_initiated = False
+        handoff_started = 0.0
+        handoff_seq = 0             # attendance result number expected for the current handoff
+        # Combined mode: face crops from the frames that confirmed the uniform
+        handoff_rois = deque(maxlen=CONSECUTIVE_UNIFORM_NEEDED)
+        last_person_bbox = None
+        last_seq = 0
+
+        # Reused work buffers for the motion check (IMG_SZ is (width, height))
+        small_gray = np.empty((IMG_SZ[1], IMG_SZ[0]), dtype=np.uint8)
+        blur = np.empty_like(small_gray)
+        diff = np.empty_like(small_gray)
+
+        while not self.stop_event.is_set():
+            # Stay inside this camera's share of the CPU budget before taking a frame.
+            if not self.scheduler.wait_turn(self.cam_id, self.stop_event):
+                break
+            # Leased until the next acquire: the capture thread won't overwrite it meanwhile.
+            item = self.frame_ring.acquire_latest(last_seq, timeout=0.25)
+            if item is None:
+                if self.handoff_flag['released']:
+                    break
+                continue
+            last_seq, _, frame = item
+            t0 = time.perf_counter()
+
+            frame_count += 1
+
+            # ----------------- Person / garment detection -----------------
+            det = self.engine.process(frame, frame_count)
+            last_person_bbox = det.person_bbox
+
+            # ----------------- Motion stability -----------------
+            # Crop first, shrink, then convert only the small ROI to gray.
+            if last_person_bbox:
+                x, y, w, h = last_person_bbox
+                roi = frame[y:y+h, x:x+w]
+            else:
+                roi = frame
+            if roi.size == 0:
+                roi = frame
+
+            cv2.cvtColor(cv2.resize(roi, IMG_SZ), cv2.COLOR_BGR2GRAY, dst=small_gray)
+            cv2.GaussianBlur(small_gray, (5,5), 0, dst=blur)
+            cv2.absdiff(small_gray, blur, dst=diff)
+            median_motion = float(np.median(diff)) / 255.0 * max(IMG_SZ)
+            motion_ema = (motion_alpha * median_motion) + (1 - motion_alpha) * motion_ema
+            frame_stable = False
+            if motion_ema <= MOTION_THRESHOLD_PIXELS:
+                if stable_start_time is None:
+                    stable_start_time = time.time()
+                frame_stable = (time.time() - stable_start_time) >= STABLE_TIME_REQUIRED
+            else:
+                stable_start_time = None
+                frame_stable = False
+
+            # ----------------- Uniform detection -----------------
+            shirt_detected, pants_detected = det.shirt, det.pants
+            uniform_detected = shirt_detected and pants_detected and frame_stable
+
+            if uniform_detected:
+                consecutive_uniform_counter += 1
+                if self.face_client is not None and not handoff_initiated:
+                    # Copy: the ring slot is reused once the next frame is acquired.
+                    handoff_rois.append(face_roi(frame, last_person_bbox).copy())
+            else:
+                consecutive_uniform_counter = 0
+                handoff_rois.clear()
+
+            if consecutive_uniform_counter >= CONSECUTIVE_UNIFORM_NEEDED and not handoff_initiated:
+                handoff_initiated = True
+                self._set_status(True, True, True)
+                if self.face_client is not None:
+                    # Same camera stream, no release: the face service decides from these crops.
+                    handoff_started = time.time()
+                    handoff_seq = self._attendance_seq + 1
+                    self.face_client.submit(self.cam_id, list(handoff_rois), self._on_attendance)
+                    handoff_rois.clear()
+                    print(f"🔁 Handoff: camera {self.cam_id} sent {CONSECUTIVE_UNIFORM_NEEDED} frames to face recognition.")
+                else:
+                    try:
+                        self.cap.release()
+                        self.handoff_flag['released'] = True
+                        self.scheduler.unregister(self.cam_id)
+                        print(f"🔁 Handoff: camera {self.cam_id} released for next module.")
+                    except Exception as e:
+                        print("⚠️ Error releasing camera:", e)
+            elif (handoff_initiated and self.face_client is not None and
+                  time.time() - handoff_started >= HANDOFF_COOLDOWN and not self.face_client.busy(self.cam_id)):
+                # Result has been shown: start over for the next student.
+                handoff_initiated = False
+                consecutive_uniform_counter = 0
+                stable_start_time = None
+
+            if not handoff_initiated:
+                self._set_status(shirt_detected, pants_detected, uniform_detected)
+            else:
+                self._set_status(True, True, True)
+
+            # ----------------- Display -----------------
+            display = cv2.resize(frame, (640, 480))
+            if last_person_bbox:
+                x, y, w, h = last_person_bbox
+                color = (0,255,0) if uniform_detected else (0,255,255)
+                cv2.rectangle(display, (x, y), (x+w, y+h), color, 2)
+                cv2.putText(display, f"S:{shirt_detected} P:{pants_detected}", (x, y-10),
+                            cv2.FONT_HERSHEY_SIMPLEX, 0.7, color, 2)
+            for (x1, y1, x2, y2, label) in det.boxes:
+                cv2.rectangle(display, (x1, y1), (x2, y2), (255, 128, 0), 1)
+                cv2.putText(display, label, (x1, max(12, y1-4)), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 128, 0), 1)
+            if handoff_initiated:
+                cv2.putText(display, "✅ UNIFORM DETECTED - handoff", (30, 40),
+                            cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 3)
+                attendance = self.last_attendance
+                if self.face_client is not None and attendance and attendance["seq"] >= handoff_seq:
+                    cv2.putText(display, attendance["message"][:48], (30, 80), cv2.FONT_HERSHEY_SIMPLEX, 0.7,
+                                (0, 255, 0) if attendance["success"] else (0, 0, 255), 2)
+            elif not frame_stable:
+                cv2.putText(display, "Slight motion - hold briefly...", (30, 40),
+                            cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 255), 2)
+
+            self.broadcaster.submit(display)
+            self.scheduler.done(self.cam_id, time.perf_counter() - t0)
+
+
+# ---------------- Manager ----------------
+class CameraManager:
+    """Builds and owns one CameraPipeline per configured camera."""
+
+    def __init__(self, cameras, engine_factory, cpu_budget=1.0, face_client=None, **pipeline_kw):
+        self.scheduler = InferenceScheduler(cpu_budget)
+        self.face_client = face_client
+        self.pipelines = {}
+        for cam_id, source in cameras:
+            pipeline = CameraPipeline(cam_id, source, engine_factory(), self.scheduler,
+                                      face_client=face_client, **pipeline_kw)
+            if pipeline.open():
+                self.pipelines[cam_id] = pipeline
+            else:
+                pipeline.broadcaster.stop()
+        self.default_id = next(iter(self.pipelines), None)
+
+    def start(self):
+        for pipeline in self.pipelines.values():
+            pipeline.start()
+
+    def get(self, cam_id=None):
+        """Pipeline for cam_id (the first camera when None), or None if unknown."""
+        return self.pipelines.get(self.default_id if cam_id is None else cam_id)
+
+    def stop(self):
+        for pipeline in self.pipelines.values():
+            pipeline.stop()
+
+    def stats(self):
+        info = {"cameras": {cam_id: p.stats() for cam_id, p in self.pipelines.items()},
+                "scheduler": self.scheduler.stats()}
+        if self.face_client is not None:
+            info["face_handoff"] = self.face_client.stats()
+        return info
@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+# detectors.py
+# ===========================================
+# Person / garment detection engines for the uniform pipeline.
+# Each engine takes one BGR frame per call and returns a Detection. Engines
+# keep their own timing counters so /pipeline_stats and bench_detectors.py
+# can compare them.
+#   HogEngine  - OpenCV HOG people detector tracked between runs + uniform colour classifier
+#   YoloEngine - the trained garment model every N frames, boxes tracked between runs
+# ===========================================
+
+import time
+from collections import namedtuple
+import cv2
+import numpy as np
+
+from tracking import BoxTracker, TrackStats
+from uniform_color import UniformColorClassifier
+
+# Thresholds of the original blue heuristic (the "blue" colour profile uses the same values)
+SHIRT_BLUE_RATIO_THRESH = 0.12
+PANTS_BLUE_RATIO_THRESH = 0.12
+MIN_BRIGHTNESS = 45
+
+# person_bbox: (x, y, w, h) or None; boxes: [(x1, y1, x2, y2, label), ...] to draw
+Detection = namedtuple("Detection", "person_bbox shirt pants boxes")
+
+
+# ---------------- Colour heuristic ----------------
+def fast_color_ratio_b_dominant(region, downsize=(32, 32)):
+    """Original per-half blue check, kept as the reference for bench_color.py."""
+    if region.size == 0:
+        return 0.0, 0.0
+    small = cv2.resize(region, downsize, interpolation=cv2.INTER_AREA)
+    b, g, r = cv2.split(small)
+    delta = 20
+    blue_mask = (b.astype(int) > (r.astype(int) + delta)) & (b.astype(int) > (g.astype(int) + delta))
+    ratio = float(np.count_nonzero(blue_mask)) / blue_mask.size
+    mean_val = np.mean(cv2.cvtColor(small, cv2.COLOR_BGR2HSV)[:, :, 2])
+    return ratio, mean_val
+
+_default_classifier = None
+
+def detect_uniform_vertical(frame, person_bbox=None, classifier=None):
+    """(shirt, pants) for the person box (or whole frame) using classifier's colour profile."""
+    global _default_classifier
+    if person_bbox:
+        x, y, w, h = person_bbox
+        x1, y1 = max(0, x), max(0, y)
+        x2, y2 = min(frame.shape[1], x+w), min(frame.shape[0], y+h)
+        region = frame[y1:y2, x1:x2]
+    else:
+        region = frame
+
+    if region.size == 0:
+        return False, False
+
+    if classifier is None:
+        if _default_classifier is None:
+            _default_classifier = UniformColorClassifier()
+        classifier = _default_classifier
+    return classifier.classify(region)
+
+
+# ---------------- HOG Person Detector ----------------
+hog = cv2.HOGDescriptor()
+hog.setSVMDetector(cv2.HOGDescriptor_getDefaultPeopleDetector())
+
+def detect_person_hog(frame):
+    rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+    small = cv2.resize(rgb, (640, 480))
+    rects, _ = hog.detectMultiScale(small, winStride=(8, 8), padding=(8, 8), scale=1.05)
+    if len(rects) == 0:
+        return None
+    areas = [w*h for (x, y, w, h) in rects]
+    idx = int(np.argmax(areas))
+    x, y, w, h = rects[idx]
+    sx = frame.shape[1] / 640.0
+    sy = frame.shape[0] / 480.0
+    return (int(x*sx), int(y*sy), int(w*sx), int(h*sy))
+
+
+# ---------------- Engines ----------------
+class _Engine:
+    name = "base"
+
+    def __init__(self):
+        self.calls = 0
+        self.detector_runs = 0
+        self.total_seconds = 0.0
+        self.detector_seconds = 0.0
+        self.track = TrackStats()
+
+    def process(self, frame, frame_count):
+        t0 = time.perf_counter()
+        result = self._process(frame, frame_count)
+        self.total_seconds += time.perf_counter() - t0
+        self.calls += 1
+        return result
+
+    def _timed_detect(self, fn, *args):
+        t0 = time.perf_counter()
+        out = fn(*args)
+        self.detector_seconds += time.perf_counter() - t0
+        self.detector_runs += 1
+        self.track.detection()
+        return out
+
+    def stats(self):
+        return {
+            "engine": self.name,
+            "frames": self.calls,
+            "detector_runs": self.detector_runs,
+            "avg_frame_ms": round(1000.0 * self.total_seconds / self.calls, 2) if self.calls else 0.0,
+            "avg_detector_ms": round(1000.0 * self.detector_seconds / self.detector_runs, 2) if self.detector_runs else 0.0,
+            "tracking": self.track.stats(),
+        }
+
+
+class HogEngine(_Engine):
+    """
+    HOG person box followed with optical flow on every frame. The full HOG scan
+    runs only when there is no box, when the track is lost, or every
+    redetect_every frames to correct drift. Colour check on every frame.
+    """
+    name = "hog"
+
+    def __init__(self, detect_every=6, redetect_every=None, color_profile="blue"):
+        super().__init__()
+        self.classifier = UniformColorClassifier(color_profile)
+        self.detect_every = detect_every
+        self.redetect_every = redetect_every or detect_every * 2
+        self.last_person_bbox = None
+        self.tracker = BoxTracker()
+        self._tracking = False
+        self._since_detect = 0
+
+    def _process(self, frame, frame_count):
+        self._since_detect += 1
+        if self._tracking:
+            box, _ = self.tracker.update(frame)
+            if box is None:
+                self._tracking = False
+                self.track.losses += 1
+                self._since_detect = self.redetect_every    # lost: detect on this frame
+            else:
+                self.track.track_updates += 1
+                self.last_person_bbox = box
+        if self.last_person_bbox is None or self._since_detect >= self.redetect_every:
+            pb = self._timed_detect(detect_person_hog, frame)
+            self._since_detect = 0
+            if pb:
+                if self._tracking:
+                    self.track.drift(self.last_person_bbox, pb)
+                self.last_person_bbox = pb
+                self._tracking = self.tracker.init(frame, pb)
+        shirt, pants = detect_uniform_vertical(frame, self.last_person_bbox, self.classifier)
+        return Detection(self.last_person_bbox, shirt, pants, [])
+
+
+class YoloEngine(_Engine):
+    """
+    Garment model run at imgsz every detect_every frames. In between, the union of
+    the last garment boxes is followed with optical flow and the garment boxes are
+    shifted with it; if the track is lost the model runs again on the next frame.
+    """
+    name = "yolo"
+
+    def __init__(self, model, conf=0.35, imgsz=(224, 160), detect_every=6, device='cpu', color_profile="blue",
+                 predict_lock=None):
+        super().__init__()
+        self.predict_lock = predict_lock        # shared when several cameras use one model
+        self.classifier = UniformColorClassifier(color_profile)
+        self.model = model
+        self.conf = conf
+        self.imgsz = (imgsz[1], imgsz[0])      # IMG_SZ is (width, height); ultralytics wants (h, w)
+        self.detect_every = detect_every
+        self.device = device
+        self.shirt_ids, self.pants_ids = self._class_ids(getattr(model, "names", None))
+        self.tracker = BoxTracker()
+        self._last = Detection(None, False, False, [])
+        self._since_detect = None
+        self._tracking = False
+
+    @staticmethod
+    def _class_ids(names):
+        """Map model class ids to shirt/pants by name, falling back to 1=shirt, 0=pants."""
+        if isinstance(names, (list, tuple)):
+            names = dict(enumerate(names))
+        shirt, pants = set(), set()
+        for cid, label in (names or {}).items():
+            label = str(label).lower()
+            if "shirt" in label or "top" in label:
+                shirt.add(int(cid))
+            elif "pant" in label or "trouser" in label:
+                pants.add(int(cid))
+        if not shirt and not pants:
+            shirt, pants = {1}, {0}
+        return shirt, pants
+
+    def detect_batch(self, frames):
+        """Run the model on a list of frames in one predict() call. Returns a Detection per frame."""
+        results = self._timed_detect(self._predict, list(frames), self.imgsz, self.conf)
+        return [self._parse(frame, r) for frame, r in zip(frames, results)]
+
+    def _predict(self, frames, imgsz, conf):
+        if self.predict_lock is None:
+            return self.model.predict(frames, imgsz=imgsz, conf=conf, device=self.device, verbose=False)
+        with self.predict_lock:
+            return self.model.predict(frames, imgsz=imgsz, conf=conf, device=self.device, verbose=False)
+
+    def _parse(self, frame, result):
+        shirt = pants = False
+        boxes = []
+        b = result.boxes
+        if b is not None and len(b):
+            xyxy = b.xyxy.cpu().numpy()
+            confidences = b.conf.cpu().numpy()
+            class_ids = b.cls.cpu().numpy().astype(int)
+            fh, fw = frame.shape[:2]
+            for (x1, y1, x2, y2), confidence, class_id in zip(xyxy, confidences, class_ids):
+                x1, x2 = int(max(0, min(fw - 1, x1))), int(max(0, min(fw - 1, x2)))
+                y1, y2 = int(max(0, min(fh - 1, y1))), int(max(0, min(fh - 1, y2)))
+                region = frame[y1:y2, x1:x2]
+                if region.size == 0:
+                    continue
+                # Colour check against the uniform profile confirms low-confidence boxes
+                label = None
+                if class_id in self.shirt_ids and (confidence > 0.55 or self._color_ok(region, "shirt")):
+                    shirt = True
+                    label = f"Shirt {confidence:.2f}"
+                elif class_id in self.pants_ids and (confidence > 0.45 or self._color_ok(region, "pants")):
+                    pants = True
+                    label = f"Pants {confidence:.2f}"
+                if label:
+                    boxes.append((x1, y1, x2, y2, label))
+        person_bbox = None
+        if boxes:
+            x1 = min(bx[0] for bx in boxes); y1 = min(bx[1] for bx in boxes)
+            x2 = max(bx[2] for bx in boxes); y2 = max(bx[3] for bx in boxes)
+            person_bbox = (x1, y1, x2 - x1, y2 - y1)
+        return Detection(person_bbox, shirt, pants, boxes)
+
+    def _color_ok(self, region, garment):
+        rule = self.classifier.profile[garment]
+        return self.classifier.garment_ratio(region, garment) > rule.get("min_ratio", 0.12)
+
+    def _process(self, frame, frame_count):
+        due = self._since_detect is None or self._since_detect >= self.detect_every
+        if not due and self._tracking:
+            old = self.tracker.box
+            box, _ = self.tracker.update(frame)
+            if box is None:
+                due = True          # track lost: re-detect now
+                self._tracking = False
+                self.track.losses += 1
+            else:
+                self.track.track_updates += 1
+                dx, dy = box[0] - old[0], box[1] - old[1]
+                moved = [(x1 + dx, y1 + dy, x2 + dx, y2 + dy, label) for x1, y1, x2, y2, label in self._last.boxes]
+                self._last = Detection(box, self._last.shirt, self._last.pants, moved)
+        if due:
+            tracked = self._last.person_bbox if self._tracking else None
+            result = self._timed_detect(self._predict, frame, self.imgsz, self.conf)
+            self._last = self._parse(frame, result[0])
+            self._since_detect = 0
+            if tracked is not None and self._last.person_bbox is not None:
+                self.track.drift(tracked, self._last.person_bbox)
+            # Boxes without enough texture to track just stay put until the next run
+            self._tracking = (self._last.person_bbox is not None and
+                              self.tracker.init(frame, self._last.person_bbox))
+        self._since_detect += 1
+        return self._last
+
+
+def make_engine(kind, model=None, conf=0.35, imgsz=(224, 160), detect_every=6, device='cpu',
+                redetect_every=None, color_profile="blue", predict_lock=None):
+    """Build the engine named by kind ('hog' or 'yolo')."""
+    if kind == "yolo":
+        if model is None:
+            raise ValueError("yolo engine needs a loaded model")
+        return YoloEngine(model, conf=conf, imgsz=imgsz, detect_every=detect_every, device=device,
+                          color_profile=color_profile, predict_lock=predict_lock)
+    if kind != "hog":
+        raise ValueError(f"unknown uniform engine: {kind}")
+    return HogEngine(detect_every=detect_every, redetect_every=redetect_every, color_profile=color_profile)
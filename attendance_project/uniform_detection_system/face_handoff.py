@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+# face_handoff.py
+# ===========================================
+# Combined-pipeline handoff to the face recognition service.
+# Instead of releasing the camera and redirecting the browser to the face app
+# (which reopens the webcam and streams new frames), the uniform pipeline sends
+# the person crops it already captured while confirming the uniform straight
+# to the face app's batch endpoint on localhost and gets the attendance
+# decision back. One request per camera is in flight at a time.
+# ===========================================
+
+import time
+import json
+import uuid
+import threading
+import urllib.request
+import urllib.error
+import cv2
+
+
+def face_roi(frame, person_bbox, head_room=0.5):
+    """
+    Crop likely to contain the face: the person box extended upwards by head_room
+    of its height (garment boxes from the YOLO engine stop at the collar), clipped
+    to the frame. Whole frame when there is no box.
+    """
+    if not person_bbox:
+        return frame
+    x, y, w, h = person_bbox
+    fh, fw = frame.shape[:2]
+    x1, x2 = max(0, int(x - 0.1 * w)), min(fw, int(x + 1.1 * w))
+    y1, y2 = max(0, int(y - head_room * h)), min(fh, int(y + 0.6 * h))
+    crop = frame[y1:y2, x1:x2]
+    return crop if crop.size else frame
+
+
+def _multipart(field, blobs):
+    boundary = uuid.uuid4().hex
+    parts = []
+    for i, blob in enumerate(blobs):
+        parts.append((f'--{boundary}\r\nContent-Disposition: form-data; name="{field}"; '
+                      f'filename="roi{i}.jpg"\r\nContent-Type: image/jpeg\r\n\r\n').encode())
+        parts.append(blob)
+        parts.append(b'\r\n')
+    parts.append(f'--{boundary}--\r\n'.encode())
+    return b''.join(parts), f'multipart/form-data; boundary={boundary}'
+
+
+class FaceHandoffClient:
+    """Posts person crops to /api/face/attendance/batch on a background thread."""
+
+    def __init__(self, url, timeout=30.0, jpeg_quality=90):
+        self.url = url
+        self.timeout = timeout
+        self.jpeg_quality = jpeg_quality
+        self._lock = threading.Lock()
+        self._in_flight = set()
+        self.sent = 0
+        self.failed = 0
+        self.total_seconds = 0.0
+
+    def busy(self, cam_id):
+        with self._lock:
+            return cam_id in self._in_flight
+
+    def submit(self, cam_id, rois, callback):
+        """
+        Send rois (BGR arrays) for cam_id; callback(result_dict) runs on the worker
+        thread. Returns False if a handoff for this camera is still in flight.
+        """
+        with self._lock:
+            if cam_id in self._in_flight or not rois:
+                return False
+            self._in_flight.add(cam_id)
+        threading.Thread(target=self._run, args=(cam_id, rois, callback), daemon=True,
+                         name=f"face-handoff-{cam_id}").start()
+        return True
+
+    def _run(self, cam_id, rois, callback):
+        t0 = time.perf_counter()
+        try:
+            blobs = [cv2.imencode('.jpg', roi, [int(cv2.IMWRITE_JPEG_QUALITY), self.jpeg_quality])[1].tobytes()
+                     for roi in rois]
+            body, content_type = _multipart('images', blobs)
+            req = urllib.request.Request(self.url, data=body, method='POST',
+                                         headers={'Content-Type': content_type})
+            try:
+                with urllib.request.urlopen(req, timeout=self.timeout) as resp:
+                    payload = json.loads(resp.read().decode('utf-8'))
+            except urllib.error.HTTPError as e:
+                # Error responses from the face app are JSON too ({"success": False, "message": ...})
+                payload = json.loads(e.read().decode('utf-8') or '{}')
+                payload.setdefault("message", f"HTTP {e.code}")
+                payload["success"] = False
+            ok = bool(payload.get("success"))
+            marked = payload.get("marked") or []
+            recognized = payload.get("recognized") or []
+            if not ok:
+                message = payload.get("message") or "Face service error"
+            elif marked:
+                message = f"Attendance marked for {', '.join(marked)}"
+            elif recognized:
+                message = f"Already marked today: {', '.join(recognized)}"
+            else:
+                message = "Face not recognized" if payload.get("faces") else "No face found"
+            result = {"success": ok and bool(recognized), "recognized": recognized, "marked": marked,
+                      "message": message}
+        except Exception as e:
+            print(f"⚠️ Face handoff failed for camera {cam_id}:", e)
+            result = {"success": False, "recognized": [], "marked": [], "message": "Face service unavailable"}
+        elapsed = time.perf_counter() - t0
+        result["seconds"] = round(elapsed, 3)
+        try:
+            callback(result)
+        finally:
+            # Only free the camera once its result has been published.
+            with self._lock:
+                self.sent += 1
+                self.failed += 0 if result["success"] else 1
+                self.total_seconds += elapsed
+                self._in_flight.discard(cam_id)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "url": self.url,
+                "sent": self.sent,
+                "unsuccessful": self.failed,
+                "in_flight": sorted(self._in_flight),
+                "avg_seconds": round(self.total_seconds / self.sent, 3) if self.sent else 0.0,
+            }
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# frame_ring.py
+# ===========================================
+# Fixed-slot frame ring between the capture and inference threads.
+# Slots are NumPy arrays reused in place (cap.retrieve(slot) decodes straight
+# into them), every published frame gets a sequence number, and the reader
+# always takes the newest one (latest wins); frames it never saw count as dropped.
+# ===========================================
+
+import time
+import threading
+
+
+class FrameRing:
+    """
+    Preallocated ring of frame buffers for one writer and one reader. One slot holds
+    the latest published frame, the reader leases one, and the writer fills any
+    other, so nothing is copied and a slot is never overwritten while being read.
+    """
+
+    def __init__(self, slots=3):
+        self._slots = [None] * max(3, slots)
+        self._cond = threading.Condition()
+        self._latest = -1           # slot index of the newest published frame
+        self._latest_seq = 0
+        self._leased = -1           # slot index the reader is working on
+        self._next = 0
+        # instrumentation
+        self.allocations = 0
+        self.written = 0
+        self.consumed = 0
+        self.dropped = 0
+        self._window = (time.time(), 0, 0, 0)   # (start, allocations, written, dropped)
+        self._rates = {"allocations_per_sec": 0.0, "frames_per_sec": 0.0, "dropped_per_sec": 0.0}
+
+    # ---------------- Writer side ----------------
+    def begin_write(self):
+        """Pick a free slot for the next frame. Returns (index, array or None)."""
+        with self._cond:
+            for _ in range(len(self._slots)):
+                idx = self._next
+                self._next = (self._next + 1) % len(self._slots)
+                if idx != self._latest and idx != self._leased:
+                    return idx, self._slots[idx]
+        raise RuntimeError("no free frame slot")   # unreachable with >= 3 slots
+
+    def commit(self, idx, frame):
+        """Publish the frame written into slot idx (frame is the array retrieve() returned)."""
+        with self._cond:
+            if frame is not self._slots[idx]:
+                # First frame, or the camera changed resolution: adopt the new buffer.
+                self._slots[idx] = frame
+                self.allocations += 1
+            self._latest = idx
+            self._latest_seq += 1
+            self.written += 1
+            self._roll_window()
+            self._cond.notify_all()
+
+    # ---------------- Reader side ----------------
+    def acquire_latest(self, last_seq, timeout=None):
+        """
+        Wait for a frame newer than last_seq and lease it. Returns (seq, index, frame)
+        or None on timeout. The lease on the previously acquired frame ends here, so
+        the frame stays valid until the next call (or release()).
+        """
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._latest_seq > last_seq, timeout=timeout):
+                return None
+            idx, seq = self._latest, self._latest_seq
+            if last_seq:
+                self.dropped += max(0, seq - last_seq - 1)
+            self.consumed += 1
+            self._leased = idx
+            return seq, idx, self._slots[idx]
+
+    def release(self):
+        with self._cond:
+            self._leased = -1
+
+    # ---------------- Stats ----------------
+    def _roll_window(self):
+        now = time.time()
+        start, allocs, written, dropped = self._window
+        elapsed = now - start
+        if elapsed >= 1.0:
+            self._rates = {
+                "allocations_per_sec": round((self.allocations - allocs) / elapsed, 2),
+                "frames_per_sec": round((self.written - written) / elapsed, 2),
+                "dropped_per_sec": round((self.dropped - dropped) / elapsed, 2),
+            }
+            self._window = (now, self.allocations, self.written, self.dropped)
+
+    def stats(self):
+        with self._cond:
+            info = {
+                "slots": len(self._slots),
+                "allocations": self.allocations,
+                "written": self.written,
+                "consumed": self.consumed,
+                "dropped": self.dropped,
+                "latest_seq": self._latest_seq,
+            }
+            info.update(self._rates)
+            return info
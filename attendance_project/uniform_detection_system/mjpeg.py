@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+# mjpeg.py
+# ===========================================
+# Encode-once MJPEG broadcaster for /video_feed.
+# One encoder thread JPEG-encodes each new processed frame exactly once (capped
+# at the output fps) and hands the bytes to every viewer. Each viewer has a
+# one-frame mailbox, so a slow client just skips frames instead of holding up
+# the others, and nothing is encoded while nobody is watching.
+# ===========================================
+
+import time
+import threading
+import cv2
+import numpy as np
+
+BOUNDARY = b'--frame\r\nContent-Type: image/jpeg\r\n\r\n'
+
+
+class Subscriber:
+    """One viewer's mailbox: only the newest encoded frame is kept."""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._chunk = None
+        self._seq = 0
+        self._taken = 0
+        self.dropped = 0
+
+    def offer(self, chunk):
+        with self._cond:
+            if self._seq > self._taken:
+                self.dropped += 1       # previous frame never sent: client is slow
+            self._chunk = chunk
+            self._seq += 1
+            self._cond.notify()
+
+    def get(self, timeout=None):
+        """Next multipart chunk, or None on timeout."""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._seq > self._taken, timeout=timeout):
+                return None
+            self._taken = self._seq
+            return self._chunk
+
+
+class MjpegBroadcaster:
+    """Single encoder thread fanning JPEG frames out to all /video_feed clients."""
+
+    def __init__(self, quality=60, fps=15, blank_shape=(480, 640, 3)):
+        self.quality = quality
+        self.min_period = 1.0 / fps
+        self._cond = threading.Condition()
+        self._frame = None
+        self._frame_seq = 0
+        self._subscribers = set()
+        self._stop = threading.Event()
+        self.frames_encoded = 0
+        self.encode_seconds = 0.0
+        self._blank_chunk = self._encode(np.zeros(blank_shape, dtype=np.uint8))
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _encode(self, frame):
+        _, jpeg = cv2.imencode('.jpg', frame, [int(cv2.IMWRITE_JPEG_QUALITY), self.quality])
+        return BOUNDARY + jpeg.tobytes() + b'\r\n\r\n'
+
+    def submit(self, frame):
+        """Publish a new processed frame (must not be modified afterwards)."""
+        with self._cond:
+            self._frame = frame
+            self._frame_seq += 1
+            self._cond.notify_all()
+
+    def subscribe(self):
+        sub = Subscriber()
+        with self._cond:
+            self._subscribers.add(sub)
+            self._cond.notify_all()
+        # Give new viewers something to show until the next frame is encoded.
+        sub.offer(self._blank_chunk)
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._cond:
+            self._subscribers.discard(sub)
+
+    def stop(self):
+        self._stop.set()
+        with self._cond:
+            self._cond.notify_all()
+
+    def _run(self):
+        sent_seq = 0
+        last_enc = 0.0
+        while not self._stop.is_set():
+            with self._cond:
+                # Sleep until there is both a new frame and at least one viewer.
+                self._cond.wait_for(lambda: self._stop.is_set() or
+                                    (self._subscribers and self._frame_seq > sent_seq), timeout=1.0)
+                if self._stop.is_set() or not self._subscribers or self._frame_seq <= sent_seq:
+                    continue
+                frame, sent_seq = self._frame, self._frame_seq
+            wait = self.min_period - (time.time() - last_enc)
+            if wait > 0:
+                time.sleep(wait)
+                with self._cond:
+                    frame, sent_seq = self._frame, self._frame_seq
+            t0 = time.perf_counter()
+            chunk = self._encode(frame)
+            last_enc = time.time()
+            self.encode_seconds += time.perf_counter() - t0
+            self.frames_encoded += 1
+            with self._cond:
+                subscribers = list(self._subscribers)
+            for sub in subscribers:
+                sub.offer(chunk)
+
+    def stats(self):
+        with self._cond:
+            subscribers = list(self._subscribers)
+        return {
+            "viewers": len(subscribers),
+            "frames_encoded": self.frames_encoded,
+            "avg_encode_ms": round(1000.0 * self.encode_seconds / self.frames_encoded, 2) if self.frames_encoded else 0.0,
+            "viewer_dropped": [s.dropped for s in subscribers],
+        }
@@ -1,27 +1,53 @@
 #!/usr/bin/env python3
 # modified_uniform_app.py
+# The HTTP port is bound immediately; the model and cameras are loaded by a
+# background warm-up task and /health reports ready once they are running.
 
-import cv2
-import numpy as np
 import time
+STARTED_AT = time.time()
+
+import os
+import json
+import cv2
 import threading
-import queue
+import traceback
+from contextlib import contextmanager
 from flask import Flask, Response, jsonify, render_template_string
 from flask_cors import CORS
-from ultralytics import YOLO
-import torch
+
+from detectors import make_engine
+from camera_pipeline import CameraManager, parse_camera_config
+from face_handoff import FaceHandoffClient
 
 app = Flask(__name__)
 CORS(app, resources={r"/*": {"origins": "*"}})
 
-# ---------------- Device & model ----------------
-device = 'cuda:0' if torch.cuda.is_available() else 'cpu'
-print(f"✅ Using device: {device}")
+# ---------------- Startup timing ----------------
+startup_timings = [("imports", round(time.time() - STARTED_AT, 3))]
+
+@contextmanager
+def startup_step(name):
+    t0 = time.time()
+    yield
+    startup_timings.append((name, round(time.time() - t0, 3)))
 
+# ---------------- Device & model ----------------
+# Loaded during warm-up, and only for the YOLO engine: the HOG engine never imports torch.
 YOLO_MODEL_PATH = r"A:\\Facial Attendance\\attendance_project\\uniform_detection_system\\best.pt"
-model = YOLO(YOLO_MODEL_PATH)
-if device.startswith('cuda'):
-    model.to(device)
+device = 'cpu'
+model = None
+
+def load_model():
+    global device, model
+    with startup_step("import torch/ultralytics"):
+        import torch
+        from ultralytics import YOLO
+    device = 'cuda:0' if torch.cuda.is_available() else 'cpu'
+    print(f"✅ Using device: {device}")
+    with startup_step("load YOLO model"):
+        model = YOLO(YOLO_MODEL_PATH)
+        if device.startswith('cuda'):
+            model.to(device)
 
 # ---- Performance / accuracy trade-offs ----
 MODEL_CONF = 0.35  # stricter to reduce false positives
@@ -29,30 +55,79 @@ IMG_SZ = (224, 160)
 DETECT_EVERY = 6
 ENCODE_QUALITY = 60
 OUTPUT_FPS = 15
-
-# ---------------- Camera ----------------
-cap = cv2.VideoCapture(0)
-if not cap.isOpened():
-    cap = cv2.VideoCapture(0, cv2.CAP_MSMF)
-cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
-cap.set(cv2.CAP_PROP_FPS, 20)
-try:
-    cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
-except Exception:
-    pass
-
-if not cap.isOpened():
-    print("❌ Cannot open camera")
-    exit()
-
-frame_q = queue.Queue(maxsize=2)
-latest_frame = None
-latest_processed_frame = None
-stop_event = threading.Event()
-status_lock = threading.Lock()
-detection_status = {'shirt_detected': False, 'pants_detected': False, 'uniform_detected': False}
-handoff_flag = {'released': False}
+# "hog" = HOG person box + colour heuristic; "yolo" = garment model every DETECT_EVERY frames, tracked between
+UNIFORM_ENGINE = os.environ.get("UNIFORM_ENGINE", "hog").lower()
+# HOG engine: full person scan at most every N frames (sooner on track loss), optical flow in between
+HOG_REDETECT_EVERY = int(os.environ.get("HOG_REDETECT_EVERY", DETECT_EVERY * 5))
+# Uniform colours: built-in profile name (see uniform_color.COLOR_PROFILES) or path to a JSON profile
+UNIFORM_COLOR_PROFILE = os.environ.get("UNIFORM_COLOR_PROFILE", "blue")
+
+# ---------------- Cameras ----------------
+# "id=source" pairs, e.g. "entrance=0,gate2=1,yard=rtsp://..."; the first camera serves the unsuffixed routes
+UNIFORM_CAMERAS = os.environ.get("UNIFORM_CAMERAS", "0")
+# /detection_events: comment line sent when idle so dead clients are noticed; browser reconnect delay
+SSE_KEEPALIVE_SECONDS = 15
+SSE_RETRY_MS = 2000
+# Total inference time all cameras may use per second (1.0 = one core), shared evenly between cameras
+INFERENCE_CPU_BUDGET = float(os.environ.get("INFERENCE_CPU_BUDGET", 1.0))
+
+# "redirect" = release the camera and send the browser to the face app (original flow);
+# "combined" = keep the camera and post the confirming frames' person crops to the face service
+HANDOFF_MODE = os.environ.get("UNIFORM_HANDOFF_MODE", "redirect").lower()
+FACE_HANDOFF_URL = os.environ.get("FACE_HANDOFF_URL", "http://localhost:5001/api/face/attendance/batch")
+
+# Cameras share the model; ultralytics predict() is not safe to call from several threads at once.
+model_lock = threading.Lock()
+
+def build_engine():
+    return make_engine(UNIFORM_ENGINE, model=model, conf=MODEL_CONF, imgsz=IMG_SZ,
+                       detect_every=DETECT_EVERY, device=device, redetect_every=HOG_REDETECT_EVERY,
+                       color_profile=UNIFORM_COLOR_PROFILE, predict_lock=model_lock)
+
+face_client = FaceHandoffClient(FACE_HANDOFF_URL) if HANDOFF_MODE == "combined" else None
+
+CAMERA_CONFIG = parse_camera_config(UNIFORM_CAMERAS)
+DEFAULT_CAM = CAMERA_CONFIG[0][0] if CAMERA_CONFIG else "0"
+
+# ---------------- Warm-up ----------------
+app_ready = threading.Event()
+camera_manager = None       # set by warm_up()
+_warm_up_lock = threading.Lock()
+_warm_up_started = False
+
+def warm_up():
+    """Load the model (YOLO engine only), open the cameras and start the pipelines."""
+    global camera_manager
+    try:
+        if UNIFORM_ENGINE == "yolo":
+            load_model()
+        with startup_step("open cameras"):
+            manager = CameraManager(CAMERA_CONFIG, build_engine,
+                                    cpu_budget=INFERENCE_CPU_BUDGET, face_client=face_client, img_sz=IMG_SZ,
+                                    encode_quality=ENCODE_QUALITY, output_fps=OUTPUT_FPS)
+        if not manager.pipelines:
+            print("❌ Cannot open camera")
+            os._exit(1)
+        with startup_step("start pipelines"):
+            manager.start()
+        camera_manager = manager
+        app_ready.set()
+        print(f"✅ Uniform engine: {UNIFORM_ENGINE} (colour profile: {UNIFORM_COLOR_PROFILE}), "
+              f"cameras: {', '.join(manager.pipelines)}, handoff: {HANDOFF_MODE}")
+        print("⏱️ Startup: " + " | ".join(f"{name} {sec:.2f}s" for name, sec in startup_timings)
+              + f" | ready after {time.time() - STARTED_AT:.2f}s")
+    except Exception as e:
+        print("Fatal: uniform detection could not start. Exiting.", e)
+        print(traceback.format_exc())
+        os._exit(1)
+
+def start_warm_up():
+    global _warm_up_started
+    with _warm_up_lock:
+        if _warm_up_started:
+            return
+        _warm_up_started = True
+    threading.Thread(target=warm_up, daemon=True, name="warm-up").start()
 
 # ---------------- HTML ----------------
 HTML_PAGE = """<!DOCTYPE html>
@@ -78,20 +153,30 @@ h1{font-size:1.8rem;margin-bottom:25px;color:#fff;}
 <div class="uniform-container">
 <img src="{{ url_for('static', filename='images/logo.png') }}" alt="logo" class="logo" />
 <h1>Uniform Detection System</h1>
-<div class="video-container"><img id="video" src="/video_feed" alt="Live feed" /></div>
+<div class="video-container"><img id="video" src="/video_feed/{{ cam|urlencode }}" alt="Live feed" /></div>
 <div id="status">Checking uniform...</div>
 </div>
 <script>
-const STATUS_POLL_MS=500;const REDIRECT_DELAY_MS=600;
-async function checkStatus(){
- try{
-  const resp=await fetch('/detection_status',{cache:"no-store"});
-  if(!resp.ok)return;
-  const data=await resp.json();
+const STATUS_POLL_MS=500;const REDIRECT_DELAY_MS=600;const CAM={{ cam|tojson }};const COMBINED={{ combined|tojson }};
+let handedOff=false;let lastAttendanceSeq=null;
+async function showStatus(data){
+  if(handedOff)return;
   const s=document.getElementById('status');
+  if(COMBINED){
+    // Same camera keeps running; the face decision arrives as data.attendance
+    const a=data.attendance;
+    if(lastAttendanceSeq===null){lastAttendanceSeq=a?a.seq:0;}
+    if(a&&a.seq>lastAttendanceSeq){
+      lastAttendanceSeq=a.seq;
+      s.innerHTML=a.success?"<span class='good'>✅ "+a.message+"</span>":"<span class='bad'>"+a.message+"</span>";
+      return;
+    }
+    if(data.uniform_detected){s.innerHTML="<span class='good'>✅ UNIFORM DETECTED! Checking face...</span>";return;}
+  }
   if(data.uniform_detected){
+    handedOff=true;
     s.innerHTML="<span class='good'>✅ UNIFORM DETECTED! Preparing attendance...</span>";
-    await fetch('/reset_status',{method:'POST'});
+    await fetch('/reset_status/'+encodeURIComponent(CAM),{method:'POST'});
     setTimeout(()=>{window.location.href="http://localhost:5001/attendance";},REDIRECT_DELAY_MS);
   }else{
     let parts=[];
@@ -99,258 +184,175 @@ async function checkStatus(){
     parts.push(data.pants_detected?"<span class='good'>Pants</span>":"<span class='bad'>Pants</span>");
     s.innerHTML=parts.join(" &nbsp; ");
   }
+}
+// Fallback: poll /detection_status when Server-Sent Events are unavailable
+async function checkStatus(){
+ try{
+  const resp=await fetch('/detection_status/'+encodeURIComponent(CAM),{cache:"no-store"});
+  if(!resp.ok)return;
+  await showStatus(await resp.json());
  }catch(e){document.getElementById('status').innerHTML="Connecting to camera...";}
 }
-setInterval(checkStatus,STATUS_POLL_MS);checkStatus();
+function startPolling(){setInterval(checkStatus,STATUS_POLL_MS);checkStatus();}
+// Push: the server sends the status once on connect and then only when it changes
+// While the service warms up the stream and video answer 503: retry them a few times
+const video=document.getElementById('video');
+video.onerror=()=>setTimeout(()=>{video.src='/video_feed/'+encodeURIComponent(CAM)+'?t='+Date.now();},1000);
+let sseRetries=0;
+function connectEvents(){
+  const es=new EventSource('/detection_events/'+encodeURIComponent(CAM));
+  es.onopen=()=>{sseRetries=0;};
+  es.onmessage=(e)=>showStatus(JSON.parse(e.data));
+  es.onerror=()=>{
+    if(es.readyState===EventSource.CLOSED){
+      if(++sseRetries<=30){setTimeout(connectEvents,1000);}else{startPolling();}
+    }
+    if(!handedOff){document.getElementById('status').innerHTML="Connecting to camera...";}
+  };
+}
+if(window.EventSource){connectEvents();}else{startPolling();}
 </script>
 </body>
 </html>
 """
 
-# ---------------- Helpers ----------------
-def fast_color_ratio_b_dominant(region, downsize=(32, 32)):
-    if region.size == 0:
-        return 0.0, 0.0
-    small = cv2.resize(region, downsize, interpolation=cv2.INTER_AREA)
-    b, g, r = cv2.split(small)
-    delta = 20
-    blue_mask = (b.astype(int) > (r.astype(int) + delta)) & (b.astype(int) > (g.astype(int) + delta))
-    ratio = float(np.count_nonzero(blue_mask)) / blue_mask.size
-    mean_val = np.mean(cv2.cvtColor(small, cv2.COLOR_BGR2HSV)[:, :, 2])
-    return ratio, mean_val
-
-def detect_uniform_vertical(frame, person_bbox=None):
-    SHIRT_BLUE_RATIO_THRESH = 0.12
-    PANTS_BLUE_RATIO_THRESH = 0.12
-    MIN_BRIGHTNESS = 45
-
-    if person_bbox:
-        x, y, w, h = person_bbox
-        x1, y1 = max(0, x), max(0, y)
-        x2, y2 = min(frame.shape[1], x+w), min(frame.shape[0], y+h)
-        region = frame[y1:y2, x1:x2]
-    else:
-        region = frame
-
-    if region.size == 0:
-        return False, False
-
-    height = region.shape[0]
-    upper = region[0:height//2, :]
-    lower = region[height//2:, :]
-
-    upper_ratio, upper_val = fast_color_ratio_b_dominant(upper)
-    lower_ratio, lower_val = fast_color_ratio_b_dominant(lower)
-
-    shirt_detected = (upper_val > MIN_BRIGHTNESS) and (upper_ratio > SHIRT_BLUE_RATIO_THRESH)
-    pants_detected = (lower_val > MIN_BRIGHTNESS) and (lower_ratio > PANTS_BLUE_RATIO_THRESH)
-
-    return shirt_detected, pants_detected
-
-# ---------------- Capture Thread ----------------
-def capture_thread_fn():
-    global latest_frame
-    while not stop_event.is_set():
-        if handoff_flag['released']:
-            break
-        grabbed = cap.grab()
-        if not grabbed:
-            time.sleep(0.01)
-            continue
-        ret, frame = cap.retrieve()
-        if not ret or frame is None:
-            time.sleep(0.01)
-            continue
-        latest_frame = frame.copy()
-        try:
-            frame_q.put_nowait(frame.copy())
-        except queue.Full:
-            try:
-                frame_q.get_nowait()
-                frame_q.put_nowait(frame.copy())
-            except queue.Empty:
-                pass
-        time.sleep(0.005)
-
-threading.Thread(target=capture_thread_fn, daemon=True).start()
-
-# ---------------- HOG Person Detector ----------------
-hog = cv2.HOGDescriptor()
-hog.setSVMDetector(cv2.HOGDescriptor_getDefaultPeopleDetector())
-
-def detect_person_hog(frame):
-    rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-    small = cv2.resize(rgb, (640, 480))
-    rects, _ = hog.detectMultiScale(small, winStride=(8, 8), padding=(8, 8), scale=1.05)
-    if len(rects) == 0:
-        return None
-    areas = [w*h for (x, y, w, h) in rects]
-    idx = int(np.argmax(areas))
-    x, y, w, h = rects[idx]
-    sx = frame.shape[1] / 640.0
-    sy = frame.shape[0] / 480.0
-    return (int(x*sx), int(y*sy), int(w*sx), int(h*sy))
-
-# ---------------- Inference & Stability Thread ----------------
-def inference_thread_fn():
-    global latest_processed_frame
-    frame_count = 0
-    MOTION_THRESHOLD_PIXELS = 5.0
-    STABLE_TIME_REQUIRED = 0.5
-    motion_ema = 0.0
-    motion_alpha = 0.25
-    stable_start_time = None
-
-    consecutive_uniform_needed = 4
-    consecutive_uniform_counter = 0
-    handoff_initiated = False
-    last_person_bbox = None
-
-    while not stop_event.is_set():
-        try:
-            frame = frame_q.get(timeout=0.25)
-        except queue.Empty:
-            if handoff_flag['released']:
-                break
-            continue
-
-        frame_count += 1
-        small_frame = cv2.resize(frame, IMG_SZ)
-
-        # ----------------- Person detection -----------------
-        if last_person_bbox is None or frame_count % (DETECT_EVERY*2) == 0:
-            pb = detect_person_hog(frame)
-            if pb:
-                last_person_bbox = pb
-
-        # ----------------- Motion stability -----------------
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        if last_person_bbox:
-            x, y, w, h = last_person_bbox
-            roi = gray[y:y+h, x:x+w]
-        else:
-            roi = gray
-
-        small_gray = cv2.resize(roi, IMG_SZ)
-        blur = cv2.GaussianBlur(small_gray, (5,5), 0)
-        diff = cv2.absdiff(small_gray, blur)
-        median_motion = float(np.median(diff)) / 255.0 * max(IMG_SZ)
-        motion_ema = (motion_alpha * median_motion) + (1 - motion_alpha) * motion_ema
-        frame_stable = False
-        if motion_ema <= MOTION_THRESHOLD_PIXELS:
-            if stable_start_time is None:
-                stable_start_time = time.time()
-            frame_stable = (time.time() - stable_start_time) >= STABLE_TIME_REQUIRED
-        else:
-            stable_start_time = None
-            frame_stable = False
-
-        # ----------------- Uniform detection -----------------
-        shirt_detected, pants_detected = detect_uniform_vertical(frame, last_person_bbox)
-        uniform_detected = shirt_detected and pants_detected and frame_stable
-
-        if uniform_detected:
-            consecutive_uniform_counter += 1
-        else:
-            consecutive_uniform_counter = 0
-
-        if consecutive_uniform_counter >= consecutive_uniform_needed and not handoff_initiated:
-            handoff_initiated = True
-            with status_lock:
-                detection_status['shirt_detected'] = True
-                detection_status['pants_detected'] = True
-                detection_status['uniform_detected'] = True
-            try:
-                cap.release()
-                handoff_flag['released'] = True
-                print("🔁 Handoff: camera released for next module.")
-            except Exception as e:
-                print("⚠️ Error releasing camera:", e)
-
-        if not handoff_initiated:
-            with status_lock:
-                detection_status['shirt_detected'] = shirt_detected
-                detection_status['pants_detected'] = pants_detected
-                detection_status['uniform_detected'] = uniform_detected
-        else:
-            with status_lock:
-                detection_status['shirt_detected'] = True
-                detection_status['pants_detected'] = True
-                detection_status['uniform_detected'] = True
-
-        # ----------------- Display -----------------
-        display = cv2.resize(frame, (640, 480))
-        if last_person_bbox:
-            x, y, w, h = last_person_bbox
-            color = (0,255,0) if uniform_detected else (0,255,255)
-            cv2.rectangle(display, (x, y), (x+w, y+h), color, 2)
-            cv2.putText(display, f"S:{shirt_detected} P:{pants_detected}", (x, y-10),
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.7, color, 2)
-        if handoff_initiated:
-            cv2.putText(display, "✅ UNIFORM DETECTED - handoff", (30, 40),
-                        cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 3)
-        elif not frame_stable:
-            cv2.putText(display, "Slight motion - hold briefly...", (30, 40),
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 255), 2)
-
-        latest_processed_frame = display
-
-threading.Thread(target=inference_thread_fn, daemon=True).start()
-
 # ---------------- Flask Routes ----------------
+@app.before_request
+def ensure_warm_up():
+    # Covers servers that import the app instead of running __main__.
+    start_warm_up()
+
+def starting_response():
+    return jsonify({"error": "Starting up, retry shortly", "ready": False}), 503, {"Retry-After": "1"}
+
+def unknown_camera(cam):
+    return jsonify({"error": f"Unknown camera: {cam}", "cameras": list(camera_manager.pipelines)}), 404
+
+def lookup_camera(cam):
+    """(pipeline, None), or (None, error response) while starting up or for an unknown camera."""
+    if not app_ready.is_set():
+        return None, starting_response()
+    pipeline = camera_manager.get(cam)
+    if pipeline is None:
+        return None, unknown_camera(cam)
+    return pipeline, None
+
 @app.route('/')
-def home():
-    return render_template_string(HTML_PAGE)
+@app.route('/camera/<cam>')
+def home(cam=None):
+    if not app_ready.is_set():
+        # Serve the page right away; it connects once the cameras are up.
+        return render_template_string(HTML_PAGE, cam=cam or DEFAULT_CAM, combined=face_client is not None)
+    pipeline, error = lookup_camera(cam)
+    if error:
+        return error
+    return render_template_string(HTML_PAGE, cam=pipeline.cam_id, combined=face_client is not None)
+
+@app.route('/cameras')
+def cameras():
+    if not app_ready.is_set():
+        return starting_response()
+    return jsonify({"default": camera_manager.default_id,
+                    "cameras": {cam_id: {"source": str(p.source), "status": p.get_status(),
+                                         "handed_off": p.handoff_flag['released']}
+                                for cam_id, p in camera_manager.pipelines.items()}})
 
 @app.route('/video_feed')
-def video_feed():
+@app.route('/video_feed/<cam>')
+def video_feed(cam=None):
+    pipeline, error = lookup_camera(cam)
+    if error:
+        return error
+    broadcaster, stop_event, handoff_flag = pipeline.broadcaster, pipeline.stop_event, pipeline.handoff_flag
+    if handoff_flag['released']:
+        return jsonify({"error": f"Camera {pipeline.cam_id} was released for the next module"}), 410
+
     def gen():
-        last_enc_time = 0.0
-        min_period = 1.0 / OUTPUT_FPS
-        while not stop_event.is_set():
-            if latest_processed_frame is not None:
-                now = time.time()
-                if now - last_enc_time < min_period:
-                    time.sleep(min_period - (now - last_enc_time))
-                encode_param = [int(cv2.IMWRITE_JPEG_QUALITY), ENCODE_QUALITY]
-                _, jpeg = cv2.imencode('.jpg', latest_processed_frame, encode_param)
-                last_enc_time = time.time()
-                yield b'--frame\r\nContent-Type: image/jpeg\r\n\r\n' + jpeg.tobytes() + b'\r\n\r\n'
-            else:
-                blank = np.zeros((480, 640, 3), dtype=np.uint8)
-                encode_param = [int(cv2.IMWRITE_JPEG_QUALITY), ENCODE_QUALITY]
-                _, jpeg = cv2.imencode('.jpg', blank, encode_param)
-                yield b'--frame\r\nContent-Type: image/jpeg\r\n\r\n' + jpeg.tobytes() + b'\r\n\r\n'
-
-            if handoff_flag['released'] and latest_processed_frame is None:
-                break
+        sub = broadcaster.subscribe()
+        try:
+            # Redirect mode: nothing is published once the camera is released, so end the stream.
+            while not stop_event.is_set() and not handoff_flag['released']:
+                chunk = sub.get(timeout=1.0)
+                if chunk is not None:
+                    yield chunk
+        finally:
+            broadcaster.unsubscribe(sub)
 
     return Response(gen(), mimetype='multipart/x-mixed-replace; boundary=frame')
 
 @app.route('/detection_status')
-def get_detection_status():
-    with status_lock:
-        # Convert all values to native Python bool
-        return jsonify({k: bool(v) for k, v in detection_status.items()})
+@app.route('/detection_status/<cam>')
+def get_detection_status(cam=None):
+    pipeline, error = lookup_camera(cam)
+    if error:
+        return error
+    return jsonify(pipeline.get_status())
+
+
+@app.route('/detection_events')
+@app.route('/detection_events/<cam>')
+def detection_events(cam=None):
+    """Server-Sent Events: current status on connect, then one event per status change."""
+    pipeline, error = lookup_camera(cam)
+    if error:
+        return error
 
+    def gen():
+        with pipeline.status_lock:
+            pipeline.status_listeners += 1
+        try:
+            yield f"retry: {SSE_RETRY_MS}\n\n"
+            version = -1
+            while not pipeline.stop_event.is_set():
+                item = pipeline.wait_status(version, timeout=SSE_KEEPALIVE_SECONDS)
+                if item is None:
+                    yield ": keep-alive\n\n"     # lets proxies and the server notice dead clients
+                    continue
+                version, status = item
+                yield f"data: {json.dumps(status)}\n\n"
+        finally:
+            with pipeline.status_lock:
+                pipeline.status_listeners -= 1
+
+    return Response(gen(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/health')
+def health():
+    """Readiness probe for the launcher: 200 once the cameras are running, 503 while warming up."""
+    ready = app_ready.is_set()
+    cameras = camera_manager.pipelines if ready else {}
+    return jsonify({"system": "uniform_detection", "ready": ready, "port": 5000,
+                    "uptime_seconds": round(time.time() - STARTED_AT, 1),
+                    "startup": dict(startup_timings),
+                    "cameras": {cam_id: {"handed_off": p.handoff_flag['released']}
+                                for cam_id, p in cameras.items()}}), (200 if ready else 503)
+
+@app.route('/pipeline_stats')
+def pipeline_stats():
+    """Per-camera ring / video feed / engine stats and the shared inference scheduler."""
+    if not app_ready.is_set():
+        return starting_response()
+    return jsonify(camera_manager.stats())
 
 @app.route('/reset_status', methods=['POST'])
-def reset_status():
-    with status_lock:
-        detection_status.update({'shirt_detected': False, 'pants_detected': False, 'uniform_detected': False})
+@app.route('/reset_status/<cam>', methods=['POST'])
+def reset_status(cam=None):
+    pipeline, error = lookup_camera(cam)
+    if error:
+        return error
+    pipeline.reset_status()
     return jsonify({"message": "Status reset"})
 
 @app.route('/shutdown', methods=['POST'])
 def shutdown():
-    stop_event.set()
+    if camera_manager is not None:
+        camera_manager.stop()
     time.sleep(0.2)
-    try:
-        cap.release()
-    except Exception:
-        pass
     cv2.destroyAllWindows()
     return jsonify({"message": "Shutting down"})
 
 if __name__ == '__main__':
     print("🌐 Running Uniform Detection on http://localhost:5000")
+    start_warm_up()
     app.run(host='0.0.0.0', port=5000, debug=False, threaded=True, use_reloader=False)
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+# tracking.py
+# ===========================================
+# Cheap box tracker used between full detections.
+# Tracks corner features inside the box with pyramidal Lucas-Kanade optical
+# flow on a downscaled grayscale frame and moves the box by their median
+# displacement. Reports loss when too few features survive.
+# TrackStats measures how often the full detector still runs and how far the
+# tracked box had drifted from where the detector puts it.
+# ===========================================
+
+import time
+import cv2
+import numpy as np
+
+TRACK_WIDTH = 320           # tracking runs on frames scaled to this width
+MIN_POINTS = 8
+LK_PARAMS = dict(winSize=(15, 15), maxLevel=2,
+                 criteria=(cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 10, 0.03))
+
+
+class BoxTracker:
+    """Optical-flow tracker for one (x, y, w, h) box in full-frame coordinates."""
+
+    def __init__(self, track_width=TRACK_WIDTH, min_points=MIN_POINTS):
+        self.track_width = track_width
+        self.min_points = min_points
+        self.box = None
+        self._pos = None            # sub-pixel (x, y) so small per-frame shifts don't truncate away
+        self._prev = None
+        self._points = None
+        self._scale = 1.0
+
+    def _to_gray(self, frame):
+        h, w = frame.shape[:2]
+        self._scale = min(1.0, self.track_width / float(w))
+        if self._scale < 1.0:
+            size = (max(1, int(w * self._scale)), max(1, int(h * self._scale)))
+            frame = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+        return cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+
+    def init(self, frame, box):
+        """Start tracking box (full-frame coords). Returns False if the box has no texture."""
+        gray = self._to_gray(frame)
+        x, y, w, h = [int(v * self._scale) for v in box]
+        x, y = max(0, x), max(0, y)
+        mask = np.zeros_like(gray)
+        mask[y:y + max(1, h), x:x + max(1, w)] = 255
+        self._points = cv2.goodFeaturesToTrack(gray, maxCorners=60, qualityLevel=0.01,
+                                               minDistance=5, mask=mask)
+        self._prev = gray
+        self.box = tuple(int(v) for v in box)
+        self._pos = (float(self.box[0]), float(self.box[1]))
+        if self._points is None or len(self._points) < self.min_points:
+            self._points = None
+            return False
+        return True
+
+    def update(self, frame):
+        """
+        Move the box to follow its features in frame. Returns (box, shift_px) where
+        shift_px is the median feature displacement in full-frame pixels, or
+        (None, 0.0) when the track is lost.
+        """
+        if self.box is None or self._points is None or self._prev is None:
+            return None, 0.0
+        gray = self._to_gray(frame)
+        if self._prev.shape != gray.shape:
+            self.reset()
+            return None, 0.0
+        nxt, st, _ = cv2.calcOpticalFlowPyrLK(self._prev, gray, self._points, None, **LK_PARAMS)
+        if nxt is None:
+            self.reset()
+            return None, 0.0
+        ok = st.ravel() == 1
+        good_new, good_old = nxt[ok], self._points[ok]
+        if len(good_new) < self.min_points:
+            self.reset()
+            return None, 0.0
+        d = np.median((good_new - good_old).reshape(-1, 2), axis=0) / self._scale
+        _, _, w, h = self.box
+        fh, fw = frame.shape[:2]
+        x = min(max(0.0, self._pos[0] + d[0]), max(0, fw - w))
+        y = min(max(0.0, self._pos[1] + d[1]), max(0, fh - h))
+        self._pos = (x, y)
+        self.box = (int(round(x)), int(round(y)), w, h)
+        self._points = good_new.reshape(-1, 1, 2)
+        self._prev = gray
+        return self.box, float(np.hypot(d[0], d[1]))
+
+    def reset(self):
+        self.box = None
+        self._pos = None
+        self._points = None
+        self._prev = None
+
+
+def box_iou(a, b):
+    """IoU of two (x, y, w, h) boxes."""
+    ax2, ay2, bx2, by2 = a[0] + a[2], a[1] + a[3], b[0] + b[2], b[1] + b[3]
+    iw = max(0, min(ax2, bx2) - max(a[0], b[0]))
+    ih = max(0, min(ay2, by2) - max(a[1], b[1]))
+    inter = iw * ih
+    union = a[2] * a[3] + b[2] * b[3] - inter
+    return inter / float(union) if union > 0 else 0.0
+
+
+class TrackStats:
+    """Detector call rate, track losses and tracked-vs-detected drift for one engine."""
+
+    def __init__(self):
+        self.detections = 0
+        self.track_updates = 0
+        self.losses = 0
+        self.drift_samples = 0
+        self._drift_px_sum = 0.0
+        self._iou_sum = 0.0
+        self.max_drift_px = 0.0
+        self.last_drift_px = 0.0
+        self._window = (time.time(), 0)         # (start, detections)
+        self.detections_per_sec = 0.0
+
+    def detection(self):
+        self.detections += 1
+        self._roll()
+
+    def _roll(self):
+        now = time.time()
+        start, count = self._window
+        if now - start >= 1.0:
+            self.detections_per_sec = round((self.detections - count) / (now - start), 2)
+            self._window = (now, self.detections)
+
+    def drift(self, tracked, detected):
+        """Record how far the tracked box was from a fresh detection of the same target."""
+        tc = (tracked[0] + tracked[2] / 2.0, tracked[1] + tracked[3] / 2.0)
+        dc = (detected[0] + detected[2] / 2.0, detected[1] + detected[3] / 2.0)
+        px = float(np.hypot(tc[0] - dc[0], tc[1] - dc[1]))
+        self.drift_samples += 1
+        self._drift_px_sum += px
+        self._iou_sum += box_iou(tracked, detected)
+        self.max_drift_px = max(self.max_drift_px, px)
+        self.last_drift_px = px
+
+    def stats(self):
+        self._roll()
+        n = self.drift_samples
+        return {
+            "detections": self.detections,
+            "detections_per_sec": self.detections_per_sec,
+            "track_updates": self.track_updates,
+            "track_losses": self.losses,
+            "drift_samples": n,
+            "mean_drift_px": round(self._drift_px_sum / n, 2) if n else 0.0,
+            "max_drift_px": round(self.max_drift_px, 2),
+            "last_drift_px": round(self.last_drift_px, 2),
+            "mean_drift_iou": round(self._iou_sum / n, 3) if n else 0.0,
+        }
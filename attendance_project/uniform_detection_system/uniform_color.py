@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+# uniform_color.py
+# ===========================================
+# Single-pass uniform colour classifier.
+# The person ROI is shrunk once into a preallocated buffer, widened to int16 in
+# place, and both halves (shirt = upper, pants = lower) are scored from that
+# one buffer: fraction of pixels matching the garment's colour rule plus mean
+# brightness (HSV V = max(B, G, R), so no HSV conversion is needed).
+#
+# Colour profiles describe each garment with one rule:
+#   {"rule": "dominant", "channel": "b", "delta": 20, ...}  channel beats both others by delta
+#   {"rule": "neutral", "max_spread": 30, ...}               white / grey / black (low chroma)
+# plus "min_ratio" and optional "min_value" / "max_value" limits on the pixel
+# value (brightness) and "min_brightness" on the half's mean brightness.
+# UNIFORM_COLOR_PROFILE selects a built-in profile by name or a JSON file path.
+# ===========================================
+
+import os
+import json
+import cv2
+import numpy as np
+
+CHANNELS = {"b": 0, "g": 1, "r": 2}
+
+_BLUE = {"rule": "dominant", "channel": "b", "delta": 20, "min_ratio": 0.12, "min_brightness": 45}
+
+COLOR_PROFILES = {
+    # Original behaviour: blue shirt and blue pants
+    "blue": {"shirt": _BLUE, "pants": _BLUE},
+    "white_shirt_blue_pants": {
+        "shirt": {"rule": "neutral", "max_spread": 30, "min_value": 150, "min_ratio": 0.25, "min_brightness": 120},
+        "pants": _BLUE,
+    },
+    "white_shirt_black_pants": {
+        "shirt": {"rule": "neutral", "max_spread": 30, "min_value": 150, "min_ratio": 0.25, "min_brightness": 120},
+        "pants": {"rule": "neutral", "max_spread": 30, "max_value": 70, "min_ratio": 0.25, "min_brightness": 0},
+    },
+    "green": {
+        "shirt": {"rule": "dominant", "channel": "g", "delta": 15, "min_ratio": 0.12, "min_brightness": 45},
+        "pants": {"rule": "dominant", "channel": "g", "delta": 15, "min_ratio": 0.12, "min_brightness": 45},
+    },
+    "maroon": {
+        "shirt": {"rule": "dominant", "channel": "r", "delta": 25, "min_ratio": 0.12, "min_brightness": 35},
+        "pants": {"rule": "dominant", "channel": "r", "delta": 25, "min_ratio": 0.12, "min_brightness": 35},
+    },
+}
+
+
+def load_color_profile(spec):
+    """Profile dict for a built-in name or a JSON file path ({"shirt": {...}, "pants": {...}})."""
+    if isinstance(spec, dict):
+        profile = spec
+    elif spec in COLOR_PROFILES:
+        profile = COLOR_PROFILES[spec]
+    elif spec and os.path.isfile(spec):
+        with open(spec, "r", encoding="utf-8") as f:
+            profile = json.load(f)
+    else:
+        raise ValueError(f"unknown colour profile: {spec}")
+    for garment in ("shirt", "pants"):
+        rule = profile.get(garment)
+        if not isinstance(rule, dict) or rule.get("rule") not in ("dominant", "neutral"):
+            raise ValueError(f"colour profile needs a 'dominant' or 'neutral' rule for {garment}")
+        if rule["rule"] == "dominant" and rule.get("channel") not in CHANNELS:
+            raise ValueError(f"{garment}: channel must be one of b, g, r")
+    return profile
+
+
+class UniformColorClassifier:
+    """
+    Scores shirt/pants colour on a person ROI using buffers allocated once.
+    Not thread-safe: give each pipeline its own instance.
+    """
+
+    def __init__(self, profile="blue", size=(32, 64)):
+        self.profile = load_color_profile(profile)
+        self.size = size                                    # (width, height) of the shrunk ROI
+        w, h = size
+        self.half = h // 2
+        self._coarse = np.empty((2 * h, 2 * w, 3), dtype=np.uint8)
+        self._small = np.empty((h, w, 3), dtype=np.uint8)
+        self._px = np.empty((h, w, 3), dtype=np.int16)
+        self._value = np.empty((h, w), dtype=np.int16)      # per-pixel brightness (max channel)
+        self._tmp = np.empty((h, w), dtype=np.int16)
+        self._tmp2 = np.empty((h, w), dtype=np.int16)
+        self._mask = np.empty((h, w), dtype=bool)
+        self._mask2 = np.empty((h, w), dtype=bool)
+
+    def _score(self, rule, rows):
+        """(match ratio, mean brightness) for one garment over the given row slice."""
+        px, value = self._px[rows], self._value[rows]
+        mask, mask2, tmp, tmp2 = self._mask[rows], self._mask2[rows], self._tmp[rows], self._tmp2[rows]
+        if rule["rule"] == "dominant":
+            c = CHANNELS[rule["channel"]]
+            o1, o2 = [i for i in (0, 1, 2) if i != c]
+            np.subtract(px[..., c], rule.get("delta", 20), out=tmp)
+            np.greater(tmp, px[..., o1], out=mask)
+            np.greater(tmp, px[..., o2], out=mask2)
+            np.logical_and(mask, mask2, out=mask)
+        else:
+            np.minimum(px[..., 0], px[..., 1], out=tmp)
+            np.minimum(tmp, px[..., 2], out=tmp)
+            np.subtract(value, tmp, out=tmp2)                 # chroma spread = max - min
+            np.less_equal(tmp2, rule.get("max_spread", 30), out=mask)
+        if "min_value" in rule:
+            np.greater_equal(value, rule["min_value"], out=mask2)
+            np.logical_and(mask, mask2, out=mask)
+        if "max_value" in rule:
+            np.less_equal(value, rule["max_value"], out=mask2)
+            np.logical_and(mask, mask2, out=mask)
+        ratio = np.count_nonzero(mask) / float(mask.size)
+        brightness = float(value.mean())
+        return ratio, brightness
+
+    def _load(self, region):
+        w, h = self.size
+        if region.shape[0] > 2 * h and region.shape[1] > 2 * w:
+            # Area-averaging a full-size ROI dominates the cost; decimate to 2x first.
+            cv2.resize(region, (2 * w, 2 * h), dst=self._coarse, interpolation=cv2.INTER_NEAREST)
+            region = self._coarse
+        cv2.resize(region, self.size, dst=self._small, interpolation=cv2.INTER_AREA)
+        np.copyto(self._px, self._small, casting="unsafe")
+        px = self._px
+        np.maximum(px[..., 0], px[..., 1], out=self._value)
+        np.maximum(self._value, px[..., 2], out=self._value)
+
+    def classify(self, region):
+        """(shirt_detected, pants_detected) for a person ROI: upper half = shirt, lower half = pants."""
+        if region.size == 0:
+            return False, False
+        self._load(region)
+        shirt_rule, pants_rule = self.profile["shirt"], self.profile["pants"]
+        if shirt_rule is pants_rule or shirt_rule == pants_rule:
+            # Same rule: one pass over the whole buffer, then split the counts.
+            self._score(shirt_rule, slice(None))
+            upper = self._half_stats(slice(0, self.half))
+            lower = self._half_stats(slice(self.half, None))
+        else:
+            upper = self._score(shirt_rule, slice(0, self.half))
+            lower = self._score(pants_rule, slice(self.half, None))
+        return self._passes(shirt_rule, upper), self._passes(pants_rule, lower)
+
+    def _half_stats(self, rows):
+        mask = self._mask[rows]
+        return np.count_nonzero(mask) / float(mask.size), float(self._value[rows].mean())
+
+    @staticmethod
+    def _passes(rule, scores):
+        ratio, brightness = scores
+        return bool(brightness > rule.get("min_brightness", 0) and ratio > rule.get("min_ratio", 0.12))
+
+    def garment_ratio(self, region, garment):
+        """Match ratio of a whole region (e.g. a detector box) against one garment's rule."""
+        if region.size == 0:
+            return 0.0
+        self._load(region)
+        return self._score(self.profile[garment], slice(None))[0]